@@ -0,0 +1,352 @@
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+DATA_PATH = os.path.join(ROOT, "data", "traffic.csv")
+SERVICES = [f's{i}' for i in range(7)]
+THRESHOLDS = {'s0': 250, 's1': 150, 's2': 100, 's3': 100, 's4': 100, 's5': 100, 's6': 100}
+CONTEXT_LENGTH = 1440
+
+
+def load_trace() -> np.ndarray:
+    return np.genfromtxt(DATA_PATH, delimiter=',', skip_header=1)[:, 1:]
+
+
+def serve(handler) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def prometheus_stub(
+    trace: np.ndarray,
+    delay: float = 0,
+    scale: float = 1,
+    node_cpu: float = 0.35,
+    ready: int = 2,
+    pod_cpu: float = 2,
+    latency: float = 2
+):
+    # One stand-in cluster; several with different values back the federation tests
+    def instant(query: str) -> list[dict]:
+        if 'node_cpu_seconds_total' in query:
+            return [{'metric': {}, 'value': [time.time(), str(node_cpu)]}]
+        if 'milliseconds_sum' in query:
+            label, value = 'app_name', latency
+        elif 'container_cpu_usage_seconds_total' in query:
+            label, value = 'group', pod_cpu
+        else:
+            label, value = 'group', ready
+        return [{'metric': {label: service}, 'value': [time.time(), str(value)]} for service in SERVICES]
+
+    class PrometheusHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if delay:
+                time.sleep(delay)
+            url = urlparse(self.path)
+            params = parse_qs(url.query)
+            if url.path.endswith('/query_range'):
+                start = float(params['start'][0])
+                end = float(params['end'][0])
+                timestamps = np.arange(start, end + 1, 60)
+                rows = trace[np.arange(len(timestamps)) % len(trace)] * scale
+                result = [
+                    {
+                        'metric': {'app_name': service},
+                        'values': [[t, str(v)] for t, v in zip(timestamps.tolist(), rows[:, i].tolist())],
+                    }
+                    for i, service in enumerate(SERVICES)
+                ]
+            else:
+                result = instant(params['query'][0])
+            body = json.dumps({
+                'status': 'success',
+                'data': {'resultType': 'matrix', 'result': result},
+            }).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return serve(PrometheusHandler)
+
+
+def kubernetes_stub(failures: list[tuple[int, dict]] | None = None, delay: float = 0):
+    # failures are answered in order, as (status, headers), before patches go through
+    failures = list(failures or [])
+    lock = threading.Lock()
+
+    class KubernetesHandler(BaseHTTPRequestHandler):
+        def do_PATCH(self):
+            length = int(self.headers.get('Content-Length', 0))
+            patch = json.loads(self.rfile.read(length))
+            name = self.path.rstrip('/').split('/')[-2]
+            with lock:
+                status, headers = failures.pop(0) if failures else (200, {})
+                server.patches.append((time.monotonic(), name, patch['spec']['replicas'], status))
+            if delay:
+                time.sleep(delay)
+            if status == 200:
+                body = json.dumps({
+                    'apiVersion': 'autoscaling/v1',
+                    'kind': 'Scale',
+                    'metadata': {'name': name, 'namespace': 'default'},
+                    'spec': {'replicas': patch['spec']['replicas']},
+                    'status': {'replicas': patch['spec']['replicas']},
+                }).encode()
+            else:
+                body = json.dumps({
+                    'apiVersion': 'v1', 'kind': 'Status', 'status': 'Failure', 'code': status,
+                }).encode()
+            self.send_response(status)
+            for header, value in headers.items():
+                self.send_header(header, value)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = serve(KubernetesHandler)
+    # (monotonic time, deployment, replicas, status) for every PATCH received
+    server.patches = []
+    return server
+
+
+def stage_fetch_metrics(trace):
+    from MetricsFetcher import MetricsFetcher
+
+    server = prometheus_stub(trace)
+    metrics_fetcher = MetricsFetcher(
+        prometheus_url=f"http://127.0.0.1:{server.server_port}"
+    )
+    return lambda: metrics_fetcher.fetch_metrics(fetch_starting_datetime=None)
+
+
+def stage_traffic_forecaster_predict(trace):
+    from TrafficForecasterModel import TrafficForecasterModel
+
+    model = TrafficForecasterModel(
+        model_path=os.path.join(ROOT, "models", "traffic_forecaster_model", "v1")
+    )
+    window = trace[:CONTEXT_LENGTH]
+    return lambda: model.predict(window)
+
+
+def stage_latency_predictor_predict(trace):
+    from LatencyPredictorModel import LatencyPredictorModel
+
+    model = LatencyPredictorModel(
+        model_path=os.path.join(ROOT, "models", "latency_predictor_model", "v1"),
+        num_target=len(SERVICES)
+    )
+    traffic = trace[CONTEXT_LENGTH].tolist()
+    return lambda: model.predict(
+        pod=[2] * len(SERVICES),
+        cpu_pod=[1.0] * len(SERVICES),
+        traffic=traffic,
+        cpu_node=0.35
+    )
+
+
+def stage_prepare_traffic_data(trace):
+    from Controller import Controller
+
+    class WatermarkOnly:
+        def traffic_watermark(self):
+            return time.time() - time.time() % 60
+
+    controller = Controller(
+        latency_predictor_model=None,
+        metrics_fetcher=WatermarkOnly(),
+        resource_manager=None,
+        traffic_forecaster_model=None,
+        cooling_down_duration=60,
+        max_target_pod=20,
+        services_threshold=THRESHOLDS,
+        is_test=True,
+        test_data_path=DATA_PATH,
+        test_starting_index=4320
+    )
+    traffic = {service: trace[:120, i] for i, service in enumerate(SERVICES)}
+    return lambda: controller._Controller__prepare_traffic_data(traffic)
+
+
+def stage_scale_deployment(trace):
+    from ResourceManager import ResourceManager
+
+    server = kubernetes_stub()
+    # Lift the client-side rate limit so it does not dominate the measurement
+    resource_manager = ResourceManager(
+        host=f"http://127.0.0.1:{server.server_port}", qps=10 ** 6, burst=10 ** 6
+    )
+    replicas = iter(range(1, 10 ** 9))
+    return lambda: resource_manager.scale_deployment(
+        deployment_name='s0', replicas=next(replicas) % 20 + 1
+    )
+
+
+STAGES = {
+    'fetch_metrics': stage_fetch_metrics,
+    'traffic_forecaster_predict': stage_traffic_forecaster_predict,
+    'latency_predictor_predict': stage_latency_predictor_predict,
+    'prepare_traffic_data': stage_prepare_traffic_data,
+    'scale_deployment': stage_scale_deployment,
+}
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def measure(function, iterations: int, warmup: int) -> dict:
+    for _ in range(warmup):
+        function()
+
+    gc.collect()
+    durations = np.empty(iterations)
+    for i in range(iterations):
+        started = time.perf_counter()
+        function()
+        durations[i] = time.perf_counter() - started
+
+    # Allocation tracing is slow, so it gets its own pass
+    allocation_iterations = max(1, iterations // 10)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for _ in range(allocation_iterations):
+        function()
+    after = tracemalloc.take_snapshot()
+    _, allocation_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    allocated_blocks = sum(
+        max(stat.count_diff, 0) for stat in after.compare_to(before, 'filename')
+    )
+
+    return {
+        'iterations': iterations,
+        'p50_ms': float(np.percentile(durations, 50) * 1000),
+        'p99_ms': float(np.percentile(durations, 99) * 1000),
+        'mean_ms': float(durations.mean() * 1000),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'allocation_peak_kb': round(allocation_peak / 1024, 1),
+        'allocated_blocks': int(allocated_blocks / allocation_iterations),
+    }
+
+
+def run_stage(connection, stage: str, iterations: int, warmup: int):
+    # Runs in a fresh process, so the peak RSS is this stage's own
+    try:
+        result = measure(STAGES[stage](load_trace()), iterations, warmup)
+    except Exception as e:
+        result = {'error': f"{type(e).__name__}: {e}"}
+    connection.send(result)
+
+
+def measure_isolated(stage: str, iterations: int, warmup: int) -> dict:
+    context = multiprocessing.get_context('spawn')
+    connection, child_connection = context.Pipe()
+    process = context.Process(
+        target=run_stage, args=(child_connection, stage, iterations, warmup), name=f"benchmark-{stage}"
+    )
+    process.start()
+    child_connection.close()
+    try:
+        return connection.recv()
+    except EOFError:
+        return {'error': f"Stage process exited with code {process.exitcode}."}
+    finally:
+        process.join()
+        connection.close()
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for stage, result in results['stages'].items():
+        if 'error' in result:
+            continue
+        reference = baseline.get('stages', {}).get(stage)
+        if reference is None or 'error' in reference:
+            # A stage the baseline has no numbers for cannot be shown to be fine
+            regressions.append(f"{stage}: no baseline to compare against")
+            continue
+        for metric in ('p50_ms', 'p99_ms', 'allocation_peak_kb'):
+            limit = reference[metric] * (1 + tolerance)
+            if result[metric] > limit:
+                regressions.append(
+                    f"{stage}.{metric}: {result[metric]:.2f} > {reference[metric]:.2f} (+{tolerance:.0%})"
+                )
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark each controller stage in isolation.")
+    parser.add_argument('--stage', action='append', choices=list(STAGES))
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--output', default=os.path.join(ROOT, "benchmarks", "results.json"))
+    parser.add_argument('--baseline', default=os.path.join(ROOT, "benchmarks", "baseline.json"))
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    results = {
+        'created': time.time(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'stages': {},
+    }
+    for stage in args.stage or list(STAGES):
+        results['stages'][stage] = measure_isolated(stage, args.iterations, args.warmup)
+        print(f"{stage}: {json.dumps(results['stages'][stage])}")
+
+    with open(args.output, 'w') as file:
+        json.dump(results, file, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump(results, file, indent=2)
+        print(f"Saved baseline to {args.baseline}.")
+        sys.exit(0)
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; record one on this machine with --save-baseline.")
+        sys.exit(1)
+
+    with open(args.baseline, 'r') as file:
+        regressions = compare(results, json.load(file), args.tolerance)
+    if regressions:
+        print("Performance regressions:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print("No regressions against the baseline.")
+
+    failed = [stage for stage, result in results['stages'].items() if 'error' in result]
+    if failed:
+        print(f"Stages failed to run: {failed}")
+        sys.exit(1)
@@ -1,16 +1,28 @@
+import contextlib
+import hashlib
 import logging
 import time
 import math
+from datetime import datetime
 from typing import Dict
 
 import numpy as np
-import pandas as pd
 from prometheus_api_client.utils import parse_datetime
 
+from DecisionLog import DecisionLog
 from Exporter import Exporter
+from FastPath import FastPath
+from HistoryStore import HistoryStore
+from HorizonPlanner import HorizonPlanner
 from LatencyPredictorModel import LatencyPredictorModel
 from MetricsFetcher import MetricsFetcher
+from ModelRegistry import ModelRegistry
+from ModelWorker import WorkerUnavailable
+from OnlineTrainer import ExperienceLog, OnlineTrainer
+from PredictionCache import PredictionCache
+from ReplicaOptimizer import ReplicaOptimizer
 from ResourceManager import ResourceManager
+from Scheduler import CycleScheduler
 from TrafficForecasterModel import TrafficForecasterModel
 
 logger = logging.getLogger("Controller")
@@ -27,6 +39,19 @@ class Controller:
         max_target_pod: int,
         services_threshold: Dict[str, int],
         exporter: None | Exporter = None,
+        history_store: None | HistoryStore = None,
+        replica_optimizer: None | ReplicaOptimizer = None,
+        scheduler: None | CycleScheduler = None,
+        forecast_quantiles: None | Dict[str, float] = None,
+        prediction_cache: None | PredictionCache = None,
+        experience_log: None | ExperienceLog = None,
+        online_trainer: None | OnlineTrainer = None,
+        model_registry: None | ModelRegistry = None,
+        horizon_planner: None | HorizonPlanner = None,
+        decision_log: None | DecisionLog = None,
+        fast_path: None | FastPath = None,
+        name: str = 'default',
+        namespace: None | str = None,
         is_test: bool = False,
         test_data_path: None | str = None,
         test_starting_index: None | int = None
@@ -39,31 +64,95 @@ class Controller:
         self.max_target_pod = max_target_pod
         self.services_threshold = services_threshold
         self.services = list(services_threshold.keys())
+        self.name = name
+        self.namespace = namespace
         self.exporter = exporter
+        self.instrumented = exporter is not None and exporter.instrumentation
+        self.history_store = history_store
+        self.replica_optimizer = replica_optimizer
+        self.scheduler = scheduler
+        self.prediction_cache = prediction_cache
+        self.experience_log = experience_log
+        self.online_trainer = online_trainer
+        self.model_registry = model_registry
+        self.horizon_planner = horizon_planner
+        self.decision_log = decision_log
+        self.fast_path = fast_path
+        self.context_length = 1440
+
+        # Services listed here are sized on a forecast quantile instead of the point forecast
+        self.forecast_quantiles = {
+            service: quantile
+            for service, quantile in (forecast_quantiles or {}).items()
+            if quantile is not None
+        }
+        for service, quantile in self.forecast_quantiles.items():
+            if service not in services_threshold:
+                raise Exception(f"Forecast quantile configured for unknown service {service}.")
+            if not 0 < quantile < 1:
+                raise Exception(f"Forecast quantile for {service} must be in (0, 1), got {quantile}.")
+        self.quantile_levels = sorted(set(self.forecast_quantiles.values()))
+
+        self.last_forecasted_traffic: None | Dict[str, float] = None
+        # The forecast stage's output: one step, or a list of steps when planning a horizon
+        self.last_forecast: None | Dict[str, float] | list[Dict[str, float]] = None
+        self.planned_actions: None | list = None
+        # Renewed every cycle; a decision that outlives its deadline finds it changed and drops its plan
+        self.decision_token = object()
+
+        # What the current cycle saw and decided, for the decision log
+        self.stage_seconds: Dict[str, float] = {}
+        self.cycle_inputs: None | dict = None
+        self.cycle_outputs: None | tuple = None
+        self.last_predicted_lat: Dict[str, float] = {}
+
+        self.test_data = None
+        self.fetch_starting_datetime = None
 
         # For testing purposes
         self.is_test = is_test
-        if is_test is not None:
-            self.context_length = 1440
+        if history_store is not None and history_store.is_warm():
+            logger.info("Resuming traffic context from history store.")
+            self.fetch_starting_datetime = datetime.fromtimestamp(
+                history_store.last_timestamp + history_store.step
+            )
+        elif is_test:
+            self.fetch_starting_datetime = parse_datetime("now")
             self.test_data = self.__prepare_test_data(
                 test_data_path, test_starting_index
             )
-            self.fetch_starting_datetime = parse_datetime("now")
+            if history_store is not None:
+                self.__seed_history(self.test_data)
 
     def __prepare_test_data(self, test_data_path: str, test_starting_index: int):
-        traffic_df = pd.read_csv(test_data_path)
-        traffic_df["Time"] = pd.to_datetime(traffic_df['Time'], unit='ms')
-        traffic_df.set_index("Time", inplace=True)
-        traffic_df.sort_index(inplace=True)
-        traffic_df.apply(pd.to_numeric)
-        traffic_df.iloc[:, 1] = traffic_df.iloc[:, 1].astype(float)
+        # Time in ms, then one traffic column per service
+        traffic = np.genfromtxt(test_data_path, delimiter=',', skip_header=1)
+        traffic = traffic[np.argsort(traffic[:, 0], kind='stable')]
 
-        traffic_context = traffic_df.iloc[
-            test_starting_index:(test_starting_index + self.context_length)
-        ].to_numpy()
+        traffic_context = traffic[
+            test_starting_index:(test_starting_index + self.context_length), 1:
+        ]
 
         return traffic_context
 
+    def __seed_history(self, traffic_context: np.ndarray):
+        step = self.history_store.step
+        now = self.fetch_starting_datetime.timestamp()
+        end = now - now % step - step
+        start = end - (len(traffic_context) - 1) * step
+        for i, row in enumerate(traffic_context):
+            self.history_store.append(timestamp=start + i * step, traffic=row)
+
+    def __record_history(self, traffic_array: np.ndarray):
+        step = self.history_store.step
+        watermark = self.metrics_fetcher.traffic_watermark()
+        if self.history_store.last_timestamp is not None:
+            num_new = int(round((watermark - self.history_store.last_timestamp) / step))
+            traffic_array = traffic_array[len(traffic_array) - max(min(num_new, len(traffic_array)), 0):]
+        start = watermark - (len(traffic_array) - 1) * step
+        for i, row in enumerate(traffic_array):
+            self.history_store.append(timestamp=start + i * step, traffic=row)
+
     def __prepare_traffic_data(self, traffic):
         traffic_array = np.array([
             traffic[service] for service in self.services
@@ -75,7 +164,20 @@ class Controller:
         else:
             trimmed_append_array = np.zeros((0, traffic_array.shape[1]))
 
-        return np.vstack((self.test_data, trimmed_append_array))[-self.context_length:]
+        if self.history_store is not None:
+            self.__record_history(trimmed_append_array)
+            window = self.history_store.window(self.context_length)['traffic']
+        elif not self.is_test:
+            window = trimmed_append_array[-self.context_length:]
+        else:
+            window = np.vstack((self.test_data, trimmed_append_array))[-self.context_length:]
+
+        # The forecaster takes exactly context_length rows; a short history is left-padded with zeros
+        if len(window) == self.context_length:
+            return window
+        padded = np.zeros((self.context_length, len(self.services)))
+        padded[self.context_length - len(window):] = window
+        return padded
 
     def scaling_strategy(
         self,
@@ -83,7 +185,8 @@ class Controller:
         forecasted_latency: float,
         threshold_latency: float
     ) -> int:
-        return math.ceil(current_num_pod * math.floor(forecasted_latency / threshold_latency * 100) / 100)
+        # Never scale a service to zero: the latency model cannot size it back up from no pods
+        return max(1, math.ceil(current_num_pod * math.floor(forecasted_latency / threshold_latency * 100) / 100))
 
     def __check_metrics(self, metrics):
         def get_missing_keys(dictionary, keys):
@@ -125,49 +228,380 @@ class Controller:
 
         return traffic, node_cpu, pod_cpu, ready_pod, pod
 
-    def scale(self):
-        metrics = self.metrics_fetcher.fetch_metrics(
-            fetch_starting_datetime=self.fetch_starting_datetime
+    def __span(self, name: str):
+        if self.exporter is None:
+            return contextlib.nullcontext()
+        return self.exporter.span(name)
+
+    def __observe_stage(self, stage: str, seconds: float):
+        self.stage_seconds[stage] = seconds
+        if self.instrumented:
+            self.exporter.observe_stage(stage, seconds)
+
+    def __count_error(self, cause: str, amount: int = 1):
+        if self.instrumented:
+            self.exporter.count_error(cause, amount)
+
+    def __run_stage(self, stage: str, function, fallback=None):
+        started = time.perf_counter()
+        with self.__span(stage):
+            if self.scheduler is None:
+                result = function()
+            else:
+                result = self.scheduler.run_stage(stage, function, fallback)
+        self.__observe_stage(stage, time.perf_counter() - started)
+        return result
+
+    def __deployment_cache(self, synced: bool = True):
+        deployment_caches = getattr(self.resource_manager, 'deployment_caches', None) or {}
+        deployment_cache = deployment_caches.get(
+            self.namespace or getattr(self.resource_manager, 'namespace', None)
         )
-        traffic, node_cpu, pod_cpu, ready_pod, pod = self.__check_metrics(
-            metrics
+        if deployment_cache is not None and (deployment_cache.synced.is_set() or not synced):
+            return deployment_cache
+        return None
+
+    def fetch(self):
+        return self.metrics_fetcher.fetch_metrics(
+            fetch_starting_datetime=self.fetch_starting_datetime,
+            include_pod_counts=self.__deployment_cache() is None
         )
 
-        if self.is_test:
-            traffic = self.__prepare_traffic_data(traffic)
+    def forecast_from(self, point, quantiles=None):
+        forecasted_traffic = dict(zip(self.services, point))
+        for service, quantile in self.forecast_quantiles.items():
+            forecasted_traffic[service] = quantiles[quantile][self.services.index(service)]
+        return forecasted_traffic
 
-        forecasted_traffic = {
-            f's{i}': item
-            for i, item
-            in enumerate(self.traffic_forecaster_model.predict(traffic))
-        }
+    def horizon_from(self, points, quantiles=None):
+        return [
+            self.forecast_from(point, {level: values[k] for level, values in (quantiles or {}).items()})
+            for k, point in enumerate(points)
+        ]
+
+    def forecast_key(self, traffic):
+        return self.prediction_cache.forecast_key(
+            self.metrics_fetcher.traffic_watermark(), traffic, *self.quantile_levels
+        )
+
+    def latency_key(self, mode: str, forecasted_traffic, node_cpu, pod_cpu, ready_pod):
+        return (mode, self.prediction_cache.latency_key(
+            ready_pod=[ready_pod[service] for service in self.services],
+            pod_cpu=[pod_cpu[service] for service in self.services],
+            traffic=[forecasted_traffic[service] for service in self.services],
+            node_cpu=node_cpu['cpu_node']
+        ))
+
+    def __forecast(self, traffic):
+        compute = self.__compute_forecast if self.horizon_planner is None else self.__compute_horizon
+        # The forecast only changes when a new traffic sample lands in the window
+        if self.prediction_cache is None:
+            return compute(traffic)
+        return self.prediction_cache.forecasts.get_or_compute(
+            self.forecast_key(traffic), lambda: compute(traffic)
+        )
+
+    def __cached_latency(self, mode: str, forecasted_traffic, node_cpu, pod_cpu, ready_pod, compute):
+        if self.prediction_cache is None:
+            return compute()
+        return self.prediction_cache.latencies.get_or_compute(
+            self.latency_key(mode, forecasted_traffic, node_cpu, pod_cpu, ready_pod), compute
+        )
+
+    def __compute_forecast(self, traffic):
+        quantiles = None
+        if not self.forecast_quantiles:
+            point = self.traffic_forecaster_model.predict(traffic)
+        else:
+            point, quantiles = self.traffic_forecaster_model.predict_quantiles(
+                traffic, self.quantile_levels
+            )
+        self.record_forecast(traffic, point)
+        return self.forecast_from(point, quantiles)
 
-        predicted_lat = self.latency_predictor_model.predict(
-            pod=[ready_pod[f's{i}'] for i in range(7)],
-            cpu_pod=[pod_cpu[f's{i}'] for i in range(7)],
-            traffic=[forecasted_traffic[f's{i}'] for i in range(7)],
-            cpu_node=node_cpu['cpu_node']
+    def __compute_horizon(self, traffic):
+        points, quantiles = self.traffic_forecaster_model.predict_horizon(
+            traffic, self.horizon_planner.steps, self.quantile_levels
         )
+        self.record_forecast(traffic, points[0])
+        return self.horizon_from(points, quantiles)
 
+    def record_forecast(self, traffic, point):
+        # Shadow forecasters get the same window; all are scored once the next sample lands
+        if self.model_registry is not None:
+            self.model_registry.record_forecast(
+                self.name,
+                self.metrics_fetcher.traffic_watermark() + self.metrics_fetcher.traffic_step,
+                traffic,
+                point
+            )
+
+    def decide(self, forecasted_traffic, node_cpu, pod_cpu, ready_pod, pod, predicted_lat=None):
+        if self.horizon_planner is not None:
+            token = self.decision_token
+            predicted_lat, target_replicas, planned_actions = self.__plan(
+                forecasted_traffic, node_cpu, pod_cpu, ready_pod, pod
+            )
+            if token is self.decision_token:
+                self.planned_actions = planned_actions
+            return predicted_lat, target_replicas
+
+        if self.replica_optimizer is None:
+            return self.__proportional_targets(
+                forecasted_traffic, node_cpu, pod_cpu, ready_pod, pod, predicted_lat
+            )
+
+        optimized_replicas, predicted_lat = self.__optimize(forecasted_traffic, node_cpu, pod_cpu, ready_pod)
         target_replicas = {
-            service: min(self.scaling_strategy(
-                current_num_pod=ready_pod[service],
-                forecasted_latency=predicted_lat[service],
-                threshold_latency=self.services_threshold[service]
-            ), self.max_target_pod) if ready_pod[service] == pod[service] else pod[service]
+            service: optimized_replicas[service] if ready_pod[service] == pod[service] else pod[service]
             for service in self.services
         }
+        return predicted_lat, target_replicas
+
+    def __optimize(self, forecasted_traffic, node_cpu, pod_cpu, ready_pod):
+        optimized_replicas, optimized_lat = self.__cached_latency(
+            'optimizer', forecasted_traffic, node_cpu, pod_cpu, ready_pod,
+            lambda: self.replica_optimizer.optimize(
+                ready_pod=np.array([ready_pod[service] for service in self.services]),
+                pod_cpu=np.array([pod_cpu[service] for service in self.services]),
+                traffic=np.array([forecasted_traffic[service] for service in self.services]),
+                node_cpu=node_cpu['cpu_node'],
+                thresholds=np.array([self.services_threshold[service] for service in self.services])
+            )
+        )
+        return (
+            {service: int(optimized_replicas[i]) for i, service in enumerate(self.services)},
+            dict(zip(self.services, optimized_lat))
+        )
+
+    def __actuate(self, target_replicas, pod):
+        changed_replicas = {
+            service: target_replica
+            for service, target_replica in target_replicas.items()
+            if target_replica != pod[service]
+        }
+        if not changed_replicas:
+            return {}
+
+        results = self.scale_deployments(changed_replicas)
+        failed = [service for service, result in results.items() if not result.success]
+        if failed:
+            logger.error(f"Failed to scale: {failed}.")
+            self.__count_error('actuation', len(failed))
+        return results
+
+    def scale_deployments(self, targets: Dict[str, int]):
+        if self.fast_path is None:
+            return self.resource_manager.scale_deployments(targets, namespace=self.namespace)
+        # An emergency scale-up that landed after this cycle's decision still holds
+        with self.fast_path.actuation:
+            return self.resource_manager.scale_deployments(
+                self.fast_path.apply_floors(targets), namespace=self.namespace
+            )
+
+    def __keep_forecast(self):
+        if self.last_forecast is None:
+            raise Exception("Forecast missed its deadline and there is no previous forecast.")
+        logger.warning("Reusing the previous forecast.")
+        return self.last_forecast
+
+    def __forecast_or_keep(self, traffic):
+        try:
+            return self.__forecast(traffic)
+        except WorkerUnavailable as e:
+            logger.warning(f"{e}")
+            return self.__keep_forecast()
+
+    def reset_decision(self):
+        self.decision_token = object()
+        self.planned_actions = None
+
+    def hold(self, pod):
+        # The decision missed its deadline; whatever it produces once it finishes is dropped
+        self.reset_decision()
+        return self.last_predicted_lat, dict(pod)
+
+    def __decide_or_hold(self, forecasted_traffic, node_cpu, pod_cpu, ready_pod, pod):
+        try:
+            return self.decide(forecasted_traffic, node_cpu, pod_cpu, ready_pod, pod)
+        except WorkerUnavailable as e:
+            logger.warning(f"{e} Holding the current replica counts.")
+            return self.last_predicted_lat, dict(pod)
+
+    def scale(self, metrics=None):
+        timestamp = time.time()
+        started = time.perf_counter()
+        self.stage_seconds = {}
+        if self.exporter is not None:
+            self.exporter.begin_trace('scale')
+        target_replicas = None
+        try:
+            target_replicas = self.__scale(metrics)
+        except Exception:
+            self.__count_error('cycle')
+            raise
+        finally:
+            self.__observe_stage('cycle', time.perf_counter() - started)
+            if self.exporter is not None:
+                self.exporter.end_trace(target_replicas=target_replicas)
+            self.record_decision(timestamp, self.stage_seconds)
+
+    def record_decision(self, timestamp: float, stage_seconds: Dict[str, float]):
+        inputs, outputs = self.cycle_inputs, self.cycle_outputs
+        self.cycle_inputs, self.cycle_outputs, self.stage_seconds = None, None, {}
+        # Cycles that failed before deciding leave nothing to record
+        if self.decision_log is None or inputs is None or outputs is None:
+            return
+        forecast, predicted_lat, target_replicas = outputs
+        horizon = [forecast] if self.horizon_planner is None else forecast
+        self.decision_log.append(
+            timestamp=timestamp,
+            **inputs,
+            forecast=[[step.get(service, np.nan) for service in self.services] for step in horizon],
+            predicted_latency=[predicted_lat.get(service, np.nan) for service in self.services],
+            target=[target_replicas[service] for service in self.services],
+            stage_seconds=stage_seconds
+        )
+
+    def __scale(self, metrics=None):
+        if self.online_trainer is not None:
+            self.online_trainer.promote()
+        if self.model_registry is not None:
+            self.model_registry.apply_pending()
+        self.reset_decision()
+
+        if metrics is None:
+            metrics = self.__run_stage('fetch', self.fetch)
+        elif self.scheduler is not None and 'fetch' in self.scheduler.stage_durations:
+            self.__observe_stage('fetch', self.scheduler.stage_durations['fetch'])
+
+        traffic, node_cpu, pod_cpu, ready_pod, pod = self.prepare(metrics)
+
+        forecasted_traffic = self.__run_stage(
+            'forecast',
+            lambda: self.__forecast_or_keep(traffic),
+            fallback=self.__keep_forecast
+        )
+
+        # Without a fresh latency prediction, hold the current replica counts
+        predicted_lat, target_replicas = self.__run_stage(
+            'decide',
+            lambda: self.__decide_or_hold(forecasted_traffic, node_cpu, pod_cpu, ready_pod, pod),
+            fallback=lambda: self.hold(pod)
+        )
+
+        if self.scheduler is not None:
+            self.scheduler.prefetch_next(self.fetch)
+
+        return self.apply(forecasted_traffic, predicted_lat, target_replicas, pod)
+
+    def prepare(self, metrics):
+        # Replica state from the informer is fresher than kube-state-metrics
+        # A cache that lost its watch after this cycle's fetch skipped the pod queries is still the best there is
+        deployment_cache = self.__deployment_cache(synced='ready_pod' in metrics)
+        if deployment_cache is not None:
+            metrics = {
+                **metrics,
+                'ready_pod': deployment_cache.ready_pods(),
+                'pod': deployment_cache.desired_pods(),
+            }
+
+        try:
+            traffic, node_cpu, pod_cpu, ready_pod, pod = self.__check_metrics(
+                metrics
+            )
+        except Exception:
+            self.__count_error('check_metrics')
+            raise
+
+        observation = self.__observation(metrics, traffic, node_cpu, pod_cpu, ready_pod)
+        if observation is not None:
+            if self.experience_log is not None:
+                self.experience_log.append(timestamp=time.time(), **observation)
+            if self.model_registry is not None:
+                self.model_registry.observe_latency(self.name, **observation)
+
+        if self.horizon_planner is not None:
+            self.horizon_planner.observe(time.time(), ready_pod)
+
+        with self.__span('prepare_traffic'):
+            traffic = self.__prepare_traffic_data(traffic)
+
+        if self.model_registry is not None:
+            self.model_registry.observe_traffic(
+                self.name,
+                self.metrics_fetcher.traffic_watermark(),
+                self.metrics_fetcher.traffic_step,
+                traffic
+            )
+
+        if self.decision_log is not None:
+            self.cycle_inputs = {
+                'watermark': self.metrics_fetcher.traffic_watermark(),
+                # Identifies the exact forecaster input without storing the whole window
+                'window_digest': hashlib.blake2b(np.ascontiguousarray(traffic).tobytes(), digest_size=16).digest(),
+                'node_cpu': node_cpu['cpu_node'],
+                'pod': [pod[service] for service in self.services],
+                'ready_pod': [ready_pod[service] for service in self.services],
+                'pod_cpu': [pod_cpu[service] for service in self.services],
+                'traffic': traffic[-1] if len(traffic) else np.full(len(self.services), np.nan),
+            }
+
+        if self.history_store is not None:
+            self.history_store.update_latest(
+                pod_cpu=np.array([pod_cpu[service] for service in self.services]),
+                ready_pod=np.array([ready_pod[service] for service in self.services]),
+                pod=np.array([pod[service] for service in self.services]),
+                node_cpu=node_cpu['cpu_node']
+            )
+
+        return traffic, node_cpu, pod_cpu, ready_pod, pod
+
+    def __observation(self, metrics, traffic, node_cpu, pod_cpu, ready_pod):
+        # Current load and replicas against the latency they produced
+        latency = metrics.get('latency')
+        if not latency or any(service not in latency for service in self.services):
+            return None
+        if self.metrics_fetcher.stale_metrics or any(len(traffic[service]) == 0 for service in self.services):
+            return None
+        return {
+            'pod': np.array([ready_pod[service] for service in self.services]),
+            'cpu_pod': np.array([pod_cpu[service] for service in self.services]),
+            'traffic': np.array([traffic[service][-1] for service in self.services]),
+            'cpu_node': node_cpu['cpu_node'],
+            'latency': np.array([latency[service] for service in self.services]),
+        }
+
+    def apply(self, forecast, predicted_lat, target_replicas, pod):
+        if self.fast_path is not None:
+            target_replicas = self.fast_path.apply_floors(target_replicas)
+        forecasted_traffic = forecast if self.horizon_planner is None else forecast[0]
+        self.last_forecast = forecast
+        self.last_forecasted_traffic = forecasted_traffic
+        self.last_predicted_lat = predicted_lat
+        self.cycle_outputs = (forecast, predicted_lat, target_replicas)
 
         logger.info(
-            f"Target Replicas: {[target_replica for _, target_replica in target_replicas.items()]}."
+            f"Target Replicas ({self.name}): {[target_replica for _, target_replica in target_replicas.items()]}."
         )
 
-        for service, target_replica in target_replicas.items():
-            if target_replica != pod[service]:
-                self.resource_manager.scale_deployment(
-                    deployment_name=service,
-                    replicas=target_replica
-                )
+        # A slow actuation keeps running in the background rather than blowing the period
+        self.__run_stage(
+            'actuate',
+            lambda: self.__actuate(target_replicas, pod),
+            fallback=lambda: None
+        )
+
+        # Without a fresh plan, the previous cycle's queued actions stay in place
+        if self.horizon_planner is not None and self.planned_actions is not None:
+            self.horizon_planner.schedule(
+                self.planned_actions, scale=None if self.fast_path is None else self.scale_deployments
+            )
+            self.planned_actions = None
+
+        # Shadow latency models are scored on the observed traffic once the decision is out
+        if self.model_registry is not None:
+            self.model_registry.score_latency(self.name)
 
         # Export to Prometheus
         if self.exporter:
@@ -177,9 +611,101 @@ class Controller:
                     forecasted_traffic=forecasted_traffic.get(service),
                     predicted_latency=predicted_lat.get(service),
                     target_replica=target_replicas.get(service),
+                    app=self.name
                 )
+        return target_replicas
+
+    def __proportional_targets(self, forecasted_traffic, node_cpu, pod_cpu, ready_pod, pod, predicted_lat=None):
+        # Services map onto the latency model's inputs by position
+        if predicted_lat is None:
+            predicted_lat = self.__cached_latency(
+                'proportional', forecasted_traffic, node_cpu, pod_cpu, ready_pod,
+                lambda: dict(zip(self.services, self.latency_predictor_model.predict(
+                    pod=[ready_pod[service] for service in self.services],
+                    cpu_pod=[pod_cpu[service] for service in self.services],
+                    traffic=[forecasted_traffic[service] for service in self.services],
+                    cpu_node=node_cpu['cpu_node']
+                ).values()))
+            )
+
+        target_replicas = {
+            service: min(self.scaling_strategy(
+                current_num_pod=ready_pod[service],
+                forecasted_latency=predicted_lat[service],
+                threshold_latency=self.services_threshold[service]
+            ), self.max_target_pod) if ready_pod[service] == pod[service] else pod[service]
+            for service in self.services
+        }
+
+        return predicted_lat, target_replicas
+
+    def __horizon_needs(self, horizon, node_cpu, pod_cpu, ready_pod):
+        # Replicas each forecast step needs, sized from the replicas that are ready now
+        if self.replica_optimizer is not None:
+            decisions = [
+                self.__optimize(forecasted_traffic, node_cpu, pod_cpu, ready_pod)
+                for forecasted_traffic in horizon
+            ]
+            return (
+                np.array([[replicas[service] for service in self.services] for replicas, _ in decisions]),
+                decisions[0][1]
+            )
+
+        def predict():
+            return self.latency_predictor_model.predict_batch(
+                pod=np.tile([ready_pod[service] for service in self.services], (len(horizon), 1)),
+                cpu_pod=[pod_cpu[service] for service in self.services],
+                traffic=[[forecasted_traffic[service] for service in self.services] for forecasted_traffic in horizon],
+                cpu_node=node_cpu['cpu_node']
+            )
+
+        if self.prediction_cache is None:
+            latency = predict()
+        else:
+            latency = self.prediction_cache.latencies.get_or_compute(
+                ('horizon', tuple(
+                    self.latency_key('proportional', forecasted_traffic, node_cpu, pod_cpu, ready_pod)[1]
+                    for forecasted_traffic in horizon
+                )),
+                predict
+            )
+
+        needs = np.array([
+            [
+                min(self.scaling_strategy(
+                    current_num_pod=ready_pod[service],
+                    forecasted_latency=latency[k][i],
+                    threshold_latency=self.services_threshold[service]
+                ), self.max_target_pod)
+                for i, service in enumerate(self.services)
+            ]
+            for k in range(len(horizon))
+        ])
+        return needs, dict(zip(self.services, np.asarray(latency[0]).tolist()))
+
+    def __plan(self, horizon, node_cpu, pod_cpu, ready_pod, pod):
+        needs, predicted_lat = self.__horizon_needs(horizon, node_cpu, pod_cpu, ready_pod)
+        targets, planned_actions = self.horizon_planner.plan(
+            now=time.time(),
+            watermark=self.metrics_fetcher.traffic_watermark(),
+            needs=needs,
+            pod=pod
+        )
+        if planned_actions:
+            logger.info(f"Planned scale actions ({self.name}): {planned_actions}.")
+
+        # A rollout in progress may still grow, but does not shrink until it settles
+        target_replicas = {
+            service: targets[service] if ready_pod[service] == pod[service] else max(targets[service], pod[service])
+            for service in self.services
+        }
+        return predicted_lat, target_replicas, planned_actions
 
     def run(self):
+        if self.scheduler is not None:
+            self.scheduler.run(cycle=self.scale, fetch=self.fetch)
+            return
+
         while True:
             try:
                 self.scale()
@@ -0,0 +1,3 @@
+from .decision_log import DecisionLog, iter_decisions, read_decisions, read_layout, record_dtype
+
+__all__ = ['DecisionLog', 'iter_decisions', 'read_decisions', 'read_layout', 'record_dtype']
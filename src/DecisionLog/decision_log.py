@@ -0,0 +1,228 @@
+import json
+import logging
+import os
+import queue
+import struct
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger("DecisionLog")
+
+MAGIC = b"DLOG1\n"
+STAGES = ('fetch', 'forecast', 'decide', 'actuate', 'cycle')
+
+
+def record_dtype(num_services: int, horizon: int, num_stages: int = len(STAGES)) -> np.dtype:
+    return np.dtype([
+        ('timestamp', '<f8'),
+        ('watermark', '<f8'),
+        ('window_digest', 'S16'),
+        ('node_cpu', '<f4'),
+        ('pod', '<i4', (num_services,)),
+        ('ready_pod', '<i4', (num_services,)),
+        ('pod_cpu', '<f4', (num_services,)),
+        ('traffic', '<f4', (num_services,)),
+        ('forecast', '<f4', (horizon, num_services)),
+        ('predicted_latency', '<f4', (num_services,)),
+        ('target', '<i4', (num_services,)),
+        ('stage_seconds', '<f4', (num_stages,)),
+    ])
+
+
+def _read_header(file) -> tuple[dict, int]:
+    if file.read(len(MAGIC)) != MAGIC:
+        raise Exception(f"{file.name} is not a decision log.")
+    (size,) = struct.unpack('<I', file.read(4))
+    return json.loads(file.read(size)), len(MAGIC) + 4 + size
+
+
+def _file_paths(path: str) -> list[str]:
+    return sorted(
+        os.path.join(path, name)
+        for name in os.listdir(path)
+        if name.endswith(".dlog")
+    )
+
+
+def _first_timestamp(file_path: str) -> float:
+    return float(os.path.basename(file_path)[:-len(".dlog")])
+
+
+def read_layout(file_path: str) -> dict:
+    with open(file_path, 'rb') as file:
+        return _read_header(file)[0]
+
+
+def iter_decisions(
+    path: str,
+    start: float | None = None,
+    end: float | None = None,
+    chunk_rows: int = 65536
+):
+    # Yields (layout, records) chunks in time order without loading whole files
+    file_paths = _file_paths(path)
+    for k, file_path in enumerate(file_paths):
+        # A file holds everything from its name up to the next file's name
+        if end is not None and _first_timestamp(file_path) >= end:
+            break
+        if start is not None and k + 1 < len(file_paths) and _first_timestamp(file_paths[k + 1]) <= start:
+            continue
+
+        with open(file_path, 'rb') as file:
+            layout, offset = _read_header(file)
+        dtype = record_dtype(len(layout['services']), layout['horizon'], len(layout['stages']))
+        # A crash can leave a torn record at the end; it is ignored
+        num_rows = (os.path.getsize(file_path) - offset) // dtype.itemsize
+        if num_rows == 0:
+            continue
+
+        records = np.memmap(file_path, dtype=dtype, mode='r', offset=offset, shape=(num_rows,))
+        for row in range(0, num_rows, chunk_rows):
+            chunk = records[row:row + chunk_rows]
+            mask = np.ones(len(chunk), dtype=bool)
+            if start is not None:
+                mask &= chunk['timestamp'] >= start
+            if end is not None:
+                mask &= chunk['timestamp'] < end
+            if mask.any():
+                yield layout, np.array(chunk[mask])
+        del records
+
+
+def read_decisions(path: str, start: float | None = None, end: float | None = None) -> tuple[dict, np.ndarray]:
+    layout, chunks = None, []
+    for chunk_layout, chunk in iter_decisions(path, start, end):
+        if layout is not None and chunk_layout != layout:
+            # Services or horizon changed; only the newest layout is returned
+            logger.warning("Decision log layout changed, dropping records written before the change.")
+            chunks = []
+        layout = chunk_layout
+        chunks.append(chunk)
+    if layout is None:
+        return {}, np.zeros(0)
+    return layout, np.concatenate(chunks)
+
+
+class DecisionLog:
+    def __init__(
+        self,
+        path: str,
+        services: list[str],
+        horizon: int = 1,
+        max_bytes: int = 64 * 1024 * 1024,
+        rotate_interval: float = 3600,
+        retention_hours: int = 168,
+        queue_size: int = 1024,
+        flush_interval: float = 1.0
+    ):
+        self.path = path
+        self.services = services
+        self.horizon = horizon
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.retention = retention_hours * 3600
+        self.flush_interval = flush_interval
+        self.layout = {'services': services, 'horizon': horizon, 'stages': list(STAGES)}
+        self.dtype = record_dtype(len(services), horizon)
+
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.file = None
+        self.file_started = 0.0
+        self.file_bytes = 0
+
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+        os.makedirs(path, exist_ok=True)
+        self.thread = threading.Thread(target=self.__loop, name="DecisionLog", daemon=True)
+        self.thread.start()
+
+    def append(
+        self,
+        timestamp: float,
+        watermark: float,
+        window_digest: bytes,
+        node_cpu: float,
+        pod: list[int],
+        ready_pod: list[int],
+        pod_cpu: list[float],
+        traffic: list[float],
+        forecast: list[list[float]],
+        predicted_latency: list[float],
+        target: list[int],
+        stage_seconds: dict[str, float]
+    ):
+        record = np.zeros((), dtype=self.dtype)
+        record['timestamp'] = timestamp
+        record['watermark'] = watermark
+        record['window_digest'] = window_digest
+        record['node_cpu'] = node_cpu
+        record['pod'] = pod
+        record['ready_pod'] = ready_pod
+        record['pod_cpu'] = pod_cpu
+        record['traffic'] = traffic
+        # Shorter forecasts (a kept one-step forecast, say) are padded with NaN
+        forecast = np.asarray(forecast, dtype=np.float32)[:self.horizon]
+        record['forecast'] = np.nan
+        record['forecast'][:len(forecast)] = forecast
+        record['predicted_latency'] = predicted_latency
+        record['target'] = target
+        record['stage_seconds'] = [stage_seconds.get(stage, np.nan) for stage in STAGES]
+
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # The control loop never waits on the disk
+            self.dropped += 1
+
+    def __open(self, timestamp: float):
+        if self.file is not None:
+            self.file.close()
+        header = json.dumps(self.layout).encode()
+        file_path = os.path.join(self.path, f"{timestamp:020.6f}.dlog")
+        self.file = open(file_path, 'wb')
+        self.file.write(MAGIC + struct.pack('<I', len(header)) + header)
+        self.file_started = timestamp
+        self.file_bytes = self.file.tell()
+        self.__apply_retention(timestamp)
+
+    def __apply_retention(self, now: float):
+        file_paths = _file_paths(self.path)
+        # A file ends where the next one starts, so it expires once its successor's start does
+        for file_path, next_path in zip(file_paths, file_paths[1:]):
+            if now - _first_timestamp(next_path) > self.retention:
+                logger.info(f"Dropping decision log {os.path.basename(file_path)}.")
+                os.remove(file_path)
+
+    def __write(self, records: list):
+        timestamp = float(records[0]['timestamp'])
+        if (
+            self.file is None
+            or self.file_bytes >= self.max_bytes
+            or timestamp - self.file_started >= self.rotate_interval
+        ):
+            self.__open(timestamp)
+        data = np.array(records, dtype=self.dtype).tobytes()
+        self.file.write(data)
+        self.file.flush()
+        self.file_bytes += len(data)
+        self.written += len(records)
+
+    def __loop(self):
+        while True:
+            records = [self.queue.get()]
+            # Batch whatever else arrives within the flush interval into one write
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                try:
+                    records.append(self.queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            try:
+                self.__write(records)
+            except Exception as e:
+                self.failed += len(records)
+                logger.error(f"Failed to write {len(records)} decision(s): {e}")
@@ -1,38 +1,552 @@
-from prometheus_client import start_http_server, Gauge
+import contextlib
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.exposition import MetricsHandler
+
+from .tracing import Tracer
+
+_NULL_SPAN = contextlib.nullcontext({})
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+
+class _ExporterHandler(MetricsHandler):
+    exporter = None
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == '/ready':
+            self.__respond(*self.exporter.readiness())
+        elif path == '/healthz':
+            self.__respond(*self.exporter.health())
+        elif path == '/trace':
+            trace = self.exporter.tracer.dump() if self.exporter.tracer else None
+            self.__respond(trace is not None, trace or {'error': 'No trace recorded.'})
+        elif path == '/models':
+            registry = self.exporter.model_registry
+            self.__respond(registry is not None, registry.status() if registry else {'error': 'No model registry.'})
+        else:
+            super().do_GET()
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        registry = self.exporter.model_registry
+        if url.path != '/models/promote' or registry is None or not self.exporter.promotion_endpoint:
+            self.__respond(False, {'error': 'Not found.'}, status=404)
+            return
+        query = parse_qs(url.query)
+        if 'model' not in query or 'version' not in query:
+            self.__respond(False, {'error': 'Both model and version are required.'}, status=400)
+            return
+        try:
+            registry.promote(query['model'][0], query['version'][0])
+        except Exception as e:
+            self.__respond(False, {'error': str(e)}, status=400)
+            return
+        self.__respond(True, registry.status(), status=202)
+
+    def __respond(self, ok: bool, body: dict, status: int | None = None):
+        output = json.dumps(body).encode()
+        self.send_response(status or (200 if ok else 503))
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(output)))
+        self.end_headers()
+        self.wfile.write(output)
 
 
 class Exporter:
-    def __init__(self, port=8080):
-        start_http_server(port)
+    LOADING = 'loading'
+    READY = 'ready'
+    FAILED = 'failed'
+
+    def __init__(self, port=8080, instrumentation: bool = True, tracing: bool = False):
+        self.instrumentation = instrumentation
+        self.tracer = Tracer() if tracing else None
+        self.lock = threading.Lock()
+        self.components: dict[str, str] = {}
+        self.startup_phases: dict[str, float] = {}
+        self.model_registry = None
+        self.promotion_endpoint = False
+
+        handler = type('ExporterHandler', (_ExporterHandler,), {'exporter': self})
+        self.server = ThreadingHTTPServer(('', port), handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
 
         self.forecasted_traffic_gauge = Gauge(
-            'forecasted_traffic', 'Forecasted Traffic', ['service']
+            'forecasted_traffic', 'Forecasted Traffic', ['app', 'service']
         )
         self.predicted_latency_gauge = Gauge(
-            'predicted_latency', 'Predicted Latency', ['service']
+            'predicted_latency', 'Predicted Latency', ['app', 'service']
         )
         self.target_replicas_gauge = Gauge(
-            'target_replicas', 'Target Replicas', ['service']
+            'target_replicas', 'Target Replicas', ['app', 'service']
+        )
+        self.startup_phase_gauge = Gauge(
+            'startup_phase_seconds', 'Startup Phase Duration', ['phase']
+        )
+        self.component_ready_gauge = Gauge(
+            'component_ready', 'Component Ready', ['component']
+        )
+
+        # process_resident_memory_bytes comes from prometheus_client's default process collector
+        self.stage_duration_histogram = Histogram(
+            'stage_duration_seconds', 'Control Loop Stage Duration', ['stage'],
+            buckets=STAGE_BUCKETS
         )
+        self.query_duration_histogram = Histogram(
+            'prometheus_query_duration_seconds', 'Prometheus Query Duration', ['query'],
+            buckets=STAGE_BUCKETS
+        )
+        self.query_response_bytes_gauge = Gauge(
+            'prometheus_query_response_bytes', 'Prometheus Query Response Size', ['query']
+        )
+        self.model_inference_histogram = Histogram(
+            'model_inference_seconds', 'Model Inference Duration', ['model'],
+            buckets=STAGE_BUCKETS
+        )
+        self.errors_counter = Counter(
+            'controller_errors', 'Controller Errors', ['cause']
+        )
+
+    def set_component_state(self, component: str, state: str):
+        with self.lock:
+            self.components[component] = state
+        self.component_ready_gauge.labels(
+            component=component
+        ).set(1 if state == self.READY else 0)
+
+    def record_startup_phase(self, phase: str, seconds: float):
+        with self.lock:
+            self.startup_phases[phase] = seconds
+        self.startup_phase_gauge.labels(phase=phase).set(seconds)
+
+    def register_scheduler(self, scheduler):
+        if self.instrumentation:
+            REGISTRY.register(_SchedulerCollector(scheduler))
+
+    def register_prediction_caches(self, prediction_caches: dict):
+        if self.instrumentation and prediction_caches:
+            REGISTRY.register(_PredictionCacheCollector(prediction_caches))
+
+    def register_remote_write(self, receiver):
+        if self.instrumentation:
+            REGISTRY.register(_RemoteWriteCollector(receiver))
+
+    def register_model_registry(self, model_registry, promotion_endpoint: bool = False):
+        self.model_registry = model_registry
+        self.promotion_endpoint = promotion_endpoint
+        if self.instrumentation:
+            REGISTRY.register(_ModelRegistryCollector(model_registry))
+
+    def register_horizon_planners(self, horizon_planners: dict, action_queue):
+        if self.instrumentation and horizon_planners:
+            REGISTRY.register(_HorizonCollector(horizon_planners, action_queue))
+
+    def register_decision_logs(self, decision_logs: dict):
+        if self.instrumentation and decision_logs:
+            REGISTRY.register(_DecisionLogCollector(decision_logs))
+
+    def register_fast_paths(self, fast_paths: dict):
+        if self.instrumentation and fast_paths:
+            REGISTRY.register(_FastPathCollector(fast_paths))
+
+    def register_federation(self, resource_manager):
+        if self.instrumentation:
+            REGISTRY.register(_FederationCollector(resource_manager))
+
+    def register_online_trainer(self, online_trainer):
+        if self.instrumentation:
+            REGISTRY.register(_OnlineTrainerCollector(online_trainer))
+
+    def span(self, name: str, **attributes):
+        if self.tracer is None:
+            return _NULL_SPAN
+        return self.tracer.span(name, **attributes)
+
+    def begin_trace(self, name: str, **attributes):
+        if self.tracer is not None:
+            self.tracer.begin(name, **attributes)
+
+    def end_trace(self, **attributes):
+        if self.tracer is not None:
+            self.tracer.end(**attributes)
+
+    def observe_stage(self, stage: str, seconds: float):
+        if self.instrumentation:
+            self.stage_duration_histogram.labels(stage=stage).observe(seconds)
+
+    def observe_query(self, query: str, seconds: float, size: int, failed: bool):
+        if not self.instrumentation:
+            return
+        self.query_duration_histogram.labels(query=query).observe(seconds)
+        self.query_response_bytes_gauge.labels(query=query).set(size)
+        if failed:
+            self.errors_counter.labels(cause=f"query_{query}").inc()
+        if self.tracer is not None:
+            self.tracer.record(
+                f"query:{query}", time.perf_counter() - seconds, seconds,
+                bytes=size, failed=failed
+            )
+
+    def observe_inference(self, model: str, seconds: float):
+        if self.instrumentation:
+            self.model_inference_histogram.labels(model=model).observe(seconds)
+
+    def count_error(self, cause: str, amount: int = 1):
+        if self.instrumentation:
+            self.errors_counter.labels(cause=cause).inc(amount)
+
+    def readiness(self) -> tuple[bool, dict]:
+        with self.lock:
+            components = dict(self.components)
+            startup_phases = dict(self.startup_phases)
+        ready = len(components) > 0 and all(
+            state == self.READY for state in components.values()
+        )
+        return ready, {
+            'ready': ready,
+            'components': components,
+            'startup_seconds': startup_phases,
+        }
+
+    def health(self) -> tuple[bool, dict]:
+        with self.lock:
+            failed = [
+                component for component, state in self.components.items()
+                if state == self.FAILED
+            ]
+        return len(failed) == 0, {'healthy': len(failed) == 0, 'failed': failed}
 
     def export(
         self,
         service: str,
         forecasted_traffic: float | None,
         predicted_latency: float | None,
-        target_replica: int | None
+        target_replica: int | None,
+        app: str = 'default'
     ):
         if forecasted_traffic is not None:
             self.forecasted_traffic_gauge.labels(
-                service=service
+                app=app, service=service
             ).set(forecasted_traffic)
 
         if predicted_latency is not None:
             self.predicted_latency_gauge.labels(
-                service=service
+                app=app, service=service
             ).set(predicted_latency)
 
         if target_replica is not None:
             self.target_replicas_gauge.labels(
-                service=service
+                app=app, service=service
             ).set(target_replica)
+
+
+class _SchedulerCollector:
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+
+    def collect(self):
+        scheduler = self.scheduler
+
+        cycles = CounterMetricFamily('controller_cycles', 'Control Loop Cycles', labels=['result'])
+        cycles.add_metric(['started'], scheduler.cycles)
+        cycles.add_metric(['failed'], scheduler.failed_cycles)
+        cycles.add_metric(['missed'], scheduler.missed_cycles)
+        yield cycles
+
+        missed_deadlines = CounterMetricFamily(
+            'stage_missed_deadlines', 'Stage Missed Deadlines', labels=['stage']
+        )
+        for stage, count in list(scheduler.missed_deadlines.items()):
+            missed_deadlines.add_metric([stage], count)
+        yield missed_deadlines
+
+        skipped_stages = CounterMetricFamily(
+            'stage_skipped', 'Stages Skipped While A Previous Attempt Was Running', labels=['stage']
+        )
+        for stage, count in list(scheduler.skipped_stages.items()):
+            skipped_stages.add_metric([stage], count)
+        yield skipped_stages
+
+        yield GaugeMetricFamily(
+            'cycle_start_lag_seconds', 'Cycle Start Lag', value=scheduler.last_cycle_lag
+        )
+        yield GaugeMetricFamily(
+            'cycle_duration_seconds', 'Cycle Duration', value=scheduler.last_cycle_duration
+        )
+
+
+class _PredictionCacheCollector:
+    def __init__(self, prediction_caches: dict):
+        self.prediction_caches = prediction_caches
+
+    def collect(self):
+        hits = CounterMetricFamily('prediction_cache_hits', 'Prediction Cache Hits', labels=['app', 'cache'])
+        misses = CounterMetricFamily('prediction_cache_misses', 'Prediction Cache Misses', labels=['app', 'cache'])
+        evictions = CounterMetricFamily(
+            'prediction_cache_evictions', 'Prediction Cache Evictions', labels=['app', 'cache']
+        )
+        entries = GaugeMetricFamily('prediction_cache_entries', 'Prediction Cache Entries', labels=['app', 'cache'])
+        hit_rate = GaugeMetricFamily('prediction_cache_hit_rate', 'Prediction Cache Hit Rate', labels=['app', 'cache'])
+
+        for app, prediction_cache in self.prediction_caches.items():
+            for cache, stats in prediction_cache.stats().items():
+                hits.add_metric([app, cache], stats['hits'])
+                misses.add_metric([app, cache], stats['misses'])
+                evictions.add_metric([app, cache], stats['evictions'])
+                entries.add_metric([app, cache], stats['entries'])
+                hit_rate.add_metric([app, cache], stats['hit_rate'])
+
+        yield hits
+        yield misses
+        yield evictions
+        yield entries
+        yield hit_rate
+
+
+class _RemoteWriteCollector:
+    def __init__(self, receiver):
+        self.receiver = receiver
+
+    def collect(self):
+        receiver = self.receiver
+
+        requests = CounterMetricFamily(
+            'remote_write_requests', 'Remote Write Requests', labels=['result']
+        )
+        requests.add_metric(['accepted'], receiver.requests - receiver.failed_requests)
+        requests.add_metric(['failed'], receiver.failed_requests)
+        yield requests
+
+        samples = CounterMetricFamily(
+            'remote_write_samples', 'Remote Write Samples', labels=['result']
+        )
+        samples.add_metric(['accepted'], receiver.accepted_samples)
+        samples.add_metric(['dropped'], receiver.dropped_samples)
+        yield samples
+
+        yield GaugeMetricFamily(
+            'remote_write_series', 'Remote Write Series Held', value=receiver.store.num_series()
+        )
+        lag = receiver.ingestion_lag()
+        if lag is not None:
+            yield GaugeMetricFamily(
+                'remote_write_lag_seconds', 'Remote Write Newest Sample Age', value=lag
+            )
+
+
+class _OnlineTrainerCollector:
+    def __init__(self, online_trainer):
+        self.online_trainer = online_trainer
+
+    def collect(self):
+        online_trainer = self.online_trainer
+
+        runs = CounterMetricFamily('online_training_runs', 'Online Training Runs', labels=['result'])
+        for result, count in list(online_trainer.runs.items()):
+            runs.add_metric([result], count)
+        yield runs
+
+        yield GaugeMetricFamily(
+            'latency_model_version', 'Active Latency Predictor Version', value=online_trainer.version
+        )
+        yield GaugeMetricFamily(
+            'experience_rows', 'Experience Log Rows', value=online_trainer.experience_log.count
+        )
+
+        result = online_trainer.last_result
+        if result:
+            holdout_error = GaugeMetricFamily(
+                'online_training_holdout_error', 'Holdout Log Latency RMSE Of The Last Run', labels=['model']
+            )
+            holdout_error.add_metric(['baseline'], result['baseline_error'])
+            holdout_error.add_metric(['candidate'], result['candidate_error'])
+            yield holdout_error
+            yield GaugeMetricFamily(
+                'online_training_seconds', 'Duration Of The Last Training Run', value=result['seconds']
+            )
+
+
+class _ModelRegistryCollector:
+    def __init__(self, model_registry):
+        self.model_registry = model_registry
+
+    def collect(self):
+        status = self.model_registry.status()
+
+        active = GaugeMetricFamily('model_version_active', 'Active Model Version', labels=['model', 'version'])
+        errors = GaugeMetricFamily(
+            'model_version_error', 'Model Version Error Against Actuals', labels=['model', 'version', 'metric']
+        )
+        scored = CounterMetricFamily(
+            'model_version_scored', 'Model Version Predictions Scored', labels=['model', 'version']
+        )
+        inference = GaugeMetricFamily(
+            'model_version_inference_seconds', 'Model Version Mean Inference Duration', labels=['model', 'version']
+        )
+        for model, family in status['models'].items():
+            for version, summary in family['versions'].items():
+                active.add_metric([model, version], 1 if version == family['active'] else 0)
+                if summary['state'] != 'ready':
+                    continue
+                scored.add_metric([model, version], summary['scored'])
+                for metric, value in summary['errors'].items():
+                    errors.add_metric([model, version, metric], value)
+                if summary['inference_seconds'] is not None:
+                    inference.add_metric([model, version], summary['inference_seconds'])
+
+        yield active
+        yield errors
+        yield scored
+        yield inference
+        yield CounterMetricFamily(
+            'model_registry_dropped_jobs', 'Shadow Evaluations Dropped', value=status['dropped_jobs']
+        )
+
+
+class _HorizonCollector:
+    def __init__(self, horizon_planners: dict, action_queue):
+        self.horizon_planners = horizon_planners
+        self.action_queue = action_queue
+
+    def collect(self):
+        hits = CounterMetricFamily(
+            'lead_time_hits', 'Planned Ramps Ready Before Their Step', labels=['app', 'service']
+        )
+        misses = CounterMetricFamily(
+            'lead_time_misses', 'Planned Ramps Not Ready At Their Step', labels=['app', 'service']
+        )
+        hit_rate = GaugeMetricFamily('lead_time_hit_rate', 'Lead Time Hit Rate', labels=['app', 'service'])
+        lead = GaugeMetricFamily(
+            'lead_time_seconds', 'Mean Time Capacity Was Ready Ahead Of Its Step', labels=['app', 'service']
+        )
+        for app, horizon_planner in self.horizon_planners.items():
+            for service, stats in horizon_planner.lead_time.stats().items():
+                hits.add_metric([app, service], stats['hits'])
+                misses.add_metric([app, service], stats['misses'])
+                hit_rate.add_metric([app, service], stats['hit_rate'])
+                if stats['mean_lead_seconds'] is not None:
+                    lead.add_metric([app, service], stats['mean_lead_seconds'])
+
+        pending = GaugeMetricFamily('scheduled_scale_actions', 'Queued Scale Actions', labels=['app'])
+        for app, count in self.action_queue.pending().items():
+            pending.add_metric([app], count)
+
+        yield hits
+        yield misses
+        yield hit_rate
+        yield lead
+        yield pending
+        yield CounterMetricFamily('scale_actions_fired', 'Scheduled Scale Actions Fired', value=self.action_queue.fired)
+        yield CounterMetricFamily(
+            'scale_actions_revised', 'Scheduled Scale Actions Replaced By A Newer Plan', value=self.action_queue.revised
+        )
+        yield CounterMetricFamily(
+            'scale_actions_failed', 'Scheduled Scale Actions That Failed', value=self.action_queue.failed
+        )
+
+
+class _DecisionLogCollector:
+    def __init__(self, decision_logs: dict):
+        self.decision_logs = decision_logs
+
+    def collect(self):
+        written = CounterMetricFamily('decision_log_records', 'Decisions Written', labels=['app'])
+        dropped = CounterMetricFamily(
+            'decision_log_dropped', 'Decisions Dropped On A Full Queue', labels=['app']
+        )
+        failed = CounterMetricFamily('decision_log_failed', 'Decisions Lost To Write Errors', labels=['app'])
+        queued = GaugeMetricFamily('decision_log_queue', 'Decisions Waiting To Be Written', labels=['app'])
+        for app, decision_log in self.decision_logs.items():
+            written.add_metric([app], decision_log.written)
+            dropped.add_metric([app], decision_log.dropped)
+            failed.add_metric([app], decision_log.failed)
+            queued.add_metric([app], decision_log.queue.qsize())
+
+        yield written
+        yield dropped
+        yield failed
+        yield queued
+
+
+class _FastPathCollector:
+    def __init__(self, fast_paths: dict):
+        self.fast_paths = fast_paths
+
+    def collect(self):
+        actions = CounterMetricFamily(
+            'fast_path_scale_ups', 'Emergency Scale-Ups Between Forecast Cycles', labels=['app', 'service']
+        )
+        floor = GaugeMetricFamily(
+            'fast_path_floor', 'Replicas The Forecast Loop May Not Go Below', labels=['app', 'service']
+        )
+        hot = GaugeMetricFamily('fast_path_hot', 'Service Above The Low CPU Threshold Since A Scale-Up', labels=['app', 'service'])
+        cpu = GaugeMetricFamily('fast_path_pod_cpu', 'Instant CPU Cores Per Ready Pod', labels=['app', 'service'])
+        tick = GaugeMetricFamily('fast_path_check_seconds', 'Duration Of The Last Fast Path Check', labels=['app'])
+        errors = CounterMetricFamily('fast_path_errors', 'Failed Fast Path Checks', labels=['app'])
+        for app, fast_path in self.fast_paths.items():
+            for service, status in fast_path.status().items():
+                actions.add_metric([app, service], status['actions'])
+                floor.add_metric([app, service], status['floor'])
+                hot.add_metric([app, service], int(status['hot']))
+                if status['cpu'] is not None:
+                    cpu.add_metric([app, service], status['cpu'])
+            tick.add_metric([app], fast_path.tick_seconds)
+            errors.add_metric([app], fast_path.errors)
+
+        yield actions
+        yield floor
+        yield hot
+        yield cpu
+        yield tick
+        yield errors
+
+
+class _FederationCollector:
+    def __init__(self, resource_manager):
+        self.resource_manager = resource_manager
+
+    def collect(self):
+        up = GaugeMetricFamily(
+            'federation_cluster_up', 'Cluster Included In The Last Decision', labels=['namespace', 'cluster']
+        )
+        fetch = GaugeMetricFamily(
+            'federation_fetch_seconds', 'Duration Of The Last Metrics Fetch Per Cluster', labels=['namespace', 'cluster']
+        )
+        fetch_failures = CounterMetricFamily(
+            'federation_fetch_failures', 'Cycles A Cluster Was Left Out Of', labels=['namespace', 'cluster']
+        )
+        for namespace, metrics_fetchers in self.resource_manager.metrics_fetchers.items():
+            for metrics_fetcher in metrics_fetchers:
+                for cluster, status in metrics_fetcher.status().items():
+                    up.add_metric([namespace, cluster], int(status['up']))
+                    if status['fetch_seconds'] is not None:
+                        fetch.add_metric([namespace, cluster], status['fetch_seconds'])
+                    fetch_failures.add_metric([namespace, cluster], status['failures'])
+
+        targets = GaugeMetricFamily(
+            'federation_target_replicas', 'Replicas Applied Per Cluster', labels=['namespace', 'cluster', 'service']
+        )
+        with self.resource_manager.lock:
+            for namespace, clusters in self.resource_manager.cluster_targets.items():
+                for cluster, replicas in clusters.items():
+                    for service, count in replicas.items():
+                        targets.add_metric([namespace, cluster, service], count)
+        scale_failures = CounterMetricFamily(
+            'federation_scale_failures', 'Failed Scale Calls Per Cluster', labels=['cluster']
+        )
+        for cluster, count in self.resource_manager.failures.items():
+            scale_failures.add_metric([cluster], count)
+
+        yield up
+        yield fetch
+        yield fetch_failures
+        yield targets
+        yield scale_failures
@@ -0,0 +1,58 @@
+import contextlib
+import threading
+import time
+
+
+class Tracer:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.current: dict | None = None
+        self.last: dict | None = None
+
+    def begin(self, name: str, **attributes):
+        with self.lock:
+            self.current = {
+                'name': name,
+                'start': time.time(),
+                'origin': time.perf_counter(),
+                'attributes': attributes,
+                'spans': [],
+            }
+
+    def end(self, **attributes):
+        with self.lock:
+            if self.current is None:
+                return
+            trace = self.current
+            self.current = None
+        trace['duration'] = time.perf_counter() - trace.pop('origin')
+        trace['attributes'].update(attributes)
+        self.last = trace
+
+    def record(self, name: str, started: float, duration: float, **attributes):
+        with self.lock:
+            if self.current is None:
+                return
+            self.current['spans'].append({
+                'name': name,
+                'parent': getattr(self.local, 'parent', None),
+                'thread': threading.current_thread().name,
+                'offset': started - self.current['origin'],
+                'duration': duration,
+                'attributes': attributes,
+            })
+
+    @contextlib.contextmanager
+    def span(self, name: str, **attributes):
+        parent = getattr(self.local, 'parent', None)
+        self.local.parent = name
+        started = time.perf_counter()
+        try:
+            yield attributes
+        finally:
+            self.local.parent = parent
+            self.record(name, started, time.perf_counter() - started, **attributes)
+
+    def dump(self) -> dict | None:
+        return self.last
@@ -0,0 +1,3 @@
+from .fast_path import FastPath
+
+__all__ = ['FastPath']
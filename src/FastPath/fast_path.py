@@ -0,0 +1,207 @@
+import logging
+import math
+import threading
+import time
+
+logger = logging.getLogger("FastPath")
+
+
+class ServiceState:
+    def __init__(self):
+        self.cpu: float | None = None
+        self.samples_above = 0
+        self.hot = False
+        self.last_action = 0.0
+        self.floor = 0
+        self.floor_until = 0.0
+        self.desired = 0
+        self.unready_since: float | None = None
+        self.saturated = False
+        self.actions = 0
+
+
+class FastPath:
+    def __init__(
+        self,
+        metrics_fetcher,
+        resource_manager,
+        services: list[str],
+        cpu_high: dict[str, float],
+        cpu_low: dict[str, float],
+        max_target_pod: int,
+        interval: float = 5,
+        cpu_window: int = 30,
+        trigger_samples: int = 2,
+        max_step: int = 2,
+        max_pending: int = 4,
+        unready_grace: float = 120,
+        cooldown: float = 30,
+        floor_duration: float = 120,
+        name: str = 'default',
+        namespace: str | None = None
+    ):
+        for service in services:
+            if not 0 < cpu_low[service] < cpu_high[service]:
+                raise Exception(
+                    f"Fast path thresholds for {service} need 0 < cpu_low < cpu_high, "
+                    f"got {cpu_low[service]} and {cpu_high[service]}."
+                )
+        self.metrics_fetcher = metrics_fetcher
+        self.resource_manager = resource_manager
+        self.services = services
+        self.cpu_high = cpu_high
+        self.cpu_low = cpu_low
+        self.max_target_pod = max_target_pod
+        self.interval = interval
+        self.cpu_window = cpu_window
+        self.trigger_samples = trigger_samples
+        self.max_step = max_step
+        self.max_pending = max_pending
+        self.unready_grace = unready_grace
+        self.cooldown = cooldown
+        self.floor_duration = floor_duration
+        self.name = name
+        self.namespace = namespace
+
+        self.lock = threading.Lock()
+        # Held around every scale call from either loop, so neither acts on a stale view of the other
+        self.actuation = threading.Lock()
+        self.states = {service: ServiceState() for service in services}
+        self.tick_seconds = 0.0
+        self.errors = 0
+        self.stopped = threading.Event()
+        self.thread: threading.Thread | None = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.__loop, name=f"FastPath-{self.name}", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+
+    def floors(self, now: float | None = None) -> dict[str, int]:
+        now = time.time() if now is None else now
+        with self.lock:
+            return {
+                service: state.floor
+                for service, state in self.states.items()
+                if state.floor and (state.hot or now < state.floor_until)
+            }
+
+    def apply_floors(self, target_replicas: dict[str, int]) -> dict[str, int]:
+        # The forecast loop may add capacity, but never takes back an emergency scale-up while it holds
+        floors = self.floors()
+        if not floors:
+            return target_replicas
+        return {
+            service: max(target_replica, floors.get(service, 0))
+            for service, target_replica in target_replicas.items()
+        }
+
+    def __pod_state(self) -> tuple[dict, dict]:
+        # Replica state from the informer costs nothing; otherwise two instant queries
+        deployment_caches = getattr(self.resource_manager, 'deployment_caches', None) or {}
+        deployment_cache = deployment_caches.get(
+            self.namespace or getattr(self.resource_manager, 'namespace', None)
+        )
+        if deployment_cache is not None and deployment_cache.synced.is_set():
+            return deployment_cache.ready_pods(), deployment_cache.desired_pods()
+        return self.metrics_fetcher.fetch_pod_state()
+
+    def __track_unready(self, state: ServiceState, now: float, ready: int, desired: int):
+        if desired > state.desired or ready >= desired:
+            # Newly requested pods get a grace period before they count as lost
+            state.unready_since = None if ready >= desired else now
+        elif state.unready_since is None:
+            state.unready_since = now
+        state.desired = desired
+
+    def __target(self, state: ServiceState, service: str, now: float, usage: float, ready: int, desired: int) -> int | None:
+        if desired - ready >= self.max_pending:
+            if not state.saturated:
+                logger.warning(
+                    f"{service} ({self.name}) has {desired - ready} pods not ready, adding more will not help."
+                )
+            state.saturated = True
+            return None
+        state.saturated = False
+
+        # Pods stuck unready past the grace period (crash-looping, unschedulable) are not coming
+        stuck = state.unready_since is not None and now - state.unready_since >= self.unready_grace
+        lost = desired - ready if stuck else 0
+        # Sized to bring usage back between the two thresholds
+        needed = math.ceil(ready * usage / ((self.cpu_high[service] + self.cpu_low[service]) / 2)) + lost
+        target = min(needed, desired + self.max_step, self.max_target_pod)
+        # Capacity the forecast loop or an earlier step already asked for is on its way
+        return target if target > desired else None
+
+    def tick(self):
+        now = time.time()
+        ready_pod, pod = self.__pod_state()
+        cpu = self.metrics_fetcher.fetch_instant_pod_cpu(self.cpu_window)
+
+        scale = {}
+        with self.lock:
+            for service in self.services:
+                state = self.states[service]
+                usage = state.cpu = cpu.get(service)
+                if usage is None:
+                    state.samples_above = 0
+                    continue
+
+                state.samples_above = state.samples_above + 1 if usage >= self.cpu_high[service] else 0
+                if state.hot and usage < self.cpu_low[service]:
+                    # Hysteresis: the floor is released only once usage falls below the low threshold
+                    state.hot = False
+                    state.floor_until = now + self.floor_duration
+
+                ready, desired = ready_pod.get(service, 0), pod.get(service, 0)
+                self.__track_unready(state, now, ready, desired)
+                if state.samples_above < self.trigger_samples or now - state.last_action < self.cooldown:
+                    continue
+                target = self.__target(state, service, now, usage, ready, desired)
+                if target is not None:
+                    scale[service] = target
+
+        if not scale:
+            return
+
+        logger.warning(f"Emergency scale-up ({self.name}): {scale}.")
+        with self.actuation:
+            results = self.resource_manager.scale_deployments(scale, namespace=self.namespace)
+            with self.lock:
+                for service, result in results.items():
+                    if not result.success:
+                        logger.error(f"Emergency scale-up of {service} ({self.name}) failed.")
+                        continue
+                    state = self.states[service]
+                    holding = state.hot or now < state.floor_until
+                    state.floor = max(state.floor if holding else 0, scale[service])
+                    state.last_action = now
+                    state.samples_above = 0
+                    state.hot = True
+                    state.actions += 1
+
+    def __loop(self):
+        while not self.stopped.is_set():
+            started = time.perf_counter()
+            try:
+                self.tick()
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Fast path check failed ({self.name}): {e}")
+            self.tick_seconds = time.perf_counter() - started
+            self.stopped.wait(max(self.interval - self.tick_seconds, 0))
+
+    def status(self) -> dict[str, dict]:
+        floors = self.floors()
+        with self.lock:
+            return {
+                service: {
+                    'cpu': state.cpu,
+                    'hot': state.hot,
+                    'floor': floors.get(service, 0),
+                    'actions': state.actions,
+                }
+                for service, state in self.states.items()
+            }
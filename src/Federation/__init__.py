@@ -0,0 +1,3 @@
+from .federation import FederatedMetricsFetcher, FederatedResourceManager, split_replicas
+
+__all__ = ['FederatedMetricsFetcher', 'FederatedResourceManager', 'split_replicas']
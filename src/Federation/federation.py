@@ -0,0 +1,453 @@
+import concurrent.futures
+import logging
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from MetricsFetcher import MetricsFetcher
+from ResourceManager import ResourceManager, ScaleResult
+
+logger = logging.getLogger("Federation")
+
+REQUIRED_METRICS = ('traffic', 'node_cpu', 'pod_cpu', 'ready_pod', 'pod')
+
+
+def split_replicas(
+    total: int,
+    weights: list[float],
+    minimum: list[int] | None = None,
+    maximum: list[int | None] | None = None
+) -> list[int]:
+    # Largest remainder apportionment; whatever a full cluster cannot hold spills over to the others
+    count = len(weights)
+    minimum = np.zeros(count, dtype=int) if minimum is None else np.asarray(minimum, dtype=int)
+    maximum = np.array([
+        np.iinfo(np.int32).max if limit is None else limit
+        for limit in (maximum if maximum is not None else [None] * count)
+    ], dtype=int)
+    weights = np.asarray(weights, dtype=float)
+    if not np.isfinite(weights).all() or weights.sum() <= 0:
+        weights = np.ones(count)
+
+    allocation = np.minimum(minimum, maximum)
+    remaining = total - int(allocation.sum())
+    while remaining > 0:
+        room = allocation < maximum
+        if not room.any():
+            break
+        shares = weights * room
+        if shares.sum() <= 0:
+            shares = room.astype(float)
+        quotas = remaining * shares / shares.sum()
+        grants = np.minimum(np.floor(quotas).astype(int), maximum - allocation)
+        leftover = remaining - int(grants.sum())
+        for i in np.argsort(-(quotas - np.floor(quotas)), kind='stable'):
+            if leftover == 0:
+                break
+            if shares[i] > 0 and allocation[i] + grants[i] < maximum[i]:
+                grants[i] += 1
+                leftover -= 1
+        if grants.sum() == 0:
+            break
+        allocation += grants
+        remaining -= int(grants.sum())
+    return allocation.tolist()
+
+
+def _deployment_cache(resource_manager: ResourceManager | None, namespace: str):
+    deployment_caches = getattr(resource_manager, 'deployment_caches', None) or {}
+    deployment_cache = deployment_caches.get(namespace)
+    if deployment_cache is not None and deployment_cache.synced.is_set():
+        return deployment_cache
+    return None
+
+
+class FederatedMetricsFetcher:
+    def __init__(
+        self,
+        fetchers: dict[str, MetricsFetcher],
+        resource_managers: dict[str, ResourceManager] | None = None,
+        namespace: str = 'default',
+        deadline: float = 15,
+        deadlines: dict[str, float | None] | None = None
+    ):
+        if not fetchers:
+            raise Exception("Federation needs at least one cluster.")
+        steps = {fetcher.traffic_step for fetcher in fetchers.values()}
+        if len(steps) > 1:
+            raise Exception(f"Clusters disagree on the traffic step: {sorted(steps)}.")
+        self.fetchers = fetchers
+        self.clusters = list(fetchers)
+        self.resource_managers = resource_managers or {}
+        self.namespace = namespace
+        self.deadlines = {
+            cluster: (deadlines or {}).get(cluster) or deadline
+            for cluster in self.clusters
+        }
+        self.traffic_step = steps.pop()
+        # One slot per cluster for each kind of fetch
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=3 * len(fetchers), thread_name_prefix="Federation"
+        )
+
+        self.lock = threading.Lock()
+        self.running: dict[tuple[str, str], concurrent.futures.Future] = {}
+        self.cluster_metrics: dict[str, dict] = {}
+        self.healthy: list[str] = []
+        self.fetch_seconds: dict[str, float] = {}
+        self.failures: dict[str, int] = {cluster: 0 for cluster in self.clusters}
+        self.stale_metrics: set[str] = set()
+        self.watermark: float | None = None
+
+    @property
+    def query_observer(self):
+        return self.fetchers[self.clusters[0]].query_observer
+
+    @query_observer.setter
+    def query_observer(self, observer):
+        for cluster, fetcher in self.fetchers.items():
+            fetcher.query_observer = None if observer is None else (
+                lambda name, *args, cluster=cluster: observer(f"{cluster}/{name}", *args)
+            )
+
+    def __gather(self, kind: str, function) -> dict[str, object]:
+        started = time.monotonic()
+        futures = {}
+        with self.lock:
+            for cluster in self.clusters:
+                running = self.running.get((kind, cluster))
+                if running is not None and not running.done():
+                    # A cluster still stuck on an earlier call sits this one out instead of piling up threads
+                    logger.warning(f"Cluster {cluster} is still busy with its previous {kind} fetch.")
+                    continue
+                futures[cluster] = self.running[(kind, cluster)] = self.executor.submit(function, cluster)
+
+        results = {}
+        for cluster, future in futures.items():
+            try:
+                results[cluster] = future.result(
+                    timeout=max(started + self.deadlines[cluster] - time.monotonic(), 0)
+                )
+            except concurrent.futures.TimeoutError:
+                logger.error(f"Cluster {cluster} missed its {self.deadlines[cluster]}s deadline for {kind}.")
+            except Exception as e:
+                logger.error(f"Fetching {kind} from cluster {cluster} failed: {e}")
+        return results
+
+    def __fetch_cluster(self, cluster: str, fetch_starting_datetime: datetime | None) -> dict:
+        started = time.perf_counter()
+        # Replica state from the cluster's informer is fresher than kube-state-metrics
+        deployment_cache = _deployment_cache(self.resource_managers.get(cluster), self.namespace)
+        metrics = self.fetchers[cluster].fetch_metrics(
+            fetch_starting_datetime=fetch_starting_datetime,
+            include_pod_counts=deployment_cache is None
+        )
+        if deployment_cache is not None:
+            metrics = {
+                **metrics,
+                'ready_pod': deployment_cache.ready_pods(),
+                'pod': deployment_cache.desired_pods(),
+            }
+        self.fetch_seconds[cluster] = time.perf_counter() - started
+        return metrics
+
+    def fetch_metrics(self, fetch_starting_datetime: datetime | None, include_pod_counts: bool = True):
+        # Pod counts always come back: each cluster has its own informer, the controller has none
+        results = self.__gather(
+            'metrics', lambda cluster: self.__fetch_cluster(cluster, fetch_starting_datetime)
+        )
+        healthy = [
+            cluster for cluster in self.clusters
+            if cluster in results and all(results[cluster].get(key) is not None for key in REQUIRED_METRICS)
+        ]
+        for cluster in self.clusters:
+            if cluster not in healthy:
+                self.failures[cluster] += 1
+        if len(healthy) < len(self.clusters):
+            logger.warning(
+                f"Deciding on {len(healthy)} of {len(self.clusters)} cluster(s); "
+                f"{[cluster for cluster in self.clusters if cluster not in healthy]} keep their replicas."
+            )
+
+        self.cluster_metrics = {cluster: results[cluster] for cluster in healthy}
+        self.healthy = healthy
+        # A partial view must not be mistaken for the whole system
+        self.stale_metrics = set().union(
+            *(self.fetchers[cluster].stale_metrics for cluster in healthy)
+        ) | ({'clusters'} if len(healthy) < len(self.clusters) else set())
+
+        if not healthy:
+            return {key: None for key in REQUIRED_METRICS}
+        return self.__merge(healthy)
+
+    def __merge(self, healthy: list[str]) -> dict:
+        metrics = self.cluster_metrics
+        watermarks = {cluster: self.fetchers[cluster].traffic_watermark() for cluster in healthy}
+        self.watermark = max(watermarks.values())
+
+        traffic: dict[str, np.ndarray] = {}
+        for cluster in healthy:
+            # A cluster whose window lags behind holds its last value, like a gap inside one window
+            lag = int(round((self.watermark - watermarks[cluster]) / self.traffic_step))
+            for service, values in metrics[cluster]['traffic'].items():
+                values = np.asarray(values, dtype=float)
+                if lag and len(values):
+                    values = np.concatenate([values, np.repeat(values[-1:], lag)])[-len(values):]
+                total = traffic.get(service, np.zeros(0))
+                # Windows are aligned at their newest sample
+                length = max(len(total), len(values))
+                traffic[service] = (
+                    np.pad(total, (length - len(total), 0)) + np.pad(values, (length - len(values), 0))
+                )
+
+        ready_pod, pod, pod_cpu = {}, {}, {}
+        for key, merged in (('ready_pod', ready_pod), ('pod', pod)):
+            for cluster in healthy:
+                for service, count in metrics[cluster][key].items():
+                    merged[service] = merged.get(service, 0) + int(count)
+
+        # CPU per ready pod across clusters is weighted by each cluster's ready pods
+        for service in {service for cluster in healthy for service in metrics[cluster]['pod_cpu']}:
+            values = [
+                (metrics[cluster]['pod_cpu'][service], metrics[cluster]['ready_pod'].get(service, 0))
+                for cluster in healthy if service in metrics[cluster]['pod_cpu']
+            ]
+            ready = sum(count for _, count in values)
+            pod_cpu[service] = (
+                sum(usage * count for usage, count in values) / ready if ready
+                else float(np.mean([usage for usage, _ in values]))
+            )
+
+        merged = {
+            'traffic': traffic,
+            'node_cpu': {
+                'cpu_node': float(np.mean([metrics[cluster]['node_cpu']['cpu_node'] for cluster in healthy]))
+            },
+            'pod_cpu': pod_cpu,
+            'ready_pod': ready_pod,
+            'pod': pod,
+        }
+        if any('latency' in metrics[cluster] for cluster in healthy):
+            merged['latency'] = self.__merge_latency(healthy)
+        return merged
+
+    def __merge_latency(self, healthy: list[str]) -> dict | None:
+        metrics = self.cluster_metrics
+        if any(metrics[cluster].get('latency') is None for cluster in healthy):
+            return None
+        latency = {}
+        for service in set.intersection(*(set(metrics[cluster]['latency']) for cluster in healthy)):
+            # Mean latency per request, so busier clusters weigh more
+            weights = [self.latest_traffic(cluster, service) for cluster in healthy]
+            values = [metrics[cluster]['latency'][service] for cluster in healthy]
+            latency[service] = float(np.average(values, weights=weights if sum(weights) > 0 else None))
+        return latency
+
+    def latest_traffic(self, cluster: str, service: str) -> float:
+        values = self.cluster_metrics.get(cluster, {}).get('traffic', {}).get(service)
+        return float(values[-1]) if values is not None and len(values) else 0.0
+
+    def traffic_watermark(self) -> float:
+        if self.watermark is not None:
+            return self.watermark
+        return max(fetcher.traffic_watermark() for fetcher in self.fetchers.values())
+
+    def __pod_state(self, cluster: str) -> tuple[dict, dict]:
+        deployment_cache = _deployment_cache(self.resource_managers.get(cluster), self.namespace)
+        if deployment_cache is not None:
+            return deployment_cache.ready_pods(), deployment_cache.desired_pods()
+        return self.fetchers[cluster].fetch_pod_state()
+
+    def fetch_pod_state(self) -> tuple[dict, dict]:
+        results = self.__gather('pod_state', self.__pod_state)
+        ready_pod, pod = {}, {}
+        for cluster_ready, cluster_pod in results.values():
+            for service, count in cluster_ready.items():
+                ready_pod[service] = ready_pod.get(service, 0) + int(count)
+            for service, count in cluster_pod.items():
+                pod[service] = pod.get(service, 0) + int(count)
+        return ready_pod, pod
+
+    def fetch_instant_pod_cpu(self, window: int = 30) -> dict:
+        results = self.__gather(
+            'instant_pod_cpu',
+            lambda cluster: (self.fetchers[cluster].fetch_instant_pod_cpu(window), self.__pod_state(cluster)[0])
+        )
+        usage, ready = {}, {}
+        for cluster_usage, cluster_ready in results.values():
+            for service, value in cluster_usage.items():
+                count = cluster_ready.get(service, 0)
+                usage[service] = usage.get(service, 0) + value * count
+                ready[service] = ready.get(service, 0) + count
+        return {service: usage[service] / ready[service] for service in usage if ready[service]}
+
+    def status(self) -> dict[str, dict]:
+        return {
+            cluster: {
+                'up': cluster in self.healthy,
+                'fetch_seconds': self.fetch_seconds.get(cluster),
+                'failures': self.failures[cluster],
+            }
+            for cluster in self.clusters
+        }
+
+
+class FederatedResourceManager:
+    def __init__(
+        self,
+        resource_managers: dict[str, ResourceManager],
+        namespace: str = 'default',
+        min_replicas: int = 1,
+        max_replicas: dict[str, int | None] | None = None
+    ):
+        if not resource_managers:
+            raise Exception("Federation needs at least one cluster.")
+        self.resource_managers = resource_managers
+        self.clusters = list(resource_managers)
+        self.namespace = namespace
+        self.min_replicas = min_replicas
+        self.max_replicas = max_replicas or {}
+        # Replica state lives in each cluster; controllers read it through the federated fetchers
+        self.deployment_caches: dict = {}
+        self.metrics_fetchers: dict[str, list[FederatedMetricsFetcher]] = {}
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=len(resource_managers), thread_name_prefix="FederatedResourceManager"
+        )
+
+        self.lock = threading.Lock()
+        # namespace -> cluster -> deployment -> replicas last applied
+        self.cluster_targets: dict[str, dict[str, dict[str, int]]] = {}
+        self.failures: dict[str, int] = {cluster: 0 for cluster in self.clusters}
+
+    def add_metrics_fetcher(self, namespace: str, metrics_fetcher: FederatedMetricsFetcher):
+        self.metrics_fetchers.setdefault(namespace, []).append(metrics_fetcher)
+
+    def start_deployment_cache(
+        self,
+        deployments: list[str],
+        namespace: str | None = None,
+        watch_timeout: int = 300,
+        sync_timeout: float | None = None
+    ) -> dict:
+        # Every cluster gets its own informer; they sync in parallel
+        futures = {
+            cluster: self.executor.submit(
+                resource_manager.start_deployment_cache,
+                deployments=deployments,
+                namespace=namespace or self.namespace,
+                watch_timeout=watch_timeout,
+                sync_timeout=sync_timeout
+            )
+            for cluster, resource_manager in self.resource_managers.items()
+        }
+        return {cluster: future.result() for cluster, future in futures.items()}
+
+    def __fetcher(self, namespace: str, deployment_name: str) -> FederatedMetricsFetcher | None:
+        for metrics_fetcher in self.metrics_fetchers.get(namespace, []):
+            if any(
+                deployment_name in metrics['pod']
+                for metrics in metrics_fetcher.cluster_metrics.values()
+            ):
+                return metrics_fetcher
+        return None
+
+    def split(self, targets: dict[str, int], namespace: str | None = None) -> dict[str, dict[str, int]]:
+        namespace = namespace or self.namespace
+        plan: dict[str, dict[str, int]] = {}
+        for deployment_name, total in targets.items():
+            metrics_fetcher = self.__fetcher(namespace, deployment_name)
+            # Targets only cover the clusters the decision saw; the others are left alone
+            clusters = self.clusters if metrics_fetcher is None else metrics_fetcher.healthy
+            if not clusters:
+                continue
+            if metrics_fetcher is None:
+                weights = [1.0] * len(clusters)
+            else:
+                weights = [metrics_fetcher.latest_traffic(cluster, deployment_name) for cluster in clusters]
+                if sum(weights) <= 0:
+                    weights = [
+                        metrics_fetcher.cluster_metrics[cluster]['pod'].get(deployment_name, 0)
+                        for cluster in clusters
+                    ]
+
+            allocation = split_replicas(
+                total,
+                weights,
+                minimum=[self.min_replicas] * len(clusters),
+                maximum=[self.max_replicas.get(cluster) for cluster in clusters]
+            )
+            if sum(allocation) < total:
+                logger.warning(
+                    f"{deployment_name} needs {total} replicas but the clusters only hold {sum(allocation)}."
+                )
+            for cluster, replicas in zip(clusters, allocation):
+                plan.setdefault(cluster, {})[deployment_name] = replicas
+        return plan
+
+    def scale_deployments(
+        self,
+        targets: dict[str, int],
+        namespace: str | None = None,
+        timeout: float | None = None
+    ) -> dict[str, ScaleResult]:
+        namespace = namespace or self.namespace
+        plan = self.split(targets, namespace)
+        logger.info(f"Cluster targets: {plan}.")
+
+        futures = {
+            cluster: self.executor.submit(
+                self.resource_managers[cluster].scale_deployments, cluster_targets, namespace, timeout
+            )
+            for cluster, cluster_targets in plan.items()
+        }
+        cluster_results: dict[str, dict[str, ScaleResult]] = {}
+        for cluster, future in futures.items():
+            try:
+                cluster_results[cluster] = future.result()
+            except Exception as e:
+                # One cluster's API server failing leaves the others' scaling in place
+                logger.error(f"Scaling in cluster {cluster} failed: {e}")
+                cluster_results[cluster] = {
+                    deployment_name: ScaleResult(
+                        deployment=deployment_name, replicas=replicas, success=False, error=str(e)
+                    )
+                    for deployment_name, replicas in plan[cluster].items()
+                }
+
+        with self.lock:
+            applied = self.cluster_targets.setdefault(namespace, {})
+            for cluster, results in cluster_results.items():
+                failed = [result for result in results.values() if not result.success]
+                self.failures[cluster] += len(failed)
+                for deployment_name, result in results.items():
+                    if result.success:
+                        applied.setdefault(cluster, {})[deployment_name] = result.replicas
+
+        merged = {}
+        for deployment_name, replicas in targets.items():
+            results = {
+                cluster: results[deployment_name]
+                for cluster, results in cluster_results.items()
+                if deployment_name in results
+            }
+            if not results:
+                merged[deployment_name] = ScaleResult(
+                    deployment=deployment_name, replicas=replicas, success=False, error="No cluster is reachable."
+                )
+                continue
+            errors = [f"{cluster}: {result.error}" for cluster, result in results.items() if not result.success]
+            merged[deployment_name] = ScaleResult(
+                deployment=deployment_name,
+                replicas=sum(result.replicas for result in results.values()),
+                success=not errors,
+                attempts=max(result.attempts for result in results.values()),
+                duration=max(result.duration for result in results.values()),
+                error="; ".join(errors) or None,
+                coalesced=all(result.coalesced for result in results.values())
+            )
+        return merged
+
+    def scale_deployment(self, deployment_name: str, replicas: int, namespace: str | None = None):
+        return self.scale_deployments({deployment_name: replicas}, namespace=namespace)[deployment_name]
@@ -0,0 +1,3 @@
+from .history_store import HistoryStore
+
+__all__ = ['HistoryStore']
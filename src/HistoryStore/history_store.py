@@ -0,0 +1,213 @@
+import json
+import logging
+import os
+import time
+
+import numpy as np
+
+logger = logging.getLogger("HistoryStore")
+
+
+class HistoryStore:
+    def __init__(
+        self,
+        path: str,
+        services: list[str],
+        context_length: int = 1440,
+        step: int = 60,
+        rows_per_segment: int = 1440,
+        retention_hours: int = 72
+    ):
+        self.path = path
+        self.services = services
+        self.context_length = context_length
+        self.step = step
+        self.rows_per_segment = rows_per_segment
+        self.retention = retention_hours * 3600
+
+        num_services = len(services)
+        self.columns = {
+            'timestamp': slice(0, 1),
+            'traffic': slice(1, 1 + num_services),
+            'pod_cpu': slice(1 + num_services, 1 + 2 * num_services),
+            'ready_pod': slice(1 + 2 * num_services, 1 + 3 * num_services),
+            'pod': slice(1 + 3 * num_services, 1 + 4 * num_services),
+            'node_cpu': slice(1 + 4 * num_services, 2 + 4 * num_services),
+        }
+        self.num_columns = 2 + 4 * num_services
+
+        # Every row is written twice so the latest window is always one contiguous slice
+        self.buffer = np.full((2 * context_length, self.num_columns), np.nan)
+        self.write_index = 0
+        self.count = 0
+        self.last_timestamp: float | None = None
+
+        self.segment: np.memmap | None = None
+        self.segment_row = 0
+
+        os.makedirs(path, exist_ok=True)
+        started = time.perf_counter()
+        self.__check_layout()
+        self.__load()
+        logger.info(
+            f"Loaded {self.count} row(s) of history in {(time.perf_counter() - started) * 1000:.1f} ms."
+        )
+
+    def __layout(self):
+        return {
+            'services': self.services,
+            'rows_per_segment': self.rows_per_segment,
+            'num_columns': self.num_columns,
+        }
+
+    def __check_layout(self):
+        layout_path = os.path.join(self.path, "layout.json")
+        if os.path.exists(layout_path):
+            with open(layout_path, 'r') as file:
+                layout = json.load(file)
+            if layout == self.__layout():
+                return
+            logger.warning("History layout changed, dropping existing segments.")
+            for segment_path in self.__segment_paths():
+                os.remove(segment_path)
+
+        with open(layout_path, 'w') as file:
+            json.dump(self.__layout(), file)
+
+    def __segment_paths(self) -> list[str]:
+        return sorted(
+            os.path.join(self.path, name)
+            for name in os.listdir(self.path)
+            if name.endswith(".seg")
+        )
+
+    def __open_segment(self, segment_path: str, mode: str) -> np.memmap:
+        return np.memmap(
+            segment_path,
+            dtype=np.float64,
+            mode=mode,
+            shape=(self.num_columns, self.rows_per_segment)
+        )
+
+    def __load(self):
+        segment_paths = self.__segment_paths()
+
+        # Walk back from the newest segment until the window is covered
+        tail = []
+        rows = 0
+        for segment_path in reversed(segment_paths):
+            segment = self.__open_segment(segment_path, 'r')
+            filled = int(np.count_nonzero(segment[0] > 0))
+            tail.append(segment[:, :filled])
+            rows += filled
+            if rows >= self.context_length:
+                break
+
+        if tail:
+            history = np.hstack(tail[::-1]).T[-self.context_length:]
+            for row in history:
+                self.__write_buffer(row)
+
+        if segment_paths:
+            segment = self.__open_segment(segment_paths[-1], 'r+')
+            filled = int(np.count_nonzero(segment[0] > 0))
+            if filled < self.rows_per_segment:
+                self.segment = segment
+                self.segment_row = filled
+
+    def __write_buffer(self, row: np.ndarray):
+        self.buffer[self.write_index] = row
+        self.buffer[self.write_index + self.context_length] = row
+        self.write_index = (self.write_index + 1) % self.context_length
+        self.count = min(self.count + 1, self.context_length)
+        self.last_timestamp = float(row[0])
+
+    def __write_segment(self, row: np.ndarray):
+        if self.segment is None or self.segment_row >= self.rows_per_segment:
+            segment_path = os.path.join(self.path, f"{int(row[0]):012d}.seg")
+            self.segment = self.__open_segment(segment_path, 'w+')
+            self.segment_row = 0
+            self.__apply_retention(row[0])
+
+        self.segment[:, self.segment_row] = row
+        self.segment.flush()
+        self.segment_row += 1
+
+    def __apply_retention(self, now: float):
+        # Never drop rows that are still part of the context window
+        retention = max(self.retention, self.context_length * self.step)
+        for segment_path in self.__segment_paths()[:-1]:
+            segment = self.__open_segment(segment_path, 'r')
+            newest = float(segment[0].max())
+            del segment
+            if now - newest > retention:
+                logger.info(f"Dropping history segment {os.path.basename(segment_path)}.")
+                os.remove(segment_path)
+
+    def append(
+        self,
+        timestamp: float,
+        traffic: np.ndarray,
+        pod_cpu: np.ndarray | None = None,
+        ready_pod: np.ndarray | None = None,
+        pod: np.ndarray | None = None,
+        node_cpu: float | None = None
+    ) -> bool:
+        if self.last_timestamp is not None and timestamp <= self.last_timestamp:
+            return False
+
+        row = np.full(self.num_columns, np.nan)
+        row[self.columns['timestamp']] = timestamp
+        row[self.columns['traffic']] = traffic
+        if pod_cpu is not None:
+            row[self.columns['pod_cpu']] = pod_cpu
+        if ready_pod is not None:
+            row[self.columns['ready_pod']] = ready_pod
+        if pod is not None:
+            row[self.columns['pod']] = pod
+        if node_cpu is not None:
+            row[self.columns['node_cpu']] = node_cpu
+
+        self.__write_buffer(row)
+        self.__write_segment(row)
+        return True
+
+    def update_latest(
+        self,
+        pod_cpu: np.ndarray | None = None,
+        ready_pod: np.ndarray | None = None,
+        pod: np.ndarray | None = None,
+        node_cpu: float | None = None
+    ):
+        if self.count == 0:
+            return
+
+        updates = {
+            'pod_cpu': pod_cpu,
+            'ready_pod': ready_pod,
+            'pod': pod,
+            'node_cpu': node_cpu,
+        }
+        latest = (self.write_index - 1) % self.context_length
+        for column, value in updates.items():
+            if value is None:
+                continue
+            self.buffer[latest, self.columns[column]] = value
+            self.buffer[latest + self.context_length, self.columns[column]] = value
+            if self.segment is not None and self.segment_row > 0:
+                self.segment[self.columns[column], self.segment_row - 1] = value
+
+        if self.segment is not None:
+            self.segment.flush()
+
+    def window(self, length: int | None = None) -> dict[str, np.ndarray]:
+        length = min(length or self.context_length, self.count)
+        end = self.write_index + self.context_length
+        rows = self.buffer[end - length:end]
+        return {
+            column: rows[:, columns] if column not in ('timestamp', 'node_cpu') else rows[:, columns.start]
+            for column, columns in self.columns.items()
+        }
+
+    def is_warm(self) -> bool:
+        return self.count >= self.context_length
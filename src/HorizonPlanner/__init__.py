@@ -0,0 +1,3 @@
+from .horizon_planner import HorizonPlanner, LeadTimeTracker, ScaleActionQueue
+
+__all__ = ['HorizonPlanner', 'LeadTimeTracker', 'ScaleActionQueue']
@@ -0,0 +1,219 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+
+logger = logging.getLogger("HorizonPlanner")
+
+
+class ScaleActionQueue:
+    def __init__(self, resource_manager):
+        self.resource_manager = resource_manager
+        self.condition = threading.Condition()
+        # (due, sequence, app, namespace, targets)
+        self.actions: list[tuple] = []
+        # app -> what fires its actions, when it is not a plain scale call
+        self.scalers: dict[str, object] = {}
+        self.sequence = itertools.count()
+        self.stopped = False
+
+        self.fired = 0
+        self.revised = 0
+        self.failed = 0
+
+        self.thread = threading.Thread(target=self.__loop, name="ScaleActionQueue", daemon=True)
+        self.thread.start()
+
+    def replace(self, app: str, namespace: str | None, actions: list[tuple[float, dict[str, int]]], scale=None):
+        # Every cycle re-plans the whole horizon, so an application's queued actions are swapped wholesale
+        with self.condition:
+            self.scalers[app] = scale
+            previous = {(due, tuple(sorted(targets.items()))) for due, _, name, _, targets in self.actions if name == app}
+            planned = {(due, tuple(sorted(targets.items()))) for due, targets in actions}
+            self.revised += len(previous - planned)
+
+            self.actions = [action for action in self.actions if action[2] != app]
+            for due, targets in actions:
+                self.actions.append((due, next(self.sequence), app, namespace, targets))
+            heapq.heapify(self.actions)
+            self.condition.notify()
+
+    def pending(self) -> dict[str, int]:
+        with self.condition:
+            counts = defaultdict(int)
+            for action in self.actions:
+                counts[action[2]] += 1
+            return dict(counts)
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+
+    def __loop(self):
+        while True:
+            with self.condition:
+                while not self.stopped and (not self.actions or self.actions[0][0] > time.time()):
+                    self.condition.wait(self.actions[0][0] - time.time() if self.actions else None)
+                if self.stopped:
+                    return
+                due, _, app, namespace, targets = heapq.heappop(self.actions)
+                scale = self.scalers.get(app)
+
+            logger.info(f"Scheduled scale for {app} ({time.time() - due:.1f}s late): {targets}.")
+            try:
+                if scale is None:
+                    results = self.resource_manager.scale_deployments(targets, namespace=namespace)
+                else:
+                    results = scale(targets)
+            except Exception as e:
+                self.failed += len(targets)
+                logger.error(f"Scheduled scale for {app} failed: {e}")
+                continue
+            failed = [service for service, result in results.items() if not result.success]
+            if failed:
+                self.failed += len(failed)
+                logger.error(f"Scheduled scale for {app} failed for {failed}.")
+            self.fired += 1
+
+
+class LeadTimeTracker:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # (service, start) -> planned ramp, until the step it was planned for begins
+        self.expected: dict[tuple[str, float], dict] = {}
+        self.hits: dict[str, int] = defaultdict(int)
+        self.misses: dict[str, int] = defaultdict(int)
+        self.lead_seconds: dict[str, float] = defaultdict(float)
+
+    def expect(self, service: str, start: float, replicas: int, current: int):
+        with self.lock:
+            expectation = self.expected.get((service, start))
+            if expectation is None:
+                # Only ramps count; holding or shrinking capacity is always on time
+                if replicas > current:
+                    self.expected[(service, start)] = {'replicas': replicas, 'base': current, 'ready_at': None}
+                return
+            if replicas <= expectation['base']:
+                # A later forecast called the ramp off
+                del self.expected[(service, start)]
+            else:
+                expectation['replicas'] = replicas
+
+    def observe(self, now: float, ready_pod: dict[str, int]):
+        with self.lock:
+            for (service, start), expectation in list(self.expected.items()):
+                if ready_pod.get(service, 0) >= expectation['replicas']:
+                    if expectation['ready_at'] is None:
+                        expectation['ready_at'] = now
+                else:
+                    expectation['ready_at'] = None
+                if now < start:
+                    continue
+
+                # Judged at the first observation once the step has begun
+                del self.expected[(service, start)]
+                if expectation['ready_at'] is None:
+                    self.misses[service] += 1
+                else:
+                    self.hits[service] += 1
+                    self.lead_seconds[service] += max(start - expectation['ready_at'], 0)
+
+    def stats(self) -> dict[str, dict]:
+        with self.lock:
+            services = set(self.hits) | set(self.misses)
+            return {
+                service: {
+                    'hits': self.hits[service],
+                    'misses': self.misses[service],
+                    'hit_rate': self.hits[service] / (self.hits[service] + self.misses[service]),
+                    'mean_lead_seconds': self.lead_seconds[service] / self.hits[service] if self.hits[service] else None,
+                }
+                for service in services
+            }
+
+
+class HorizonPlanner:
+    def __init__(
+        self,
+        services: list[str],
+        steps: int,
+        step: float,
+        readiness_delays: dict[str, float],
+        action_queue: ScaleActionQueue,
+        name: str = 'default',
+        namespace: str | None = None
+    ):
+        if steps < 1:
+            raise Exception(f"Horizon needs at least one step, got {steps}.")
+        self.services = services
+        self.steps = steps
+        self.step = step
+        self.readiness_delays = np.array([readiness_delays[service] for service in services], dtype=float)
+        self.action_queue = action_queue
+        self.name = name
+        self.namespace = namespace
+        self.lead_time = LeadTimeTracker()
+
+        uncovered = [
+            service for service, delay in zip(services, self.readiness_delays)
+            if delay + step > steps * step
+        ]
+        if uncovered:
+            logger.warning(
+                f"A {steps}-step horizon is shorter than the readiness delay of {uncovered}; "
+                f"their ramps are planned late."
+            )
+
+    def plan(
+        self,
+        now: float,
+        watermark: float,
+        needs: np.ndarray,
+        pod: dict[str, int]
+    ) -> tuple[dict[str, int], list[tuple[float, dict[str, int]]]]:
+        # Step k forecasts the sample after watermark + k * step, so its replicas
+        # have to be ready from that time on and requested a readiness delay earlier
+        starts = watermark + np.arange(len(needs)) * self.step
+        ends = starts + self.step
+
+        targets, actions = {}, defaultdict(dict)
+        for i, service in enumerate(self.services):
+            requests = starts - self.readiness_delays[i]
+
+            def target_at(when: float, current: int) -> int | None:
+                remaining = ends > when
+                if not remaining.any():
+                    return None
+                due = remaining & (requests <= when)
+                required = int(needs[due, i].max()) if due.any() else 0
+                # Growing back costs a readiness delay, so shrinking stops at what the rest of the horizon needs
+                return max(required, min(current, int(needs[remaining, i].max())))
+
+            # The next step is always due, even if the watermark lags behind
+            targets[service] = max(int(needs[0, i]), target_at(now, pod[service]) or 0)
+
+            current = targets[service]
+            for when in sorted({*requests[requests > now], *ends[ends > now]}):
+                target = target_at(when, current)
+                if target is None:
+                    # Past the horizon the next cycle decides
+                    break
+                if target != current:
+                    actions[float(when)][service] = target
+                    current = target
+
+            for k, start in enumerate(starts):
+                self.lead_time.expect(service, float(start), int(needs[k, i]), pod[service])
+
+        return targets, sorted(actions.items())
+
+    def schedule(self, actions: list[tuple[float, dict[str, int]]], scale=None):
+        self.action_queue.replace(self.name, self.namespace, actions, scale)
+
+    def observe(self, now: float, ready_pod: dict[str, int]):
+        self.lead_time.observe(now, ready_pod)
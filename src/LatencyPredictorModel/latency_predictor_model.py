@@ -1,39 +1,94 @@
 import logging
-from tensorflow.keras.models import load_model
-import joblib
-import pandas as pd
+import os
+import time
+
 import numpy as np
 
+from .numpy_engine import NumpyLatencyEngine
+
 logger = logging.getLogger("LatencyPredictorModel")
 
 
+def feature_columns(num_target: int) -> list[str]:
+    return [
+        *[f's{i}_pod' for i in range(num_target)],
+        *[f's{i}_cpu_pod' for i in range(num_target)],
+        *[f's{i}_rps' for i in range(num_target)],
+        *[f's{i}_rps_per_pod' for i in range(num_target)],
+        'cpu_node',
+    ]
+
+
+def build_features(
+    pod: np.ndarray,
+    cpu_pod: np.ndarray,
+    traffic: np.ndarray,
+    cpu_node: np.ndarray
+) -> np.ndarray:
+    # Raw inputs in feature_columns order
+    return np.column_stack((pod, cpu_pod, traffic, traffic / pod, cpu_node))
+
+
 class LatencyPredictorModel:
+    BACKENDS = ('numpy', 'keras')
+
     def __init__(
         self,
         model_path: str,
-        num_target: int
+        num_target: int,
+        backend: str = 'numpy',
+        weights_path: str | None = None
     ):
+        if backend not in self.BACKENDS:
+            raise Exception(f"Unknown latency predictor backend: {backend}.")
+
+        self.backend = backend
+        self.target = num_target
+        self.inference_observer = None
+        self.weights_path = None
+
+        if backend == 'numpy':
+            weights_path = weights_path or f"{model_path}/weights.npz"
+            if not os.path.exists(weights_path):
+                raise Exception(
+                    f"{weights_path} not found, export it with src/export_latency_predictor.py."
+                )
+            self.load_weights(weights_path)
+            return
+
+        # Deferred so that importing this module does not pull in TensorFlow
+        import joblib
+        from tensorflow.keras.models import load_model
+
         self.model = load_model(f"{model_path}/model.keras")
         self.pipelines = {
             'pre': joblib.load(f"{model_path}/preprocessing.joblib"),
             'post': joblib.load(f"{model_path}/postprocessing.joblib")
         }
-        self.target = num_target
 
-    def predict(
+    def load_weights(self, weights_path: str):
+        if self.backend != 'numpy':
+            raise Exception("Only the numpy backend can load exported weights.")
+        # A single reference swap; a prediction in flight keeps the engine it started with
+        self.engine = NumpyLatencyEngine(weights_path, feature_columns(self.target))
+        self.weights_path = weights_path
+
+    def __build_input(
         self,
-        pod: list[int],
-        cpu_pod: list[int],
-        traffic: list[float],
-        cpu_node: int,
+        pod: np.ndarray,
+        cpu_pod: np.ndarray,
+        traffic: np.ndarray,
+        cpu_node: np.ndarray,
     ):
+        import pandas as pd
+
         input_data = pd.DataFrame({
-            **{f's{i}_pod': pod[i] for i in range(self.target)},
-            **{f's{i}_cpu_pod': cpu_pod[i] for i in range(self.target)},
-            **{f's{i}_rps': traffic[i] for i in range(self.target)},
-            **{f's{i}_rps_per_pod': traffic[i] / pod[i] for i in range(self.target)},
-            **{cpu_node: cpu_node},
-        }, index=[0])
+            **{f's{i}_pod': pod[:, i] for i in range(self.target)},
+            **{f's{i}_cpu_pod': cpu_pod[:, i] for i in range(self.target)},
+            **{f's{i}_rps': traffic[:, i] for i in range(self.target)},
+            **{f's{i}_rps_per_pod': traffic[:, i] / pod[:, i] for i in range(self.target)},
+            'cpu_node': cpu_node,
+        })
 
         scale_target = [
             *[f's{i}_rps' for i in range(self.target)],
@@ -42,13 +97,49 @@ class LatencyPredictorModel:
         input_data[scale_target] = self.pipelines['pre'].transform(
             input_data[scale_target]
         )
+        return input_data
 
-        predicted_data = np.exp(
-            self.pipelines['post'].inverse_transform(
-                self.model.predict(
-                    input_data, verbose=0
+    def predict_batch(
+        self,
+        pod: np.ndarray,
+        cpu_pod: np.ndarray,
+        traffic: np.ndarray,
+        cpu_node: np.ndarray | float,
+    ) -> np.ndarray:
+        pod = np.atleast_2d(np.asarray(pod, dtype=float))
+        cpu_pod = np.broadcast_to(np.asarray(cpu_pod, dtype=float), pod.shape)
+        traffic = np.broadcast_to(np.asarray(traffic, dtype=float), pod.shape)
+        cpu_node = np.broadcast_to(np.asarray(cpu_node, dtype=float), (pod.shape[0],))
+
+        started = time.perf_counter()
+        if self.backend == 'numpy':
+            predicted_data = self.engine.predict(build_features(pod, cpu_pod, traffic, cpu_node))
+        else:
+            input_data = self.__build_input(pod, cpu_pod, traffic, cpu_node)
+
+            # A single forward pass; model.predict adds per-call overhead for small batches
+            predicted_data = np.exp(
+                self.pipelines['post'].inverse_transform(
+                    self.model(input_data.to_numpy(dtype=np.float32), training=False).numpy()
                 )
             )
+
+        if self.inference_observer is not None:
+            self.inference_observer('latency_predictor_model', time.perf_counter() - started)
+        return predicted_data
+
+    def predict(
+        self,
+        pod: list[int],
+        cpu_pod: list[int],
+        traffic: list[float],
+        cpu_node: int,
+    ):
+        predicted_data = self.predict_batch(
+            pod=np.array([pod[:self.target]]),
+            cpu_pod=np.array([cpu_pod[:self.target]]),
+            traffic=np.array([traffic[:self.target]]),
+            cpu_node=cpu_node
         )
 
         logger.info(
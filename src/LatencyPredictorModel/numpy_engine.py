@@ -0,0 +1,101 @@
+import logging
+
+import numpy as np
+
+logger = logging.getLogger("LatencyPredictorModel")
+
+FORMAT_VERSION = 1
+
+ACTIVATIONS = {
+    'linear': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0, out=x),
+    'tanh': np.tanh,
+    'sigmoid': lambda x: 1 / (1 + np.exp(-x)),
+}
+
+
+def save_weights(
+    path: str,
+    kernels: list[np.ndarray],
+    biases: list[np.ndarray],
+    activations: list[str],
+    input_columns: list[str],
+    pre_columns: list[str],
+    pre_mean: np.ndarray,
+    pre_scale: np.ndarray,
+    post_mean: np.ndarray,
+    post_scale: np.ndarray
+):
+    unsupported = [activation for activation in activations if activation not in ACTIVATIONS]
+    if unsupported:
+        raise Exception(f"Unsupported activation(s) for the NumPy engine: {unsupported}.")
+
+    np.savez(
+        path,
+        format_version=np.array(FORMAT_VERSION),
+        activations=np.array(activations),
+        input_columns=np.array(input_columns),
+        pre_columns=np.array(pre_columns),
+        pre_mean=np.asarray(pre_mean, dtype=np.float64),
+        pre_scale=np.asarray(pre_scale, dtype=np.float64),
+        post_mean=np.asarray(post_mean, dtype=np.float64),
+        post_scale=np.asarray(post_scale, dtype=np.float64),
+        **{f"kernel_{i}": np.asarray(kernel) for i, kernel in enumerate(kernels)},
+        **{f"bias_{i}": np.asarray(bias) for i, bias in enumerate(biases)},
+    )
+
+
+class NumpyLatencyEngine:
+    def __init__(self, path: str, input_columns: list[str]):
+        with np.load(path, allow_pickle=False) as weights:
+            if int(weights['format_version']) != FORMAT_VERSION:
+                raise Exception(
+                    f"Unsupported weight file version {int(weights['format_version'])} in {path}."
+                )
+            if weights['input_columns'].tolist() != list(input_columns):
+                raise Exception(f"Weight file {path} was exported for different input columns.")
+
+            activations = weights['activations'].tolist()
+            kernels = [weights[f"kernel_{i}"].astype(np.float64) for i in range(len(activations))]
+            biases = [weights[f"bias_{i}"].astype(np.float64) for i in range(len(activations))]
+            pre_columns = weights['pre_columns'].tolist()
+            pre_mean = weights['pre_mean']
+            pre_scale = weights['pre_scale']
+            post_mean = weights['post_mean']
+            post_scale = weights['post_scale']
+
+        # Fold the input standardization into the first layer:
+        # ((x - m) / s) W + b = x (W / s) + (b - (m / s) W)
+        mean = np.zeros(len(input_columns))
+        scale = np.ones(len(input_columns))
+        indices = [list(input_columns).index(column) for column in pre_columns]
+        mean[indices] = pre_mean
+        scale[indices] = pre_scale
+        biases[0] = biases[0] - (mean / scale) @ kernels[0]
+        kernels[0] = kernels[0] / scale[:, np.newaxis]
+
+        # ... and the output de-standardization into the last one
+        if activations[-1] != 'linear':
+            raise Exception("The output layer must be linear to fold the post-processing scaler.")
+        kernels[-1] = kernels[-1] * post_scale
+        biases[-1] = biases[-1] * post_scale + post_mean
+
+        self.layers = [
+            (kernel, bias, ACTIVATIONS[activation])
+            for kernel, bias, activation in zip(kernels, biases, activations)
+        ]
+        self.num_inputs = kernels[0].shape[0]
+        self.num_outputs = kernels[-1].shape[1]
+        logger.info(
+            f"Loaded NumPy latency engine with {len(self.layers)} layer(s), "
+            f"{sum(kernel.size + bias.size for kernel, bias, _ in self.layers)} parameters."
+        )
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        outputs = np.asarray(features, dtype=np.float64)
+        for kernel, bias, activation in self.layers:
+            outputs = outputs @ kernel
+            outputs += bias
+            outputs = activation(outputs)
+        # The model predicts log latency
+        return np.exp(outputs)
@@ -1,3 +1,3 @@
-from .metrics_fetcher import MetricsFetcher
+from .metrics_fetcher import MetricsFetcher, QueryStats
 
-__all__ = ['MetricsFetcher']
+__all__ = ['MetricsFetcher', 'QueryStats']
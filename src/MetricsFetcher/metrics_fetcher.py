@@ -1,49 +1,245 @@
 import concurrent.futures
-from datetime import datetime
+from dataclasses import dataclass
+from datetime import datetime, timedelta
 import logging
+import re
+import threading
+import time
 
-from prometheus_api_client import PrometheusConnect
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
 from prometheus_api_client.utils import parse_datetime
 
+from RemoteWrite import RemoteWriteReceiver, irate, rate
+
+from .traffic_window import TrafficWindow
+
 logger = logging.getLogger("MetricsFetcher")
 
+TRAFFIC_METRIC = 'mub_internal_processing_latency_milliseconds_count'
+LATENCY_METRIC = 'mub_internal_processing_latency_milliseconds_sum'
+GROUP_PATTERN = re.compile(r'^([a-z0-9]+)-[a-z0-9]+-[a-z0-9]+$')
+RATE_WINDOW = 60
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    errors: int = 0
+    last_duration: float = 0.0
+    total_duration: float = 0.0
+    last_bytes: int = 0
+    total_bytes: int = 0
+
+
 class MetricsFetcher:
-    def __init__(self, prometheus_url: str):
-        self.prometheus = PrometheusConnect(
-            url=prometheus_url, disable_ssl=True
+    def __init__(
+        self,
+        prometheus_url: str,
+        namespace: str = 'default',
+        pod_pattern: str = '^s[0-6].*',
+        incremental_traffic: bool = False,
+        context_length: int = 1440,
+        traffic_step: int = 60,
+        traffic_max_gap: int = 600,
+        traffic_late_steps: int = 2,
+        query_timeout: float = 10,
+        connect_timeout: float = 3,
+        pool_size: int = 8,
+        non_critical_metrics: list[str] | None = None,
+        receiver: RemoteWriteReceiver | None = None,
+        observe_latency: bool = False
+    ):
+        self.prometheus_url = prometheus_url.rstrip('/')
+        self.namespace = namespace
+        self.pod_pattern = pod_pattern
+        self.session = requests.Session()
+        self.session.verify = False
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=pool_size, thread_name_prefix="MetricsFetcher"
+        )
+        self.query_timeout = query_timeout
+        self.connect_timeout = connect_timeout
+
+        self.stats_lock = threading.Lock()
+        self.query_stats: dict[str, QueryStats] = {}
+        self.query_observer = None
+
+        # Metrics whose last good value may stand in for a failed query
+        self.non_critical_metrics = set(
+            non_critical_metrics if non_critical_metrics is not None else ['node_cpu', 'pod_cpu']
+        )
+        self.last_good: dict[str, object] = {}
+        self.stale_metrics: set[str] = set()
+
+        # Observed latency is only needed to label training data for the latency model
+        self.observe_latency = observe_latency
+
+        self.incremental_traffic = incremental_traffic
+        self.traffic_step = traffic_step
+        self.traffic_late_steps = traffic_late_steps
+        self.traffic_window = TrafficWindow(
+            context_length=context_length,
+            step=traffic_step,
+            max_gap=traffic_max_gap
         )
 
-    def fetch_metrics(self, fetch_starting_datetime: datetime | None):
-        logger.info("Fetching metrics from Prometheus Server.")
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            futures = {
-                executor.submit(self.fetch_traffic, start_time=fetch_starting_datetime): 'traffic',
-                executor.submit(self.fetch_node_cpu_usage): 'node_cpu',
-                executor.submit(self.fetch_pod_cpu_usage): 'pod_cpu',
-                executor.submit(self.fetch_ready_pod_count): 'ready_pod',
-                executor.submit(self.fetch_pod_count): 'pod'
+        # With a receiver, metrics are computed from pushed samples instead of PromQL;
+        # Prometheus is then only queried to backfill the traffic context
+        self.receiver = receiver
+        if receiver is not None and not incremental_traffic:
+            raise Exception("Remote write ingestion needs incremental_traffic.")
+
+    def fetch_metrics(
+        self,
+        fetch_starting_datetime: datetime | None,
+        include_pod_counts: bool = True
+    ):
+        if self.receiver is None:
+            logger.info("Fetching metrics from Prometheus Server.")
+            sources = {
+                'traffic': lambda: self.__fetch_traffic(start_time=fetch_starting_datetime),
+                'node_cpu': self.fetch_node_cpu_usage,
+                'pod_cpu': self.fetch_pod_cpu_usage,
+                'ready_pod': self.fetch_ready_pod_count,
+                'pod': self.fetch_pod_count,
+            }
+        else:
+            logger.info("Reading metrics from the remote write receiver.")
+            sources = {
+                'traffic': lambda: self.__local_traffic(start_time=fetch_starting_datetime),
+                'node_cpu': self.__local_node_cpu_usage,
+                'pod_cpu': self.__local_pod_cpu_usage,
+                'ready_pod': lambda: self.__local_count('kube_pod_status_ready', condition='true'),
+                'pod': lambda: self.__local_count('kube_pod_info'),
             }
+        if not include_pod_counts:
+            del sources['ready_pod'], sources['pod']
+        if self.observe_latency:
+            sources['latency'] = self.fetch_latency if self.receiver is None else self.__local_latency
 
-            results = {}
-            for future in concurrent.futures.as_completed(futures):
-                key = futures[future]
-                try:
-                    results[key] = future.result()
-                except Exception as e:
-                    logger.error(f"An error occurred fetching {key}: {e}")
-                    results[key] = None
+        futures = {self.executor.submit(function): key for key, function in sources.items()}
 
+        done, _ = concurrent.futures.wait(
+            futures, timeout=self.connect_timeout + self.query_timeout
+        )
+
+        results = {}
+        stale_metrics = set()
+        for future, key in futures.items():
+            try:
+                if future not in done:
+                    raise Exception("Query deadline exceeded.")
+                results[key] = future.result()
+                self.last_good[key] = results[key]
+            except Exception as e:
+                logger.error(f"An error occurred fetching {key}: {e}")
+                results[key] = None
+                if key in self.non_critical_metrics and key in self.last_good:
+                    logger.warning(f"Reusing the last good {key} value.")
+                    results[key] = self.last_good[key]
+                    stale_metrics.add(key)
+
+        self.stale_metrics = stale_metrics
         return results
 
+    def __record(self, name: str, duration: float, size: int, failed: bool):
+        with self.stats_lock:
+            stats = self.query_stats.setdefault(name, QueryStats())
+            stats.count += 1
+            stats.errors += int(failed)
+            stats.last_duration = duration
+            stats.total_duration += duration
+            stats.last_bytes = size
+            stats.total_bytes += size
+        logger.debug(f"Query {name} took {duration * 1000:.1f} ms, {size} bytes.")
+        if self.query_observer is not None:
+            self.query_observer(name, duration, size, failed)
+
+    def __request(self, name: str, path: str, params: dict) -> list[dict]:
+        started = time.perf_counter()
+        size = 0
+        try:
+            response = self.session.get(
+                f"{self.prometheus_url}{path}",
+                params=params,
+                timeout=(self.connect_timeout, self.query_timeout)
+            )
+            size = len(response.content)
+            response.raise_for_status()
+            body = response.json()
+            if body.get('status') != 'success':
+                raise Exception(f"Query {name} failed: {body.get('error')}")
+        except Exception:
+            self.__record(name, time.perf_counter() - started, size, failed=True)
+            raise
+        self.__record(name, time.perf_counter() - started, size, failed=False)
+        return body['data']['result']
+
+    def __query(self, name: str, query: str) -> list[dict]:
+        return self.__request(name, "/api/v1/query", {'query': query})
+
+    def __query_range(
+        self,
+        name: str,
+        query: str,
+        start_time: datetime,
+        end_time: datetime,
+        step: str
+    ) -> list[dict]:
+        return self.__request(name, "/api/v1/query_range", {
+            'query': query,
+            'start': start_time.timestamp(),
+            'end': end_time.timestamp(),
+            'step': step,
+        })
+
+    @staticmethod
+    def __decode_vector(response: list[dict], label: str, dtype=float) -> dict:
+        if not response:
+            return {}
+        values = np.array([item['value'][1] for item in response], dtype=float).astype(dtype)
+        return {
+            item['metric'][label]: value
+            for item, value in zip(response, values.tolist())
+        }
+
+    def remote_write_selectors(self) -> list[tuple[str, dict[str, str]]]:
+        # The raw series behind the PromQL queries below
+        pods = {'namespace': re.escape(self.namespace), 'pod': self.pod_pattern}
+        return [
+            (TRAFFIC_METRIC, pods),
+            ('container_cpu_usage_seconds_total', pods),
+            ('kube_pod_status_ready', {**pods, 'condition': 'true'}),
+            ('kube_pod_info', pods),
+            ('node_cpu_seconds_total', {'mode': 'idle'}),
+            *([(LATENCY_METRIC, pods)] if self.observe_latency else []),
+        ]
+
+    def traffic_watermark(self) -> float:
+        if self.incremental_traffic and self.traffic_window.last_timestamp is not None:
+            return self.traffic_window.last_timestamp
+        now = parse_datetime("now").timestamp()
+        return now - now % self.traffic_step
+
+    def __fetch_traffic(self, start_time: datetime | None):
+        if self.incremental_traffic:
+            return self.fetch_traffic_incremental(start_time=start_time)
+        return self.fetch_traffic(start_time=start_time)
+
     def fetch_pod_cpu_usage(self):
         query = \
-            """
+            f"""
             sum by (group) (
                 label_replace(
-                    rate(container_cpu_usage_seconds_total{
-                        namespace="default", 
-                        pod=~"^s[0-6].*"
-                    }[1m]), 
+                    rate(container_cpu_usage_seconds_total{{
+                        namespace="{self.namespace}", 
+                        pod=~"{self.pod_pattern}"
+                    }}[1m]), 
                     "group", 
                     "$1", 
                     "pod", 
@@ -53,11 +249,11 @@ class MetricsFetcher:
             / 
             count by (group) (
                 label_replace(
-                    kube_pod_status_ready{
-                        namespace="default", 
+                    kube_pod_status_ready{{
+                        namespace="{self.namespace}", 
                         condition="true", 
-                        pod=~"^s[0-6].*"
-                    },
+                        pod=~"{self.pod_pattern}"
+                    }},
                     "group",
                     "$1",
                     "pod",
@@ -65,27 +261,27 @@ class MetricsFetcher:
                 )
             ) * 100 * 0.05
             """
-        response = self.prometheus.custom_query(query=query)
-        return {item['metric']['group']: float(item['value'][1]) for item in response}
+        response = self.__query('pod_cpu', query)
+        return self.__decode_vector(response, 'group')
 
     def fetch_node_cpu_usage(self):
         query = \
             """
             (100 - (avg(irate(node_cpu_seconds_total{mode="idle"}[1m])) * 100)) / 100
             """
-        response = self.prometheus.custom_query(query=query)
+        response = self.__query('node_cpu', query)
         return {'cpu_node': float(response[0]['value'][1])}
 
     def fetch_ready_pod_count(self):
         query = \
-            """
+            f"""
             count by(group) (
                 label_replace(
-                    kube_pod_status_ready{
-                        namespace="default", 
+                    kube_pod_status_ready{{
+                        namespace="{self.namespace}", 
                         condition="true", 
-                        pod=~"^s[0-6].*"
-                    },
+                        pod=~"{self.pod_pattern}"
+                    }},
                     "group",
                     "$1",
                     "pod",
@@ -93,18 +289,18 @@ class MetricsFetcher:
                 )
             )
             """
-        response = self.prometheus.custom_query(query=query)
-        return {item['metric']['group']: int(item['value'][1]) for item in response}
+        response = self.__query('ready_pod', query)
+        return self.__decode_vector(response, 'group', dtype=int)
 
     def fetch_pod_count(self):
         query = \
-            """
+            f"""
             count by (group) (
                 label_replace(
-                    kube_pod_info{
-                        namespace="default",
-                        pod=~"^s[0-6].*"
-                    }, 
+                    kube_pod_info{{
+                        namespace="{self.namespace}",
+                        pod=~"{self.pod_pattern}"
+                    }}, 
                     "group", 
                     "$1", 
                     "pod", 
@@ -112,8 +308,90 @@ class MetricsFetcher:
                 )
             )
             """
-        response = self.prometheus.custom_query(query=query)
-        return {item['metric']['group']: int(item['value'][1]) for item in response}
+        response = self.__query('pod', query)
+        return self.__decode_vector(response, 'group', dtype=int)
+
+    def fetch_instant_pod_cpu(self, window: int = 30) -> dict:
+        # CPU cores per ready pod from the last two samples, cheap enough to poll every few seconds
+        if self.receiver is not None:
+            return self.__local_instant_pod_cpu(window)
+        query = \
+            f"""
+            sum by (group) (
+                label_replace(
+                    irate(container_cpu_usage_seconds_total{{
+                        namespace="{self.namespace}",
+                        pod=~"{self.pod_pattern}"
+                    }}[{window}s]),
+                    "group",
+                    "$1",
+                    "pod",
+                    "^([a-z0-9]+)-[a-z0-9]+-[a-z0-9]+$"
+                )
+            )
+            /
+            count by (group) (
+                label_replace(
+                    kube_pod_status_ready{{
+                        namespace="{self.namespace}",
+                        condition="true",
+                        pod=~"{self.pod_pattern}"
+                    }},
+                    "group",
+                    "$1",
+                    "pod",
+                    "^([a-z0-9]+)-[a-z0-9]+-[a-z0-9]+$"
+                )
+            )
+            """
+        response = self.__query('instant_pod_cpu', query)
+        return self.__decode_vector(response, 'group')
+
+    def fetch_pod_state(self) -> tuple[dict, dict]:
+        if self.receiver is not None:
+            return (
+                self.__local_count('kube_pod_status_ready', condition='true'),
+                self.__local_count('kube_pod_info')
+            )
+        return self.fetch_ready_pod_count(), self.fetch_pod_count()
+
+    def fetch_latency(self):
+        query = \
+            f"""
+            sum by (app_name) (
+                rate(
+                    {LATENCY_METRIC}{{
+                        namespace="{self.namespace}",
+                        pod=~"{self.pod_pattern}"
+                    }}[1m]
+                )
+            )
+            /
+            sum by (app_name) (
+                rate(
+                    {TRAFFIC_METRIC}{{
+                        namespace="{self.namespace}",
+                        pod=~"{self.pod_pattern}"
+                    }}[1m]
+                )
+            )
+            """
+        response = self.__query('latency', query)
+        return self.__decode_vector(response, 'app_name')
+
+    def __query_traffic(self, start_time: datetime, end_time: datetime, step: str):
+        query = \
+            f"""
+            sum by (app_name) (
+                rate(
+                    mub_internal_processing_latency_milliseconds_count{{
+                        namespace="{self.namespace}",
+                        pod=~"{self.pod_pattern}"
+                    }}[1m]
+                )
+            )
+            """
+        return self.__query_range('traffic', query, start_time, end_time, step)
 
     def fetch_traffic(
         self,
@@ -126,22 +404,146 @@ class MetricsFetcher:
         if end_time is None:
             end_time = parse_datetime("now")
 
-        query = \
-            """
-            sum by (app_name) (
-                rate(
-                    mub_internal_processing_latency_milliseconds_count{
-                        namespace="default",
-                        pod=~"^s[0-6].*"
-                    }[1m]
-                )
+        response = self.__query_traffic(start_time, end_time, step)
+        return {
+            item['metric']['app_name']: np.array(item['values'], dtype=float)[:, 1]
+            for item in response
+        }
+
+    def fetch_traffic_incremental(self, start_time: datetime = None):
+        end_time = parse_datetime("now")
+        window = self.traffic_window
+
+        if window.needs_backfill(end_time.timestamp()):
+            backfill_start = end_time - timedelta(
+                seconds=window.context_length * self.traffic_step
             )
-            """
-        response = self.prometheus.custom_query_range(
-            query=query,
-            start_time=start_time,
-            end_time=end_time,
-            step=step,
+            if start_time is not None and start_time > backfill_start:
+                backfill_start = start_time
+            # Keep samples on step boundaries so they line up with the control cycle
+            backfill_start -= timedelta(seconds=backfill_start.timestamp() % self.traffic_step)
+            logger.info(f"Backfilling traffic window from {backfill_start}.")
+            window.reset()
+            start = backfill_start
+        else:
+            # Re-fetch the last few steps to pick up late samples
+            start = datetime.fromtimestamp(
+                window.last_timestamp - self.traffic_late_steps * self.traffic_step,
+                tz=end_time.tzinfo
+            )
+            if start_time is not None and start_time > start:
+                start = start_time
+
+        response = self.__query_traffic(start, end_time, f"{self.traffic_step}s")
+        window.update(response)
+        return window.to_columns()
+
+    def __select_pods(self, name: str, at: float | None = None, **matchers):
+        return self.receiver.store.select(
+            name,
+            {'namespace': re.escape(self.namespace), 'pod': self.pod_pattern, **matchers},
+            at=at
+        )
+
+    @staticmethod
+    def __group(series) -> str | None:
+        match = GROUP_PATTERN.match(series.labels.get('pod', ''))
+        return match.group(1) if match else None
+
+    def __local_count(self, name: str, **matchers) -> dict:
+        # Like count by (group): every live series counts, whatever its value
+        counts = {}
+        for series in self.__select_pods(name, at=time.time(), **matchers):
+            group = self.__group(series)
+            if group is not None:
+                counts[group] = counts.get(group, 0) + 1
+        return counts
+
+    def __local_pod_cpu_usage(self) -> dict:
+        now = time.time()
+        usage = {}
+        for series in self.__select_pods('container_cpu_usage_seconds_total'):
+            group = self.__group(series)
+            value = rate(series, now - RATE_WINDOW, now)
+            if group is not None and value is not None:
+                usage[group] = usage.get(group, 0) + value
+        ready = self.__local_count('kube_pod_status_ready', condition='true')
+        return {
+            group: value / ready[group] * 100 * 0.05
+            for group, value in usage.items()
+            if ready.get(group)
+        }
+
+    def __local_instant_pod_cpu(self, window: int) -> dict:
+        now = time.time()
+        usage = {}
+        for series in self.__select_pods('container_cpu_usage_seconds_total', at=now):
+            group = self.__group(series)
+            value = irate(series, now - window, now)
+            if group is not None and value is not None:
+                usage[group] = usage.get(group, 0) + value
+        ready = self.__local_count('kube_pod_status_ready', condition='true')
+        return {
+            group: value / ready[group]
+            for group, value in usage.items()
+            if ready.get(group)
+        }
+
+    def __local_node_cpu_usage(self) -> dict:
+        now = time.time()
+        rates = [
+            value for value in (
+                irate(series, now - RATE_WINDOW, now)
+                for series in self.receiver.store.select('node_cpu_seconds_total', {'mode': 'idle'})
+            )
+            if value is not None
+        ]
+        if not rates:
+            raise Exception("No idle node CPU samples received yet.")
+        return {'cpu_node': (100 - (sum(rates) / len(rates)) * 100) / 100}
+
+    def __local_latency(self) -> dict:
+        now = time.time()
+        totals = {}
+        for name, index in ((LATENCY_METRIC, 0), (TRAFFIC_METRIC, 1)):
+            for series in self.__select_pods(name):
+                service = series.labels.get('app_name')
+                value = rate(series, now - RATE_WINDOW, now)
+                if service is not None and value is not None:
+                    totals.setdefault(service, [0.0, 0.0])[index] += value
+        return {
+            service: latency / requests
+            for service, (latency, requests) in totals.items()
+            if requests > 0
+        }
+
+    def __local_traffic(self, start_time: datetime | None):
+        now = time.time()
+        window = self.traffic_window
+        if window.needs_backfill(now):
+            # The receiver only holds a few minutes; the long context comes from Prometheus once
+            return self.fetch_traffic_incremental(start_time=start_time)
+
+        step = self.traffic_step
+        timestamps = np.arange(
+            window.last_timestamp - self.traffic_late_steps * step,
+            now - now % step + step / 2,
+            step
         )
+        values: dict[str, dict[float, float]] = {}
+        for series in self.__select_pods(TRAFFIC_METRIC):
+            service = series.labels.get('app_name')
+            if service is None:
+                continue
+            points = values.setdefault(service, {})
+            for timestamp in timestamps.tolist():
+                value = rate(series, timestamp - RATE_WINDOW, timestamp)
+                if value is not None:
+                    points[timestamp] = points.get(timestamp, 0) + value
 
-        return {item['metric']['app_name']: [float(value[1]) for value in item['values']] for item in response}
+        window.update([
+            {'metric': {'app_name': service}, 'values': sorted(points.items())}
+            for service, points in values.items()
+            if points
+        ])
+        return window.to_columns()
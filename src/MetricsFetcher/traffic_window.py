@@ -0,0 +1,106 @@
+import logging
+
+import numpy as np
+
+logger = logging.getLogger("TrafficWindow")
+
+
+class TrafficWindow:
+    def __init__(self, context_length: int, step: int, max_gap: int):
+        self.context_length = context_length
+        self.step = step
+        self.max_gap = max_gap
+
+        self.columns: dict[str, int] = {}
+        self.values = np.full((context_length, 0), np.nan)
+        self.head = -1
+        self.last_timestamp: float | None = None
+
+    def needs_backfill(self, now: float) -> bool:
+        return self.last_timestamp is None or now - self.last_timestamp > self.max_gap
+
+    def reset(self):
+        self.values = np.full((self.context_length, len(self.columns)), np.nan)
+        self.head = -1
+        self.last_timestamp = None
+
+    def __add_column(self, service: str) -> int:
+        self.columns[service] = len(self.columns)
+        self.values = np.hstack(
+            (self.values, np.full((self.context_length, 1), np.nan))
+        )
+        return self.columns[service]
+
+    def __advance(self, timestamp: float):
+        if self.last_timestamp is None:
+            self.head = self.context_length - 1
+            self.last_timestamp = timestamp
+            return
+
+        num_steps = int(round((timestamp - self.last_timestamp) / self.step))
+        if num_steps >= self.context_length:
+            self.values[:] = np.nan
+        else:
+            slots = (self.head + np.arange(1, num_steps + 1)) % self.context_length
+            self.values[slots] = np.nan
+        self.head = (self.head + num_steps) % self.context_length
+        self.last_timestamp += num_steps * self.step
+
+    def __slot(self, timestamp: float) -> int | None:
+        offset = int(round((self.last_timestamp - timestamp) / self.step))
+        if offset < 0 or offset >= self.context_length:
+            return None
+        return (self.head - offset) % self.context_length
+
+    def update(self, response: list[dict]):
+        samples = []
+        for item in response:
+            service = item['metric'].get('app_name')
+            if service is None:
+                continue
+            column = self.columns.get(service)
+            if column is None:
+                column = self.__add_column(service)
+            values = np.asarray(item['values'], dtype=float).reshape(-1, 2)
+            samples.append((column, values))
+
+        timestamps = [values[:, 0].max() for _, values in samples if len(values)]
+        if not timestamps:
+            return
+
+        latest = max(timestamps)
+        if self.last_timestamp is None or latest > self.last_timestamp:
+            self.__advance(latest)
+
+        late_samples = 0
+        for column, values in samples:
+            for timestamp, value in values:
+                slot = self.__slot(timestamp)
+                if slot is None:
+                    continue
+                if not np.isnan(self.values[slot, column]) and self.values[slot, column] != value:
+                    late_samples += 1
+                self.values[slot, column] = value
+
+        if late_samples > 0:
+            logger.debug(f"Updated {late_samples} late traffic sample(s).")
+
+    def to_array(self) -> np.ndarray:
+        if self.last_timestamp is None:
+            return np.zeros((0, len(self.columns)))
+
+        ordered = np.roll(self.values, -(self.head + 1), axis=0)
+
+        # Forward fill gaps; slots before the first sample stay zero
+        mask = np.isnan(ordered)
+        indices = np.where(~mask, np.arange(len(ordered))[:, None], 0)
+        np.maximum.accumulate(indices, axis=0, out=indices)
+        filled = ordered[indices, np.arange(ordered.shape[1])]
+        return np.nan_to_num(filled, nan=0.0)
+
+    def to_columns(self) -> dict[str, np.ndarray]:
+        array = self.to_array()
+        return {
+            service: array[:, column]
+            for service, column in self.columns.items()
+        }
@@ -0,0 +1,3 @@
+from .model_registry import ModelRegistry, VersionStats, version_name
+
+__all__ = ['ModelRegistry', 'VersionStats', 'version_name']
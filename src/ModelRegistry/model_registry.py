@@ -0,0 +1,323 @@
+import concurrent.futures
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+logger = logging.getLogger("ModelRegistry")
+
+ERROR_METRICS = {
+    'traffic_forecaster_model': ('mae', 'rmse'),
+    'latency_predictor_model': ('log_rmse', 'mape'),
+}
+# Memoized predictions a promotion invalidates
+CACHES = {
+    'traffic_forecaster_model': 'forecasts',
+    'latency_predictor_model': 'latencies',
+}
+
+# Set on the evaluation threads, whose calls stay out of the live inference metrics
+_evaluation = threading.local()
+
+
+def version_name(model_path: str) -> str:
+    return os.path.basename(model_path.rstrip('/'))
+
+
+class VersionStats:
+    def __init__(self, metrics: tuple[str, ...], window: int):
+        self.errors = {metric: deque(maxlen=window) for metric in metrics}
+        self.inference_seconds = deque(maxlen=window)
+        self.scored = 0
+
+    def record_errors(self, **errors: float):
+        for metric, value in errors.items():
+            self.errors[metric].append(value)
+        self.scored += 1
+
+    def summary(self) -> dict:
+        errors = {}
+        for metric, values in self.errors.items():
+            if not values:
+                continue
+            mean = float(np.mean(values))
+            # rmse-style metrics are averaged as squares and rooted on the way out
+            errors[metric] = float(np.sqrt(mean)) if metric.endswith('rmse') else mean
+        return {
+            'scored': self.scored,
+            'errors': errors,
+            'inference_seconds': float(np.mean(self.inference_seconds)) if self.inference_seconds else None,
+        }
+
+
+class _ActiveModel:
+    # Stands in for the active version, so promotion swaps what every holder calls
+    def __init__(self, family: '_ModelFamily'):
+        object.__setattr__(self, '_family', family)
+
+    def __getattr__(self, name: str):
+        version = self._family.active_version
+        value = getattr(self._family.models[version], name)
+        if not callable(value):
+            return value
+        lock = self._family.locks[version]
+
+        def locked(*args, **kwargs):
+            # A version is never run by two threads at once; models reuse their input buffers
+            with lock:
+                return value(*args, **kwargs)
+        return locked
+
+    def __setattr__(self, name: str, value):
+        if name == 'inference_observer':
+            self._family.inference_observer = value
+        else:
+            setattr(self._family.models[self._family.active_version], name, value)
+
+
+class _ModelFamily:
+    def __init__(self, name: str, active_version: str, model, window: int):
+        self.name = name
+        self.window = window
+        self.models = {}
+        self.locks: dict[str, threading.Lock] = {}
+        self.stats: dict[str, VersionStats] = {}
+        self.loading: dict[str, str] = {}
+        self.active_version = active_version
+        self.pending_version: str | None = None
+        self.inference_observer = model.inference_observer
+        self.add(active_version, model)
+        model.inference_observer = self.observe_inference
+        self.proxy = _ActiveModel(self)
+
+    def add(self, version: str, model):
+        self.stats[version] = VersionStats(ERROR_METRICS[self.name], self.window)
+        if version != self.active_version:
+            # Shadow calls time themselves and stay out of the live inference metrics
+            model.inference_observer = None
+        self.locks[version] = threading.Lock()
+        self.models[version] = model
+        self.loading.pop(version, None)
+
+    def shadows(self) -> list[str]:
+        return [version for version in list(self.models) if version != self.active_version]
+
+    def observe_inference(self, model_name: str, seconds: float):
+        if getattr(_evaluation, 'active', False):
+            return
+        self.stats[self.active_version].inference_seconds.append(seconds)
+        if self.inference_observer is not None:
+            self.inference_observer(model_name, seconds)
+
+
+class ModelRegistry:
+    def __init__(self, pool_size: int = 2, max_pending: int = 16, error_window: int = 1440, forecast_horizon: int = 10):
+        self.families: dict[str, _ModelFamily] = {}
+        self.error_window = error_window
+        self.max_pending = max_pending
+        self.forecast_horizon = forecast_horizon
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=pool_size, thread_name_prefix="ModelRegistry"
+        )
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.dropped_jobs = 0
+        self.prediction_caches: dict = {}
+
+        # app -> target timestamp -> version -> forecast
+        self.pending_forecasts: dict[str, dict[float, dict[str, np.ndarray]]] = {}
+        # app -> the last observed (pod, cpu_pod, traffic, cpu_node, latency), scored after the cycle acts
+        self.pending_latencies: dict[str, tuple] = {}
+
+    def add_model(self, name: str, version: str, model):
+        if name not in ERROR_METRICS:
+            raise Exception(f"Unknown model family {name}.")
+        self.families[name] = _ModelFamily(name, version, model, self.error_window)
+        return self.families[name].proxy
+
+    def load_shadow(self, name: str, version: str, factory):
+        family = self.families[name]
+        if version in family.models or version in family.loading:
+            raise Exception(f"{name} version {version} is already registered.")
+        family.loading[version] = 'loading'
+
+        def load():
+            started = time.perf_counter()
+            try:
+                family.add(version, factory())
+            except Exception as e:
+                family.loading[version] = 'failed'
+                logger.error(f"Failed to load shadow {name} version {version}: {e}")
+                return
+            logger.info(f"Loaded shadow {name} version {version} in {time.perf_counter() - started:.2f}s.")
+
+        # Shadow loading never holds up startup
+        threading.Thread(target=load, name=f"ModelRegistry-{name}-{version}", daemon=True).start()
+
+    def __submit(self, function, *args) -> bool:
+        with self.lock:
+            if self.in_flight >= self.max_pending:
+                # Shadows fall behind rather than queue up work without bound
+                self.dropped_jobs += 1
+                return False
+            self.in_flight += 1
+
+        def run():
+            _evaluation.active = True
+            try:
+                function(*args)
+            except Exception as e:
+                logger.error(f"Shadow evaluation failed: {e}")
+            finally:
+                with self.lock:
+                    self.in_flight -= 1
+
+        self.executor.submit(run)
+        return True
+
+    @staticmethod
+    def __timed(family: _ModelFamily, version: str, function):
+        with family.locks[version]:
+            started = time.perf_counter()
+            result = function()
+            family.stats[version].inference_seconds.append(time.perf_counter() - started)
+        return result
+
+    def record_forecast(self, app: str, target_timestamp: float, window: np.ndarray, point):
+        family = self.families.get('traffic_forecaster_model')
+        if family is None:
+            return
+        with self.lock:
+            pending = self.pending_forecasts.setdefault(app, {})
+            pending[target_timestamp] = {family.active_version: np.asarray(point, dtype=float)}
+            for timestamp in sorted(pending)[:-self.forecast_horizon]:
+                del pending[timestamp]
+
+        shadows = family.shadows()
+        if not shadows:
+            return
+        # The history window may be a view into a ring buffer that moves on
+        window = np.array(window, dtype=np.float32)
+
+        def evaluate():
+            for version in shadows:
+                forecast = self.__timed(family, version, lambda: family.models[version].predict(window))
+                with self.lock:
+                    slot = self.pending_forecasts.get(app, {}).get(target_timestamp)
+                    if slot is not None:
+                        slot[version] = np.asarray(forecast, dtype=float)
+
+        self.__submit(evaluate)
+
+    def observe_traffic(self, app: str, watermark: float, step: float, traffic: np.ndarray):
+        family = self.families.get('traffic_forecaster_model')
+        if family is None:
+            return
+        with self.lock:
+            pending = self.pending_forecasts.get(app, {})
+            due = [timestamp for timestamp in pending if timestamp <= watermark]
+            forecasts = {timestamp: pending.pop(timestamp) for timestamp in due}
+
+        for timestamp, versions in forecasts.items():
+            offset = int(round((watermark - timestamp) / step))
+            if offset >= len(traffic):
+                continue
+            actual = np.asarray(traffic[len(traffic) - 1 - offset], dtype=float)
+            for version, forecast in versions.items():
+                if version not in family.stats:
+                    continue
+                errors = forecast - actual
+                family.stats[version].record_errors(
+                    mae=float(np.mean(np.abs(errors))),
+                    rmse=float(np.mean(errors ** 2))
+                )
+
+    def observe_latency(self, app: str, pod, cpu_pod, traffic, cpu_node: float, latency):
+        # Held until the cycle has acted, so scoring never competes with the decision for a model
+        if 'latency_predictor_model' not in self.families:
+            return
+        with self.lock:
+            self.pending_latencies[app] = (pod, cpu_pod, traffic, cpu_node, latency)
+
+    def score_latency(self, app: str):
+        # Every version predicts the latency of the state that was actually observed
+        family = self.families.get('latency_predictor_model')
+        if family is None:
+            return
+        with self.lock:
+            observation = self.pending_latencies.pop(app, None)
+        if observation is None or not family.shadows():
+            return
+        pod, cpu_pod, traffic, cpu_node, latency = observation
+        inputs = tuple(np.array(values, dtype=float) for values in (pod, cpu_pod, traffic, [cpu_node]))
+        actual = np.asarray(latency, dtype=float)
+        if np.any(actual <= 0):
+            return
+
+        def evaluate():
+            for version in list(family.models):
+                model = family.models[version]
+                if version == family.active_version:
+                    # The active version's cost is measured on the live path
+                    with family.locks[version]:
+                        predicted = model.predict_batch(*inputs)[0]
+                else:
+                    predicted = self.__timed(family, version, lambda: model.predict_batch(*inputs)[0])
+                predicted = np.asarray(predicted, dtype=float)
+                family.stats[version].record_errors(
+                    log_rmse=float(np.mean((np.log(predicted) - np.log(actual)) ** 2)),
+                    mape=float(np.mean(np.abs(predicted - actual) / actual))
+                )
+
+        self.__submit(evaluate)
+
+    def promote(self, name: str, version: str):
+        family = self.families.get(name)
+        if family is None:
+            raise Exception(f"Unknown model family {name}.")
+        if version not in family.models:
+            raise Exception(f"{name} version {version} is not loaded.")
+        family.pending_version = version
+        logger.info(f"Promoting {name} version {version} at the next cycle.")
+
+    def apply_pending(self):
+        # Called between control cycles, so one cycle never mixes two versions
+        for family in self.families.values():
+            version = family.pending_version
+            if version is None:
+                continue
+            family.pending_version = None
+            if version == family.active_version:
+                continue
+
+            previous = family.active_version
+            family.models[previous].inference_observer = None
+            family.models[version].inference_observer = family.observe_inference
+            family.active_version = version
+            for prediction_cache in self.prediction_caches.values():
+                getattr(prediction_cache, CACHES[family.name]).clear()
+            logger.info(
+                f"{family.name} version {version} is now active, {previous} keeps running as a shadow."
+            )
+
+    def status(self) -> dict:
+        return {
+            'models': {
+                name: {
+                    'active': family.active_version,
+                    'pending': family.pending_version,
+                    'versions': {
+                        **{version: {'state': state} for version, state in list(family.loading.items())},
+                        **{
+                            version: {'state': 'ready', **family.stats[version].summary()}
+                            for version in list(family.models)
+                        },
+                    },
+                }
+                for name, family in self.families.items()
+            },
+            'dropped_jobs': self.dropped_jobs,
+        }
@@ -0,0 +1,4 @@
+from .model_clients import LatencyPredictorClient, TrafficForecasterClient
+from .model_worker import ModelWorker, WorkerUnavailable
+
+__all__ = ['LatencyPredictorClient', 'ModelWorker', 'TrafficForecasterClient', 'WorkerUnavailable']
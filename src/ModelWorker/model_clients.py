@@ -0,0 +1,128 @@
+import logging
+import time
+
+import numpy as np
+
+from .model_worker import ModelWorker
+
+logger = logging.getLogger("ModelWorker")
+
+
+class _ModelClient:
+    def __init__(self, worker: ModelWorker, model_name: str):
+        self.worker = worker
+        self.model_name = model_name
+        self.inference_observer = None
+
+    def _call(self, method: str, *arrays: np.ndarray, **kwargs):
+        started = time.perf_counter()
+        result = self.worker.call(method, *arrays, **kwargs)
+        if self.inference_observer is not None:
+            self.inference_observer(self.model_name, time.perf_counter() - started)
+        return result
+
+
+class LatencyPredictorClient(_ModelClient):
+    ATTRIBUTES = ['backend', 'weights_path']
+
+    def __init__(self, worker: ModelWorker):
+        super().__init__(worker, 'latency_predictor_model')
+
+    def __getattr__(self, name: str):
+        if name in self.ATTRIBUTES and name in self.worker.attributes:
+            return self.worker.attributes[name]
+        raise AttributeError(name)
+
+    def load_weights(self, weights_path: str):
+        self.worker.call('load_weights', weights_path=weights_path)
+        # A restarted worker comes back with the swapped weights
+        self.worker.kwargs['weights_path'] = weights_path
+        self.worker.attributes['weights_path'] = weights_path
+
+    def predict_batch(
+        self,
+        pod: np.ndarray,
+        cpu_pod: np.ndarray,
+        traffic: np.ndarray,
+        cpu_node: np.ndarray | float,
+    ) -> np.ndarray:
+        pod = np.atleast_2d(np.asarray(pod, dtype=float))
+        return self._call(
+            'predict_batch',
+            pod,
+            np.broadcast_to(np.asarray(cpu_pod, dtype=float), pod.shape),
+            np.broadcast_to(np.asarray(traffic, dtype=float), pod.shape),
+            np.broadcast_to(np.asarray(cpu_node, dtype=float), (pod.shape[0],))
+        )
+
+    def predict(
+        self,
+        pod: list[int],
+        cpu_pod: list[int],
+        traffic: list[float],
+        cpu_node: int,
+    ):
+        predicted_data = self.predict_batch(
+            pod=np.array([pod]),
+            cpu_pod=np.array([cpu_pod]),
+            traffic=np.array([traffic]),
+            cpu_node=cpu_node
+        )
+
+        logger.info(
+            f"Predicted latency: {[round(data, 2) for data in predicted_data[0].tolist()]}.")
+
+        return {
+            f's{i}': value
+            for i, value in enumerate(predicted_data[0].tolist())
+        }
+
+
+class TrafficForecasterClient(_ModelClient):
+    ATTRIBUTES = ['context_length', 'num_channels', 'distribution', 'backend']
+
+    def __init__(self, worker: ModelWorker):
+        super().__init__(worker, 'traffic_forecaster_model')
+
+    def __getattr__(self, name: str):
+        # Static model properties are reported by the worker once it has loaded
+        if name in self.ATTRIBUTES and name in self.worker.attributes:
+            return self.worker.attributes[name]
+        raise AttributeError(name)
+
+    def predict(self, past_values: np.ndarray) -> list[float]:
+        return self._call('predict', np.asarray(past_values, dtype=np.float32))
+
+    def predict_batch(self, past_values: np.ndarray, batch_size: int = 64) -> np.ndarray:
+        return self._call(
+            'predict_batch', np.asarray(past_values, dtype=np.float32), batch_size=batch_size
+        )
+
+    def predict_quantiles(self, past_values: np.ndarray, quantiles: list[float]):
+        return self._call(
+            'predict_quantiles', np.asarray(past_values, dtype=np.float32), quantiles=list(quantiles)
+        )
+
+    def predict_quantiles_batch(self, past_values: np.ndarray, quantiles: list[float], batch_size: int = 64):
+        return self._call(
+            'predict_quantiles_batch', np.asarray(past_values, dtype=np.float32),
+            quantiles=list(quantiles), batch_size=batch_size
+        )
+
+    def predict_horizon(self, past_values: np.ndarray, horizon: int, quantiles: list[float] | None = None):
+        return self._call(
+            'predict_horizon', np.asarray(past_values, dtype=np.float32),
+            horizon=horizon, quantiles=list(quantiles or [])
+        )
+
+    def predict_horizon_batch(
+        self,
+        past_values: np.ndarray,
+        horizon: int,
+        quantiles: list[float] | None = None,
+        batch_size: int = 64
+    ):
+        return self._call(
+            'predict_horizon_batch', np.asarray(past_values, dtype=np.float32),
+            horizon=horizon, quantiles=list(quantiles or []), batch_size=batch_size
+        )
@@ -0,0 +1,283 @@
+import importlib
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+logger = logging.getLogger("ModelWorker")
+
+# Every thread pool TensorFlow, torch and the BLAS libraries may size from the environment
+THREAD_VARIABLES = (
+    'OMP_NUM_THREADS',
+    'MKL_NUM_THREADS',
+    'OPENBLAS_NUM_THREADS',
+    'TF_NUM_INTRAOP_THREADS',
+    'TF_NUM_INTEROP_THREADS',
+)
+
+ALIGNMENT = 64
+
+
+def _aligned(size: int) -> int:
+    return (size + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class WorkerUnavailable(Exception):
+    pass
+
+
+def _serve(connection, target: str, kwargs: dict, attributes: list[str], num_threads: int, cpu_affinity):
+    # Runs in the worker process; the thread limits must be set before the runtimes load
+    for variable in THREAD_VARIABLES:
+        os.environ[variable] = str(num_threads)
+    if cpu_affinity:
+        os.sched_setaffinity(0, cpu_affinity)
+
+    module_name, class_name = target.split(':')
+    try:
+        model = getattr(importlib.import_module(module_name), class_name)(**kwargs)
+    except Exception as e:
+        connection.send(('error', f"{type(e).__name__}: {e}"))
+        return
+    connection.send(('ready', {
+        attribute: getattr(model, attribute)
+        for attribute in attributes
+        if hasattr(model, attribute)
+    }))
+
+    input_memory = output_memory = None
+    while True:
+        try:
+            message = connection.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+
+        if message[0] == 'stop':
+            break
+
+        if message[0] == 'remap':
+            for memory in (input_memory, output_memory):
+                if memory is not None:
+                    memory.close()
+            input_memory = SharedMemory(name=message[1])
+            output_memory = SharedMemory(name=message[2])
+            continue
+
+        _, method, layout, method_kwargs = message
+        try:
+            arrays = [
+                np.ndarray(shape, dtype=dtype, buffer=input_memory.buf, offset=offset)
+                for offset, shape, dtype in layout
+            ]
+            result = getattr(model, method)(*arrays, **method_kwargs)
+            del arrays
+            if isinstance(result, np.ndarray) and result.nbytes <= output_memory.size:
+                output = np.ndarray(result.shape, dtype=result.dtype, buffer=output_memory.buf)
+                output[...] = result
+                del output
+                connection.send(('shm', result.shape, result.dtype.str))
+            else:
+                # Small structured results (lists, dicts, tuples) go through the pipe
+                connection.send(('pickle', result))
+        except Exception as e:
+            connection.send(('error', f"{type(e).__name__}: {e}"))
+
+    for memory in (input_memory, output_memory):
+        if memory is not None:
+            memory.close()
+
+
+class ModelWorker:
+    LOADING = 'loading'
+    READY = 'ready'
+    FAILED = 'failed'
+
+    def __init__(
+        self,
+        name: str,
+        target: str,
+        kwargs: dict | None = None,
+        attributes: list[str] | None = None,
+        num_threads: int = 1,
+        cpu_affinity: list[int] | None = None,
+        buffer_bytes: int = 16 * 1024 * 1024,
+        call_timeout: float = 30,
+        start_timeout: float = 300,
+        restart_backoff: float = 5,
+        max_restart_backoff: float = 60
+    ):
+        self.name = name
+        self.target = target
+        self.kwargs = kwargs or {}
+        self.attribute_names = list(attributes or [])
+        self.num_threads = num_threads
+        self.cpu_affinity = cpu_affinity
+        self.call_timeout = call_timeout
+        self.start_timeout = start_timeout
+        self.restart_backoff = restart_backoff
+        self.max_restart_backoff = max_restart_backoff
+
+        # Spawn, never fork: the parent may already hold threads and locks
+        self.context = multiprocessing.get_context('spawn')
+        self.lock = threading.Lock()
+        self.available = threading.Event()
+        self.process = None
+        self.connection = None
+        self.attributes: dict = {}
+        self.restarts = 0
+        self.state_observer = None
+        self.stopped = False
+
+        self.input_memory = SharedMemory(create=True, size=buffer_bytes)
+        self.output_memory = SharedMemory(create=True, size=buffer_bytes)
+
+        self.supervisor = threading.Thread(
+            target=self.__supervise, name=f"ModelWorker-{name}", daemon=True
+        )
+
+    def __set_state(self, state: str):
+        if self.state_observer is not None:
+            self.state_observer(self.name, state)
+
+    def __launch(self):
+        connection, child_connection = self.context.Pipe()
+        process = self.context.Process(
+            target=_serve,
+            args=(
+                child_connection, self.target, self.kwargs, self.attribute_names,
+                self.num_threads, self.cpu_affinity
+            ),
+            name=f"ModelWorker-{self.name}",
+            daemon=True
+        )
+        started = time.perf_counter()
+        process.start()
+        child_connection.close()
+
+        if not connection.poll(self.start_timeout):
+            process.kill()
+            raise Exception(f"{self.name} worker did not load within {self.start_timeout}s.")
+        try:
+            kind, payload = connection.recv()
+        except EOFError:
+            process.join()
+            raise Exception(f"{self.name} worker exited with code {process.exitcode} while loading.")
+        if kind == 'error':
+            process.join()
+            raise Exception(f"{self.name} worker failed to load: {payload}")
+
+        connection.send(('remap', self.input_memory.name, self.output_memory.name))
+        self.process = process
+        self.connection = connection
+        self.attributes = payload
+        self.available.set()
+        logger.info(
+            f"Started {self.name} worker (pid {process.pid}) in {time.perf_counter() - started:.2f}s."
+        )
+
+    def start(self):
+        self.__set_state(self.LOADING)
+        try:
+            with self.lock:
+                self.__launch()
+        except Exception:
+            self.__set_state(self.FAILED)
+            for memory in (self.input_memory, self.output_memory):
+                memory.close()
+                memory.unlink()
+            raise
+        self.supervisor.start()
+        self.__set_state(self.READY)
+        return self
+
+    def __supervise(self):
+        while not self.stopped:
+            self.process.join()
+            if self.stopped:
+                return
+            self.available.clear()
+            self.__set_state(self.LOADING)
+            logger.error(f"{self.name} worker exited with code {self.process.exitcode}, restarting.")
+
+            backoff = self.restart_backoff
+            while not self.stopped:
+                time.sleep(backoff)
+                try:
+                    with self.lock:
+                        self.__launch()
+                    self.restarts += 1
+                    self.__set_state(self.READY)
+                    break
+                except Exception as e:
+                    logger.error(f"Failed to restart the {self.name} worker: {e}")
+                    backoff = min(backoff * 2, self.max_restart_backoff)
+
+    def __remap(self, required: int):
+        size = max(required, self.input_memory.size * 2)
+        logger.info(f"Growing the {self.name} input buffer to {size} bytes.")
+        previous = self.input_memory
+        self.input_memory = SharedMemory(create=True, size=size)
+        self.connection.send(('remap', self.input_memory.name, self.output_memory.name))
+        previous.close()
+        previous.unlink()
+
+    def call(self, method: str, *arrays: np.ndarray, **kwargs):
+        if not self.available.is_set():
+            raise WorkerUnavailable(f"{self.name} worker is restarting.")
+
+        with self.lock:
+            arrays = [np.ascontiguousarray(array) for array in arrays]
+            required = sum(_aligned(array.nbytes) for array in arrays)
+            try:
+                if required > self.input_memory.size:
+                    self.__remap(required)
+
+                layout = []
+                offset = 0
+                view = None
+                for array in arrays:
+                    view = np.ndarray(array.shape, dtype=array.dtype, buffer=self.input_memory.buf, offset=offset)
+                    view[...] = array
+                    layout.append((offset, array.shape, array.dtype.str))
+                    offset += _aligned(array.nbytes)
+                del view
+
+                self.connection.send(('call', method, layout, kwargs))
+                if not self.connection.poll(self.call_timeout):
+                    # A hung worker is as good as a dead one; the supervisor brings it back
+                    self.available.clear()
+                    self.process.kill()
+                    raise WorkerUnavailable(
+                        f"{self.name} worker did not answer {method} within {self.call_timeout}s."
+                    )
+                reply = self.connection.recv()
+            except (EOFError, OSError) as e:
+                self.available.clear()
+                raise WorkerUnavailable(f"{self.name} worker died: {e}")
+
+            if reply[0] == 'error':
+                raise Exception(f"{self.name} worker failed on {method}: {reply[1]}")
+            if reply[0] == 'pickle':
+                return reply[1]
+            _, shape, dtype = reply
+            return np.ndarray(shape, dtype=dtype, buffer=self.output_memory.buf).copy()
+
+    def stop(self):
+        self.stopped = True
+        self.available.clear()
+        with self.lock:
+            if self.process is not None and self.process.is_alive():
+                try:
+                    self.connection.send(('stop',))
+                except OSError:
+                    pass
+                self.process.join(5)
+                if self.process.is_alive():
+                    self.process.kill()
+            for memory in (self.input_memory, self.output_memory):
+                memory.close()
+                memory.unlink()
@@ -0,0 +1,3 @@
+from .multi_app_controller import HashRing, MultiAppController, shard_applications
+
+__all__ = ['HashRing', 'MultiAppController', 'shard_applications']
@@ -0,0 +1,406 @@
+import bisect
+import concurrent.futures
+import contextlib
+import hashlib
+import logging
+import time
+
+import numpy as np
+
+from Controller import Controller
+from Exporter import Exporter
+from LatencyPredictorModel import LatencyPredictorModel
+from ModelRegistry import ModelRegistry
+from ModelWorker import WorkerUnavailable
+from OnlineTrainer import OnlineTrainer
+from Scheduler import CycleScheduler
+from TrafficForecasterModel import TrafficForecasterModel
+
+logger = logging.getLogger("MultiAppController")
+
+
+class HashRing:
+    def __init__(self, nodes: list[str], virtual_nodes: int = 64):
+        if not nodes:
+            raise Exception("Hash ring needs at least one node.")
+        # Virtual nodes spread each shard around the ring so apps divide evenly
+        self.ring = sorted(
+            (self.__hash(f"{node}#{i}"), node)
+            for node in nodes
+            for i in range(virtual_nodes)
+        )
+        self.keys = [key for key, _ in self.ring]
+
+    @staticmethod
+    def __hash(key: str) -> int:
+        return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], 'big')
+
+    def owner(self, key: str) -> str:
+        index = bisect.bisect(self.keys, self.__hash(key)) % len(self.keys)
+        return self.ring[index][1]
+
+
+def shard_applications(
+    applications: list[str],
+    shard_count: int,
+    shard_index: int,
+    virtual_nodes: int = 64
+) -> list[str]:
+    if not 0 <= shard_index < shard_count:
+        raise Exception(f"Shard index {shard_index} is out of range for {shard_count} shard(s).")
+    ring = HashRing([f"shard-{i}" for i in range(shard_count)], virtual_nodes)
+    return [
+        application for application in applications
+        if ring.owner(application) == f"shard-{shard_index}"
+    ]
+
+
+class MultiAppController:
+    def __init__(
+        self,
+        controllers: list[Controller],
+        latency_predictor_model: LatencyPredictorModel,
+        traffic_forecaster_model: TrafficForecasterModel,
+        cooling_down_duration: int,
+        exporter: None | Exporter = None,
+        scheduler: None | CycleScheduler = None,
+        batch_size: int = 64,
+        pool_size: int = 8,
+        online_trainer: None | OnlineTrainer = None,
+        model_registry: None | ModelRegistry = None
+    ):
+        self.controllers = {controller.name: controller for controller in controllers}
+        if len(self.controllers) != len(controllers):
+            raise Exception("Application names must be unique.")
+        self.latency_predictor_model = latency_predictor_model
+        self.traffic_forecaster_model = traffic_forecaster_model
+        self.cooling_down_duration = cooling_down_duration
+        self.exporter = exporter
+        self.instrumented = exporter is not None and exporter.instrumentation
+        self.scheduler = scheduler
+        self.batch_size = batch_size
+        self.online_trainer = online_trainer
+        self.model_registry = model_registry
+        self.stage_seconds: dict[str, float] = {}
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=pool_size, thread_name_prefix="MultiAppController"
+        )
+
+        logger.info(f"Managing {len(self.controllers)} application(s): {list(self.controllers)}.")
+
+    def __span(self, name: str):
+        if self.exporter is None:
+            return contextlib.nullcontext()
+        return self.exporter.span(name)
+
+    def __observe_stage(self, stage: str, seconds: float):
+        self.stage_seconds[stage] = seconds
+        if self.instrumented:
+            self.exporter.observe_stage(stage, seconds)
+
+    def __count_error(self, cause: str, amount: int = 1):
+        if self.instrumented:
+            self.exporter.count_error(cause, amount)
+
+    def __run_stage(self, stage: str, function, fallback=None):
+        started = time.perf_counter()
+        with self.__span(stage):
+            if self.scheduler is None:
+                result = function()
+            else:
+                result = self.scheduler.run_stage(stage, function, fallback)
+        self.__observe_stage(stage, time.perf_counter() - started)
+        return result
+
+    def fetch(self) -> dict[str, dict | None]:
+        futures = {
+            self.executor.submit(controller.fetch): name
+            for name, controller in self.controllers.items()
+        }
+        metrics = {}
+        for future, name in futures.items():
+            try:
+                metrics[name] = future.result()
+            except Exception as e:
+                logger.error(f"Failed to fetch metrics for {name}: {e}")
+                metrics[name] = None
+        return metrics
+
+    def __prepare(self, metrics: dict[str, dict | None]) -> dict[str, tuple]:
+        inputs = {}
+        for name, controller in self.controllers.items():
+            if metrics.get(name) is None:
+                continue
+            try:
+                inputs[name] = controller.prepare(metrics[name])
+            except Exception as e:
+                # One broken application must not hold back the others
+                logger.error(f"Skipping {name} this cycle: {e}")
+        return inputs
+
+    def __stack_windows(self, names: list[str], inputs: dict[str, tuple]) -> np.ndarray:
+        context_length = self.traffic_forecaster_model.context_length
+        windows = np.zeros(
+            (len(names), context_length, self.traffic_forecaster_model.num_channels),
+            dtype=np.float32
+        )
+        for k, name in enumerate(names):
+            # Short windows are left-padded with zeros, like gaps in the traffic window
+            window = np.asarray(inputs[name][0])[-context_length:]
+            windows[k, context_length - len(window):] = window
+        return windows
+
+    def __forecast(self, names: list[str], inputs: dict[str, tuple]) -> dict[str, dict]:
+        # Applications whose window has not moved reuse their cached forecast
+        forecasts, keys = {}, {}
+        for name in names:
+            controller = self.controllers[name]
+            if controller.prediction_cache is None:
+                continue
+            keys[name] = controller.forecast_key(inputs[name][0])
+            cached = controller.prediction_cache.forecasts.get(keys[name])
+            if cached is not None:
+                forecasts[name] = cached
+        names = [name for name in names if name not in forecasts]
+        if not names:
+            return forecasts
+
+        # Applications planning a horizon roll their windows out together
+        planning = [name for name in names if self.controllers[name].horizon_planner is not None]
+        if planning:
+            forecasts.update(self.__forecast_horizons(planning, inputs, keys))
+            names = [name for name in names if name not in forecasts]
+            if not names:
+                return forecasts
+
+        windows = self.__stack_windows(names, inputs)
+        levels = sorted({
+            level for name in names for level in self.controllers[name].quantile_levels
+        })
+
+        if not levels:
+            point = self.traffic_forecaster_model.predict_batch(windows, batch_size=self.batch_size)
+            quantiles = {}
+        else:
+            point, quantiles = self.traffic_forecaster_model.predict_quantiles_batch(
+                windows, levels, batch_size=self.batch_size
+            )
+
+        for k, name in enumerate(names):
+            self.controllers[name].record_forecast(inputs[name][0], point[k].tolist())
+            forecasts[name] = self.controllers[name].forecast_from(
+                point[k].tolist(),
+                {level: values[k].tolist() for level, values in quantiles.items()}
+            )
+            if name in keys:
+                self.controllers[name].prediction_cache.forecasts.put(keys[name], forecasts[name])
+        return forecasts
+
+    def __forecast_horizons(self, names: list[str], inputs: dict[str, tuple], keys: dict) -> dict[str, list]:
+        windows = self.__stack_windows(names, inputs)
+        levels = sorted({
+            level for name in names for level in self.controllers[name].quantile_levels
+        })
+        steps = max(self.controllers[name].horizon_planner.steps for name in names)
+        points, quantiles = self.traffic_forecaster_model.predict_horizon_batch(
+            windows, steps, levels, batch_size=self.batch_size
+        )
+
+        forecasts = {}
+        for k, name in enumerate(names):
+            controller = self.controllers[name]
+            horizon = controller.horizon_planner.steps
+            controller.record_forecast(inputs[name][0], points[k, 0].tolist())
+            forecasts[name] = controller.horizon_from(
+                points[k, :horizon].tolist(),
+                {level: values[k, :horizon].tolist() for level, values in quantiles.items()}
+            )
+            if name in keys:
+                controller.prediction_cache.forecasts.put(keys[name], forecasts[name])
+        return forecasts
+
+    def __forecast_or_keep(self, names: list[str], inputs: dict[str, tuple]) -> dict[str, dict]:
+        try:
+            return self.__forecast(names, inputs)
+        except WorkerUnavailable as e:
+            logger.warning(f"{e}")
+            return self.__keep_forecasts(names)
+
+    def __hold(self, names: list[str], inputs: dict[str, tuple]) -> dict[str, tuple]:
+        return {
+            name: (self.controllers[name].last_predicted_lat, dict(inputs[name][4]))
+            for name in names
+        }
+
+    def __hold_late(self, names: list[str], inputs: dict[str, tuple]) -> dict[str, tuple]:
+        return {name: self.controllers[name].hold(inputs[name][4]) for name in names}
+
+    def __decide_or_hold(
+        self,
+        names: list[str],
+        inputs: dict[str, tuple],
+        forecasts: dict[str, dict]
+    ) -> dict[str, tuple]:
+        try:
+            return self.__decide(names, inputs, forecasts)
+        except WorkerUnavailable as e:
+            logger.warning(f"{e} Holding the current replica counts.")
+            return self.__hold(names, inputs)
+
+    def __keep_forecasts(self, names: list[str]) -> dict[str, dict]:
+        logger.warning("Reusing the previous forecasts.")
+        forecasts = {}
+        for name in names:
+            if self.controllers[name].last_forecast is None:
+                raise Exception(f"Forecast missed its deadline and {name} has no previous forecast.")
+            forecasts[name] = self.controllers[name].last_forecast
+        return forecasts
+
+    def __decide(
+        self,
+        names: list[str],
+        inputs: dict[str, tuple],
+        forecasts: dict[str, dict]
+    ) -> dict[str, tuple]:
+        # Proportional applications share one latency model forward pass;
+        # optimizer and horizon applications already batch their own predictions
+        proportional = [
+            name for name in names
+            if self.controllers[name].replica_optimizer is None and self.controllers[name].horizon_planner is None
+        ]
+        predicted_lat, keys = {}, {}
+        for name in proportional:
+            controller = self.controllers[name]
+            if controller.prediction_cache is None:
+                continue
+            _, node_cpu, pod_cpu, ready_pod, _ = inputs[name]
+            keys[name] = controller.latency_key(
+                'proportional', forecasts[name], node_cpu, pod_cpu, ready_pod
+            )
+            cached = controller.prediction_cache.latencies.get(keys[name])
+            if cached is not None:
+                predicted_lat[name] = cached
+        proportional = [name for name in proportional if name not in predicted_lat]
+
+        if proportional:
+            pod, cpu_pod, traffic, cpu_node = [], [], [], []
+            for name in proportional:
+                services = self.controllers[name].services
+                _, node_cpu, pod_cpu, ready_pod, _ = inputs[name]
+                pod.append([ready_pod[service] for service in services])
+                cpu_pod.append([pod_cpu[service] for service in services])
+                traffic.append([forecasts[name][service] for service in services])
+                cpu_node.append(node_cpu['cpu_node'])
+            latency = self.latency_predictor_model.predict_batch(
+                pod=np.array(pod),
+                cpu_pod=np.array(cpu_pod),
+                traffic=np.array(traffic),
+                cpu_node=np.array(cpu_node)
+            )
+            for k, name in enumerate(proportional):
+                predicted_lat[name] = dict(zip(self.controllers[name].services, latency[k].tolist()))
+                if name in keys:
+                    self.controllers[name].prediction_cache.latencies.put(keys[name], predicted_lat[name])
+
+        decisions = {}
+        for name in names:
+            _, node_cpu, pod_cpu, ready_pod, pod = inputs[name]
+            decisions[name] = self.controllers[name].decide(
+                forecasts[name], node_cpu, pod_cpu, ready_pod, pod,
+                predicted_lat=predicted_lat.get(name)
+            )
+        return decisions
+
+    def __apply(
+        self,
+        names: list[str],
+        inputs: dict[str, tuple],
+        forecasts: dict[str, dict],
+        decisions: dict[str, tuple]
+    ):
+        futures = {
+            self.executor.submit(
+                self.controllers[name].apply,
+                forecasts[name], *decisions[name], inputs[name][4]
+            ): name
+            for name in names
+        }
+        for future, name in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                logger.error(f"Failed to apply the decision for {name}: {e}")
+                self.__count_error('actuation')
+
+    def scale(self, metrics=None):
+        timestamp = time.time()
+        started = time.perf_counter()
+        self.stage_seconds = {}
+        if self.exporter is not None:
+            self.exporter.begin_trace('scale')
+        try:
+            self.__scale(metrics)
+        except Exception:
+            self.__count_error('cycle')
+            raise
+        finally:
+            self.__observe_stage('cycle', time.perf_counter() - started)
+            if self.exporter is not None:
+                self.exporter.end_trace(applications=len(self.controllers))
+            # Shared stages are timed once for every application; actuation per application
+            for controller in self.controllers.values():
+                controller.record_decision(timestamp, {**self.stage_seconds, **controller.stage_seconds})
+
+    def __scale(self, metrics=None):
+        if self.online_trainer is not None:
+            self.online_trainer.promote()
+        if self.model_registry is not None:
+            self.model_registry.apply_pending()
+        for controller in self.controllers.values():
+            controller.reset_decision()
+
+        if metrics is None:
+            metrics = self.__run_stage('fetch', self.fetch)
+
+        with self.__span('prepare_traffic'):
+            inputs = self.__prepare(metrics)
+        if not inputs:
+            raise Exception("No application has usable metrics.")
+        names = list(inputs)
+
+        forecasts = self.__run_stage(
+            'forecast',
+            lambda: self.__forecast_or_keep(names, inputs),
+            fallback=lambda: self.__keep_forecasts(names)
+        )
+
+        # Without fresh latency predictions, hold the current replica counts
+        decisions = self.__run_stage(
+            'decide',
+            lambda: self.__decide_or_hold(names, inputs, forecasts),
+            fallback=lambda: self.__hold_late(names, inputs)
+        )
+
+        if self.scheduler is not None:
+            self.scheduler.prefetch_next(self.fetch)
+
+        self.__run_stage(
+            'actuate',
+            lambda: self.__apply(names, inputs, forecasts, decisions),
+            fallback=lambda: None
+        )
+
+    def run(self):
+        if self.scheduler is not None:
+            self.scheduler.run(cycle=self.scale, fetch=self.fetch)
+            return
+
+        while True:
+            try:
+                self.scale()
+                logger.info(f"Cooling down for {self.cooling_down_duration} seconds.")
+                time.sleep(self.cooling_down_duration)
+            except Exception as e:
+                logger.error(f"An error occurred: {e}")
+                logger.info(f"Retrying in 10 seconds.")
+                time.sleep(10)
@@ -0,0 +1,4 @@
+from .experience_log import ExperienceLog
+from .online_trainer import OnlineTrainer
+
+__all__ = ['ExperienceLog', 'OnlineTrainer']
@@ -0,0 +1,164 @@
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+
+logger = logging.getLogger("OnlineTrainer")
+
+
+def _layout(num_target: int, rows_per_segment: int) -> dict:
+    return {
+        'num_target': num_target,
+        'rows_per_segment': rows_per_segment,
+        'num_columns': 2 + 4 * num_target,
+    }
+
+
+def _columns(num_target: int) -> dict[str, slice]:
+    return {
+        'timestamp': slice(0, 1),
+        'pod': slice(1, 1 + num_target),
+        'cpu_pod': slice(1 + num_target, 1 + 2 * num_target),
+        'traffic': slice(1 + 2 * num_target, 1 + 3 * num_target),
+        'cpu_node': slice(1 + 3 * num_target, 2 + 3 * num_target),
+        'latency': slice(2 + 3 * num_target, 2 + 4 * num_target),
+    }
+
+
+def _segment_paths(path: str) -> list[str]:
+    return sorted(
+        os.path.join(path, name)
+        for name in os.listdir(path)
+        if name.endswith(".seg")
+    )
+
+
+def read_experience(path: str, max_rows: int | None = None) -> dict[str, np.ndarray]:
+    # Read-only view for the trainer process; the newest `max_rows` rows, oldest first
+    with open(os.path.join(path, "layout.json"), 'r') as file:
+        layout = json.load(file)
+    shape = (layout['num_columns'], layout['rows_per_segment'])
+
+    tail = []
+    rows = 0
+    for segment_path in reversed(_segment_paths(path)):
+        segment = np.memmap(segment_path, dtype=np.float64, mode='r', shape=shape)
+        filled = int(np.count_nonzero(segment[0] > 0))
+        tail.append(np.array(segment[:, :filled]))
+        del segment
+        rows += filled
+        if max_rows is not None and rows >= max_rows:
+            break
+
+    data = np.hstack(tail[::-1]).T if tail else np.zeros((0, layout['num_columns']))
+    if max_rows is not None:
+        data = data[-max_rows:]
+    return {
+        column: data[:, columns] if column not in ('timestamp', 'cpu_node') else data[:, columns.start]
+        for column, columns in _columns(layout['num_target']).items()
+    }
+
+
+class ExperienceLog:
+    def __init__(
+        self,
+        path: str,
+        num_target: int,
+        rows_per_segment: int = 1440,
+        retention_hours: int = 168
+    ):
+        self.path = path
+        self.num_target = num_target
+        self.rows_per_segment = rows_per_segment
+        self.retention = retention_hours * 3600
+        self.columns = _columns(num_target)
+        self.num_columns = 2 + 4 * num_target
+        self.lock = threading.Lock()
+        self.segment: np.memmap | None = None
+        self.segment_row = 0
+        self.count = 0
+
+        os.makedirs(path, exist_ok=True)
+        self.__check_layout()
+        self.__load()
+        logger.info(f"Experience log holds {self.count} row(s).")
+
+    def __check_layout(self):
+        layout_path = os.path.join(self.path, "layout.json")
+        layout = _layout(self.num_target, self.rows_per_segment)
+        if os.path.exists(layout_path):
+            with open(layout_path, 'r') as file:
+                if json.load(file) == layout:
+                    return
+            logger.warning("Experience log layout changed, dropping existing segments.")
+            for segment_path in _segment_paths(self.path):
+                os.remove(segment_path)
+
+        with open(layout_path, 'w') as file:
+            json.dump(layout, file)
+
+    def __open_segment(self, segment_path: str, mode: str) -> np.memmap:
+        return np.memmap(
+            segment_path,
+            dtype=np.float64,
+            mode=mode,
+            shape=(self.num_columns, self.rows_per_segment)
+        )
+
+    def __load(self):
+        segment_paths = _segment_paths(self.path)
+        for segment_path in segment_paths:
+            segment = self.__open_segment(segment_path, 'r')
+            self.count += int(np.count_nonzero(segment[0] > 0))
+            del segment
+
+        if segment_paths:
+            segment = self.__open_segment(segment_paths[-1], 'r+')
+            filled = int(np.count_nonzero(segment[0] > 0))
+            if filled < self.rows_per_segment:
+                self.segment = segment
+                self.segment_row = filled
+
+    def __apply_retention(self, now: float):
+        for segment_path in _segment_paths(self.path)[:-1]:
+            segment = self.__open_segment(segment_path, 'r')
+            newest = float(segment[0].max())
+            filled = int(np.count_nonzero(segment[0] > 0))
+            del segment
+            if now - newest > self.retention:
+                logger.info(f"Dropping experience segment {os.path.basename(segment_path)}.")
+                os.remove(segment_path)
+                self.count -= filled
+
+    def append(
+        self,
+        timestamp: float,
+        pod: np.ndarray,
+        cpu_pod: np.ndarray,
+        traffic: np.ndarray,
+        cpu_node: float,
+        latency: np.ndarray
+    ):
+        row = np.empty(self.num_columns)
+        row[self.columns['timestamp']] = timestamp
+        row[self.columns['pod']] = pod
+        row[self.columns['cpu_pod']] = cpu_pod
+        row[self.columns['traffic']] = traffic
+        row[self.columns['cpu_node']] = cpu_node
+        row[self.columns['latency']] = latency
+
+        with self.lock:
+            if self.segment is None or self.segment_row >= self.rows_per_segment:
+                segment_path = os.path.join(self.path, f"{int(timestamp):012d}.seg")
+                self.segment = self.__open_segment(segment_path, 'w+')
+                self.segment_row = 0
+                self.__apply_retention(timestamp)
+
+            # The timestamp goes in last: the trainer reads whatever rows have one
+            self.segment[1:, self.segment_row] = row[1:]
+            self.segment[0, self.segment_row] = row[0]
+            self.segment.flush()
+            self.segment_row += 1
+            self.count += 1
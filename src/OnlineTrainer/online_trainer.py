@@ -0,0 +1,233 @@
+import contextlib
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+
+from ModelWorker.model_worker import THREAD_VARIABLES
+
+from .experience_log import ExperienceLog
+from .trainer import train
+
+logger = logging.getLogger("OnlineTrainer")
+
+_environment_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def _thread_limits(num_threads: int):
+    # A spawned child copies the environment at start, before NumPy loads BLAS
+    with _environment_lock:
+        previous = {variable: os.environ.get(variable) for variable in THREAD_VARIABLES}
+        os.environ.update({variable: str(num_threads) for variable in THREAD_VARIABLES})
+        try:
+            yield
+        finally:
+            for variable, value in previous.items():
+                if value is None:
+                    os.environ.pop(variable, None)
+                else:
+                    os.environ[variable] = value
+
+
+def _run(connection, nice: int, cpu_affinity, kwargs: dict):
+    # Runs in the trainer process
+    os.nice(nice)
+    if cpu_affinity:
+        os.sched_setaffinity(0, cpu_affinity)
+    try:
+        connection.send(('done', train(**kwargs)))
+    except Exception as e:
+        connection.send(('error', f"{type(e).__name__}: {e}"))
+
+
+class OnlineTrainer:
+    def __init__(
+        self,
+        latency_predictor_model,
+        experience_log: ExperienceLog,
+        output_path: str,
+        interval: float = 3600,
+        min_samples: int = 720,
+        max_samples: int = 20160,
+        holdout_fraction: float = 0.2,
+        epochs: int = 20,
+        batch_size: int = 128,
+        learning_rate: float = 5e-4,
+        anchor: float = 1e-3,
+        min_improvement: float = 0.02,
+        nice: int = 19,
+        num_threads: int = 1,
+        cpu_affinity: list[int] | None = None,
+        timeout: float = 900
+    ):
+        if getattr(latency_predictor_model, 'backend', None) != 'numpy':
+            raise Exception("Online training needs the numpy latency predictor backend.")
+
+        self.latency_predictor_model = latency_predictor_model
+        self.experience_log = experience_log
+        self.output_path = output_path
+        self.interval = interval
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+        self.holdout_fraction = holdout_fraction
+        self.epochs = epochs
+        self.batch_size = batch_size
+        self.learning_rate = learning_rate
+        self.anchor = anchor
+        self.min_improvement = min_improvement
+        self.nice = nice
+        self.num_threads = num_threads
+        self.cpu_affinity = cpu_affinity
+        self.timeout = timeout
+
+        self.context = multiprocessing.get_context('spawn')
+        self.lock = threading.Lock()
+        self.prediction_caches: dict = {}
+        self.stopped = threading.Event()
+
+        self.version = 0
+        self.active_path = latency_predictor_model.weights_path
+        self.pending: tuple[int, str, dict] | None = None
+        self.runs = {'accepted': 0, 'rejected': 0, 'failed': 0}
+        self.last_result: dict = {}
+
+        os.makedirs(output_path, exist_ok=True)
+        self.__resume()
+
+        self.thread = threading.Thread(target=self.__loop, name="OnlineTrainer", daemon=True)
+
+    def __current_path(self) -> str:
+        return os.path.join(self.output_path, "current.json")
+
+    def __resume(self):
+        # Pick up the version promoted before a restart; it goes live on the first cycle
+        if not os.path.exists(self.__current_path()):
+            return
+        with open(self.__current_path(), 'r') as file:
+            current = json.load(file)
+        if os.path.exists(current['path']):
+            self.version = current['version']
+            self.pending = (current['version'], current['path'], current.get('result', {}))
+            logger.info(f"Resuming latency predictor version {current['version']}.")
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+
+    def __loop(self):
+        while not self.stopped.wait(self.interval):
+            if self.experience_log.count < self.min_samples:
+                logger.info(
+                    f"Skipping training, {self.experience_log.count} of {self.min_samples} experience row(s)."
+                )
+                continue
+            try:
+                self.run_once()
+            except Exception as e:
+                self.runs['failed'] += 1
+                logger.error(f"Training run failed: {e}")
+
+    def run_once(self):
+        with self.lock:
+            base_path = self.pending[1] if self.pending is not None else self.active_path
+            version = max(self.version, self.pending[0] if self.pending is not None else 0) + 1
+        candidate_path = os.path.join(self.output_path, f"weights-{version:04d}.npz")
+
+        connection, child_connection = self.context.Pipe()
+        with _thread_limits(self.num_threads):
+            process = self.context.Process(
+                target=_run,
+                args=(child_connection, self.nice, self.cpu_affinity, {
+                    'weights_path': base_path,
+                    'experience_path': self.experience_log.path,
+                    'output_path': candidate_path,
+                    'max_samples': self.max_samples,
+                    'holdout_fraction': self.holdout_fraction,
+                    'epochs': self.epochs,
+                    'batch_size': self.batch_size,
+                    'learning_rate': self.learning_rate,
+                    'anchor': self.anchor,
+                    'seed': version,
+                }),
+                name="OnlineTrainer",
+                daemon=True
+            )
+            process.start()
+        child_connection.close()
+
+        try:
+            if not connection.poll(self.timeout):
+                process.kill()
+                raise Exception(f"Training did not finish within {self.timeout}s.")
+            kind, result = connection.recv()
+        except EOFError:
+            raise Exception(f"Trainer exited with code {process.exitcode}.")
+        finally:
+            process.join()
+            connection.close()
+        if kind == 'error':
+            raise Exception(result)
+
+        self.last_result = result
+        threshold = result['baseline_error'] * (1 - self.min_improvement)
+        if result['candidate_error'] >= threshold:
+            self.runs['rejected'] += 1
+            os.remove(candidate_path)
+            logger.info(
+                f"Rejected candidate {version}: holdout error {result['candidate_error']:.4f} "
+                f"vs {result['baseline_error']:.4f} for the current model."
+            )
+            return
+
+        with self.lock:
+            self.pending = (version, candidate_path, result)
+        self.runs['accepted'] += 1
+        logger.info(
+            f"Accepted candidate {version}: holdout error {result['candidate_error']:.4f} "
+            f"vs {result['baseline_error']:.4f}, trained on {result['samples']} row(s) "
+            f"in {result['seconds']:.1f}s."
+        )
+
+    def promote(self):
+        # Called between control cycles, so one cycle never mixes two model versions
+        with self.lock:
+            if self.pending is None:
+                return
+            version, path, result = self.pending
+            self.pending = None
+
+        started = time.perf_counter()
+        try:
+            self.latency_predictor_model.load_weights(path)
+        except Exception as e:
+            logger.error(f"Failed to load latency predictor version {version}: {e}")
+            return
+
+        previous_path = self.active_path
+        self.version = version
+        self.active_path = path
+        for prediction_cache in self.prediction_caches.values():
+            prediction_cache.latencies.clear()
+
+        temporary_path = f"{self.__current_path()}.tmp"
+        with open(temporary_path, 'w') as file:
+            json.dump({'version': version, 'path': path, 'result': result}, file)
+        os.replace(temporary_path, self.__current_path())
+
+        # Keep the version being replaced around as a fallback, drop anything older
+        keep = {path, previous_path}
+        for name in os.listdir(self.output_path):
+            candidate = os.path.join(self.output_path, name)
+            if name.startswith("weights-") and name.endswith(".npz") and candidate not in keep:
+                os.remove(candidate)
+
+        logger.info(
+            f"Switched to latency predictor version {version} in "
+            f"{(time.perf_counter() - started) * 1000:.1f} ms."
+        )
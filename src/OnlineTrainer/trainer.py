@@ -0,0 +1,204 @@
+import os
+import time
+
+import numpy as np
+
+from LatencyPredictorModel.latency_predictor_model import build_features
+from LatencyPredictorModel.numpy_engine import save_weights
+
+from .experience_log import read_experience
+
+GRADIENTS = {
+    'linear': lambda outputs: 1.0,
+    'relu': lambda outputs: (outputs > 0).astype(outputs.dtype),
+    'tanh': lambda outputs: 1 - outputs ** 2,
+    'sigmoid': lambda outputs: outputs * (1 - outputs),
+}
+FORWARD = {
+    'linear': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0),
+    'tanh': np.tanh,
+    'sigmoid': lambda x: 1 / (1 + np.exp(-x)),
+}
+
+
+def load_network(path: str) -> dict:
+    # The unfolded network: scalers stay separate so only the Dense layers are trained
+    with np.load(path, allow_pickle=False) as weights:
+        activations = weights['activations'].tolist()
+        return {
+            'activations': activations,
+            'kernels': [weights[f"kernel_{i}"].astype(np.float64) for i in range(len(activations))],
+            'biases': [weights[f"bias_{i}"].astype(np.float64) for i in range(len(activations))],
+            'input_columns': weights['input_columns'].tolist(),
+            'pre_columns': weights['pre_columns'].tolist(),
+            'pre_mean': weights['pre_mean'],
+            'pre_scale': weights['pre_scale'],
+            'post_mean': weights['post_mean'],
+            'post_scale': weights['post_scale'],
+        }
+
+
+def save_network(network: dict, path: str):
+    # Written next to the target and renamed, so readers never see a partial file
+    temporary_path = f"{path[:-len('.npz')]}.tmp.npz"
+    save_weights(
+        temporary_path,
+        kernels=network['kernels'],
+        biases=network['biases'],
+        activations=network['activations'],
+        input_columns=network['input_columns'],
+        pre_columns=network['pre_columns'],
+        pre_mean=network['pre_mean'],
+        pre_scale=network['pre_scale'],
+        post_mean=network['post_mean'],
+        post_scale=network['post_scale']
+    )
+    os.replace(temporary_path, path)
+
+
+def standardize(network: dict, features: np.ndarray) -> np.ndarray:
+    inputs = np.array(features, dtype=np.float64)
+    indices = [network['input_columns'].index(column) for column in network['pre_columns']]
+    inputs[:, indices] = (inputs[:, indices] - network['pre_mean']) / network['pre_scale']
+    return inputs
+
+
+def standardize_target(network: dict, latency: np.ndarray) -> np.ndarray:
+    return (np.log(latency) - network['post_mean']) / network['post_scale']
+
+
+def forward(network: dict, inputs: np.ndarray) -> list[np.ndarray]:
+    outputs = [inputs]
+    for kernel, bias, activation in zip(network['kernels'], network['biases'], network['activations']):
+        outputs.append(FORWARD[activation](outputs[-1] @ kernel + bias))
+    return outputs
+
+
+def log_rmse(network: dict, inputs: np.ndarray, targets: np.ndarray) -> float:
+    # Error in log latency, so every service weighs the same whatever its scale
+    errors = (forward(network, inputs)[-1] - targets) * network['post_scale']
+    return float(np.sqrt(np.mean(errors ** 2)))
+
+
+def fine_tune(
+    network: dict,
+    inputs: np.ndarray,
+    targets: np.ndarray,
+    validation_inputs: np.ndarray,
+    validation_targets: np.ndarray,
+    epochs: int,
+    batch_size: int,
+    learning_rate: float,
+    anchor: float,
+    seed: int = 0
+) -> tuple[dict, float]:
+    # Adam on the mean squared error, with an L2 pull towards the starting
+    # weights so a few hours of data cannot wipe out what the model knew
+    rng = np.random.default_rng(seed)
+    parameters = [*network['kernels'], *network['biases']]
+    initial = [parameter.copy() for parameter in parameters]
+    first_moments = [np.zeros_like(parameter) for parameter in parameters]
+    second_moments = [np.zeros_like(parameter) for parameter in parameters]
+    beta1, beta2, epsilon = 0.9, 0.999, 1e-8
+    num_layers = len(network['kernels'])
+
+    best = [parameter.copy() for parameter in parameters]
+    best_error = log_rmse(network, validation_inputs, validation_targets)
+    step = 0
+
+    for _ in range(epochs):
+        order = rng.permutation(len(inputs))
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            outputs = forward(network, inputs[batch])
+
+            delta = 2 * (outputs[-1] - targets[batch]) / targets[batch].size
+            kernel_gradients, bias_gradients = [None] * num_layers, [None] * num_layers
+            for layer in reversed(range(num_layers)):
+                delta = delta * GRADIENTS[network['activations'][layer]](outputs[layer + 1])
+                kernel_gradients[layer] = outputs[layer].T @ delta
+                bias_gradients[layer] = delta.sum(axis=0)
+                delta = delta @ network['kernels'][layer].T
+
+            step += 1
+            for k, (parameter, gradient) in enumerate(zip(parameters, [*kernel_gradients, *bias_gradients])):
+                gradient = gradient + anchor * (parameter - initial[k])
+                first_moments[k] = beta1 * first_moments[k] + (1 - beta1) * gradient
+                second_moments[k] = beta2 * second_moments[k] + (1 - beta2) * gradient ** 2
+                corrected_first = first_moments[k] / (1 - beta1 ** step)
+                corrected_second = second_moments[k] / (1 - beta2 ** step)
+                parameter -= learning_rate * corrected_first / (np.sqrt(corrected_second) + epsilon)
+
+        error = log_rmse(network, validation_inputs, validation_targets)
+        if error < best_error:
+            best_error = error
+            best = [parameter.copy() for parameter in parameters]
+
+    network = {
+        **network,
+        'kernels': best[:num_layers],
+        'biases': best[num_layers:],
+    }
+    return network, best_error
+
+
+def train(
+    weights_path: str,
+    experience_path: str,
+    output_path: str,
+    max_samples: int,
+    holdout_fraction: float,
+    epochs: int,
+    batch_size: int,
+    learning_rate: float,
+    anchor: float,
+    seed: int = 0
+) -> dict:
+    started = time.perf_counter()
+    experience = read_experience(experience_path, max_rows=max_samples)
+    pod = experience['pod']
+    latency = experience['latency']
+    usable = (
+        np.all(pod > 0, axis=1)
+        & np.all(latency > 0, axis=1)
+        & np.all(np.isfinite(latency), axis=1)
+        & np.all(np.isfinite(experience['traffic']), axis=1)
+    )
+
+    network = load_network(weights_path)
+    inputs = standardize(network, build_features(
+        pod[usable], experience['cpu_pod'][usable], experience['traffic'][usable], experience['cpu_node'][usable]
+    ))
+    targets = standardize_target(network, latency[usable])
+
+    # Hold out the most recent rows: the candidate has to predict the present, not the past
+    split = int(len(inputs) * (1 - holdout_fraction))
+    if split == 0 or split == len(inputs):
+        raise Exception(f"Not enough usable experience to train and validate: {len(inputs)} row(s).")
+
+    # Epochs are picked on the newest training rows, so the holdout stays unseen until the final comparison
+    fit = int(split * (1 - holdout_fraction))
+    if fit == 0 or fit == split:
+        raise Exception(f"Not enough usable experience to train and pick an epoch: {split} row(s).")
+
+    baseline_error = log_rmse(network, inputs[split:], targets[split:])
+    candidate, _ = fine_tune(
+        network,
+        inputs[:fit], targets[:fit],
+        inputs[fit:split], targets[fit:split],
+        epochs=epochs,
+        batch_size=batch_size,
+        learning_rate=learning_rate,
+        anchor=anchor,
+        seed=seed
+    )
+    save_network(candidate, output_path)
+    return {
+        'samples': int(fit),
+        'validation': int(split - fit),
+        'holdout': int(len(inputs) - split),
+        'baseline_error': baseline_error,
+        'candidate_error': log_rmse(candidate, inputs[split:], targets[split:]),
+        'seconds': time.perf_counter() - started,
+    }
@@ -0,0 +1,3 @@
+from .prediction_cache import LRUCache, PredictionCache
+
+__all__ = ['LRUCache', 'PredictionCache']
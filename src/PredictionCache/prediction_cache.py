@@ -0,0 +1,102 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+logger = logging.getLogger("PredictionCache")
+
+_MISSING = object()
+
+
+class LRUCache:
+    def __init__(self, max_entries: int):
+        if max_entries < 1:
+            raise Exception(f"Cache needs room for at least one entry, got {max_entries}.")
+        self.max_entries = max_entries
+        self.entries: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            value = self.entries.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class PredictionCache:
+    def __init__(
+        self,
+        forecast_entries: int = 4,
+        latency_entries: int = 1024,
+        precision: int = 2
+    ):
+        self.forecasts = LRUCache(forecast_entries)
+        self.latencies = LRUCache(latency_entries)
+        # Decimal places kept for CPU and traffic before they become part of a key
+        self.precision = precision
+
+    @staticmethod
+    def forecast_key(watermark: float, window: np.ndarray, *extra) -> tuple:
+        # The watermark alone misses late samples rewriting the tail of the window
+        digest = hashlib.blake2b(
+            np.ascontiguousarray(window).tobytes(), digest_size=16
+        ).digest()
+        return (watermark, digest, *extra)
+
+    def latency_key(
+        self,
+        ready_pod: list[int],
+        pod_cpu: list[float],
+        traffic: list[float],
+        node_cpu: float
+    ) -> tuple:
+        return (
+            tuple(int(value) for value in ready_pod),
+            tuple(np.round(pod_cpu, self.precision).tolist()),
+            tuple(np.round(traffic, self.precision).tolist()),
+            round(float(node_cpu), self.precision),
+        )
+
+    def stats(self) -> dict[str, dict]:
+        return {
+            name: {
+                'hits': cache.hits,
+                'misses': cache.misses,
+                'evictions': cache.evictions,
+                'entries': len(cache.entries),
+                'hit_rate': cache.hit_rate(),
+            }
+            for name, cache in (('forecast', self.forecasts), ('latency', self.latencies))
+        }
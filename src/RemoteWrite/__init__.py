@@ -0,0 +1,4 @@
+from .remote_write import RemoteWriteReceiver, RemoteWriteSender
+from .sample_store import SampleStore, irate, rate
+
+__all__ = ['RemoteWriteReceiver', 'RemoteWriteSender', 'SampleStore', 'irate', 'rate']
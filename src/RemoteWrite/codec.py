@@ -0,0 +1,226 @@
+import struct
+
+# Prometheus marks a series as gone with this NaN bit pattern
+STALE_NAN = b'\x02\x00\x00\x00\x00\x00\xf0\x7f'
+
+_WIRE_VARINT = 0
+_WIRE_FIXED64 = 1
+_WIRE_BYTES = 2
+_WIRE_FIXED32 = 5
+
+
+def _read_varint(data, position: int) -> tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return result, position
+        shift += 7
+        if shift > 63:
+            raise Exception("Malformed varint.")
+
+
+def _write_varint(output: bytearray, value: int):
+    value &= 0xffffffffffffffff
+    while value >= 0x80:
+        output.append((value & 0x7f) | 0x80)
+        value >>= 7
+    output.append(value)
+
+
+def _fields(data, start: int = 0, end: int | None = None):
+    # Yields (field number, wire type, value); length-delimited values come back as (start, end)
+    position = start
+    end = len(data) if end is None else end
+    while position < end:
+        key, position = _read_varint(data, position)
+        field, wire_type = key >> 3, key & 0x7
+        if wire_type == _WIRE_VARINT:
+            value, position = _read_varint(data, position)
+        elif wire_type == _WIRE_FIXED64:
+            value = (position, position + 8)
+            position += 8
+        elif wire_type == _WIRE_BYTES:
+            length, position = _read_varint(data, position)
+            value = (position, position + length)
+            position += length
+        elif wire_type == _WIRE_FIXED32:
+            value = (position, position + 4)
+            position += 4
+        else:
+            raise Exception(f"Unsupported protobuf wire type {wire_type}.")
+        if position > end:
+            raise Exception("Truncated protobuf message.")
+        yield field, wire_type, value
+
+
+def snappy_decompress(data: bytes) -> bytes:
+    length, position = _read_varint(data, 0)
+    output = bytearray()
+    while position < len(data):
+        tag = data[position]
+        position += 1
+        kind = tag & 0x3
+
+        if kind == 0:
+            size = tag >> 2
+            if size >= 60:
+                extra = size - 59
+                size = int.from_bytes(data[position:position + extra], 'little')
+                position += extra
+            size += 1
+            output += data[position:position + size]
+            position += size
+            continue
+
+        if kind == 1:
+            size = ((tag >> 2) & 0x7) + 4
+            offset = ((tag >> 5) << 8) | data[position]
+            position += 1
+        elif kind == 2:
+            size = (tag >> 2) + 1
+            offset = int.from_bytes(data[position:position + 2], 'little')
+            position += 2
+        else:
+            size = (tag >> 2) + 1
+            offset = int.from_bytes(data[position:position + 4], 'little')
+            position += 4
+
+        if offset == 0 or offset > len(output):
+            raise Exception("Malformed snappy copy offset.")
+        start = len(output) - offset
+        if offset >= size:
+            output += output[start:start + size]
+        else:
+            # Overlapping copies repeat the last `offset` bytes
+            for i in range(size):
+                output.append(output[start + i])
+
+    if len(output) != length:
+        raise Exception(f"Snappy block decoded to {len(output)} bytes, expected {length}.")
+    return bytes(output)
+
+
+def snappy_compress(data: bytes) -> bytes:
+    output = bytearray()
+    _write_varint(output, len(data))
+    table: dict[bytes, int] = {}
+    literal_start = position = 0
+
+    def emit_literal(start: int, end: int):
+        while start < end:
+            size = min(end - start, 65536)
+            if size <= 60:
+                output.append((size - 1) << 2)
+            elif size <= 256:
+                output.append(60 << 2)
+                output.append(size - 1)
+            else:
+                output.append(61 << 2)
+                output.extend((size - 1).to_bytes(2, 'little'))
+            output.extend(data[start:start + size])
+            start += size
+
+    while position + 4 <= len(data):
+        key = data[position:position + 4]
+        candidate = table.get(key)
+        table[key] = position
+        if candidate is None or position - candidate > 65535:
+            position += 1
+            continue
+
+        size = 4
+        while position + size < len(data) and data[candidate + size] == data[position + size] and size < 64:
+            size += 1
+        emit_literal(literal_start, position)
+        output.append(((size - 1) << 2) | 2)
+        output += (position - candidate).to_bytes(2, 'little')
+        position += size
+        literal_start = position
+
+    emit_literal(literal_start, len(data))
+    return bytes(output)
+
+
+def _decode_labels(data, ranges: list[tuple[int, int]]) -> dict[str, str]:
+    labels = {}
+    for start, end in ranges:
+        name = value = ''
+        for field, _, (value_start, value_end) in _fields(data, start, end):
+            if field == 1:
+                name = bytes(data[value_start:value_end]).decode()
+            elif field == 2:
+                value = bytes(data[value_start:value_end]).decode()
+        labels[name] = value
+    return labels
+
+
+def _decode_samples(data, ranges: list[tuple[int, int]]) -> list[tuple[int, float, bool]]:
+    samples = []
+    for start, end in ranges:
+        value, timestamp, stale = 0.0, 0, False
+        for field, wire_type, raw in _fields(data, start, end):
+            if field == 1 and wire_type == _WIRE_FIXED64:
+                chunk = bytes(data[raw[0]:raw[1]])
+                stale = chunk == STALE_NAN
+                value = struct.unpack('<d', chunk)[0]
+            elif field == 2 and wire_type == _WIRE_VARINT:
+                # int64 timestamps in milliseconds, two's complement on the wire
+                timestamp = raw - (1 << 64) if raw >= 1 << 63 else raw
+        samples.append((timestamp, value, stale))
+    return samples
+
+
+def decode_write_request(data: bytes, keep=None) -> tuple[list[tuple[dict, list]], int]:
+    # Returns the kept (labels, samples) pairs and the number of samples dropped by `keep`
+    view = memoryview(data)
+    series = []
+    dropped = 0
+    for field, wire_type, value in _fields(view):
+        if field != 1 or wire_type != _WIRE_BYTES:
+            continue
+        label_ranges, sample_ranges = [], []
+        for inner_field, inner_wire_type, inner_value in _fields(view, *value):
+            if inner_wire_type != _WIRE_BYTES:
+                continue
+            if inner_field == 1:
+                label_ranges.append(inner_value)
+            elif inner_field == 2:
+                sample_ranges.append(inner_value)
+
+        labels = _decode_labels(view, label_ranges)
+        if keep is not None and not keep(labels):
+            dropped += len(sample_ranges)
+            continue
+        series.append((labels, _decode_samples(view, sample_ranges)))
+    return series, dropped
+
+
+def _write_bytes_field(output: bytearray, field: int, payload: bytes):
+    _write_varint(output, (field << 3) | _WIRE_BYTES)
+    _write_varint(output, len(payload))
+    output += payload
+
+
+def encode_write_request(series: list[tuple[dict, list[tuple[int, float]]]]) -> bytes:
+    output = bytearray()
+    for labels, samples in series:
+        timeseries = bytearray()
+        # Remote write receivers expect labels sorted by name
+        for name, value in sorted(labels.items()):
+            label = bytearray()
+            _write_bytes_field(label, 1, name.encode())
+            _write_bytes_field(label, 2, str(value).encode())
+            _write_bytes_field(timeseries, 1, bytes(label))
+        for timestamp, value in samples:
+            sample = bytearray()
+            _write_varint(sample, (1 << 3) | _WIRE_FIXED64)
+            sample += struct.pack('<d', value)
+            _write_varint(sample, (2 << 3) | _WIRE_VARINT)
+            _write_varint(sample, int(timestamp))
+            _write_bytes_field(timeseries, 2, bytes(sample))
+        _write_bytes_field(output, 1, bytes(timeseries))
+    return bytes(output)
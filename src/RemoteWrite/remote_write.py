@@ -0,0 +1,147 @@
+import logging
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from .codec import decode_write_request, encode_write_request, snappy_compress, snappy_decompress
+from .sample_store import SampleStore
+
+logger = logging.getLogger("RemoteWrite")
+
+
+class _RemoteWriteHandler(BaseHTTPRequestHandler):
+    receiver = None
+
+    def do_POST(self):
+        if self.path.split('?')[0] != self.receiver.path:
+            self.__respond(404, b"Not found.")
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            body = self.rfile.read(length)
+            self.receiver.ingest(body, self.headers.get('Content-Encoding', 'snappy'))
+        except Exception as e:
+            # 4xx tells Prometheus not to retry a batch that can never be decoded
+            logger.error(f"Rejected a remote write request: {e}")
+            self.__respond(400, str(e).encode())
+            return
+        self.__respond(204, b"")
+
+    def __respond(self, status: int, body: bytes):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class RemoteWriteReceiver:
+    def __init__(
+        self,
+        port: int = 9201,
+        path: str = '/api/v1/write',
+        retention: float = 600,
+        staleness: float = 300,
+        prune_interval: float = 30,
+        selectors: list[tuple[str, dict[str, str]]] | None = None
+    ):
+        # Only series matching one of the (metric name, label regex) selectors are kept
+        self.selectors: dict[str, list[dict[str, re.Pattern]]] = {}
+        self.add_selectors(selectors or [])
+        self.path = path
+        self.store = SampleStore(retention=retention, staleness=staleness)
+        self.prune_interval = prune_interval
+        self.last_prune = time.time()
+
+        self.stats_lock = threading.Lock()
+        self.requests = 0
+        self.failed_requests = 0
+        self.accepted_samples = 0
+        self.dropped_samples = 0
+        self.last_request_timestamp: float | None = None
+
+        handler = type('RemoteWriteHandler', (_RemoteWriteHandler,), {'receiver': self})
+        self.server = ThreadingHTTPServer(('', port), handler)
+        self.server.daemon_threads = True
+        threading.Thread(
+            target=self.server.serve_forever, name="RemoteWriteReceiver", daemon=True
+        ).start()
+        logger.info(f"Accepting remote write on :{port}{path}.")
+
+    def add_selectors(self, selectors: list[tuple[str, dict[str, str]]]):
+        for name, matchers in selectors:
+            self.selectors.setdefault(name, []).append({
+                label: re.compile(pattern) for label, pattern in (matchers or {}).items()
+            })
+
+    def keep(self, labels: dict[str, str]) -> bool:
+        for matchers in self.selectors.get(labels.get('__name__'), ()):
+            if all(pattern.fullmatch(labels.get(label, '')) for label, pattern in matchers.items()):
+                return True
+        return False
+
+    def ingest(self, body: bytes, encoding: str = 'snappy'):
+        try:
+            if encoding == 'snappy':
+                body = snappy_decompress(body)
+            elif encoding not in ('', 'identity'):
+                raise Exception(f"Unsupported content encoding {encoding}.")
+            series, dropped = decode_write_request(body, keep=self.keep)
+        except Exception:
+            with self.stats_lock:
+                self.requests += 1
+                self.failed_requests += 1
+            raise
+
+        accepted = 0
+        for labels, samples in series:
+            self.store.append(labels, samples)
+            accepted += len(samples)
+
+        now = time.time()
+        with self.stats_lock:
+            self.requests += 1
+            self.accepted_samples += accepted
+            self.dropped_samples += dropped
+            self.last_request_timestamp = now
+            prune = now - self.last_prune >= self.prune_interval
+            if prune:
+                self.last_prune = now
+        if prune:
+            self.store.prune(now)
+
+    def ingestion_lag(self) -> float | None:
+        # How far the newest sample trails the wall clock
+        if self.store.latest_timestamp is None:
+            return None
+        return time.time() - self.store.latest_timestamp
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class RemoteWriteSender:
+    def __init__(self, url: str, timeout: float = 10):
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def send(self, series: list[tuple[dict, list[tuple[int, float]]]]):
+        response = self.session.post(
+            self.url,
+            data=snappy_compress(encode_write_request(series)),
+            headers={
+                'Content-Encoding': 'snappy',
+                'Content-Type': 'application/x-protobuf',
+                'X-Prometheus-Remote-Write-Version': '0.1.0',
+            },
+            timeout=self.timeout
+        )
+        if response.status_code >= 300:
+            raise Exception(f"Remote write failed with {response.status_code}: {response.text}")
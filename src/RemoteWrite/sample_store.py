@@ -0,0 +1,133 @@
+import bisect
+import re
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+
+
+@dataclass
+class Series:
+    labels: dict[str, str]
+    timestamps: deque = field(default_factory=deque)
+    values: deque = field(default_factory=deque)
+    stale_at: float | None = None
+
+    def window(self, start: float, end: float) -> tuple[list[float], list[float]]:
+        # Samples in (start, end], like a PromQL range selector
+        timestamps = list(self.timestamps)
+        left = bisect.bisect_right(timestamps, start)
+        right = bisect.bisect_right(timestamps, end)
+        values = list(self.values)
+        return timestamps[left:right], values[left:right]
+
+
+def rate(series: Series, start: float, end: float) -> float | None:
+    # Mirrors PromQL rate(): counter resets are stitched and the increase is
+    # extrapolated towards the window edges
+    timestamps, values = series.window(start, end)
+    if len(timestamps) < 2:
+        return None
+
+    increase = values[-1] - values[0]
+    for previous, current in zip(values, values[1:]):
+        if current < previous:
+            increase += previous
+
+    sampled_interval = timestamps[-1] - timestamps[0]
+    average_interval = sampled_interval / (len(timestamps) - 1)
+    threshold = average_interval * 1.1
+    duration_to_start = timestamps[0] - start
+    duration_to_end = end - timestamps[-1]
+    if increase > 0 and values[0] >= 0:
+        duration_to_zero = sampled_interval * (values[0] / increase)
+        duration_to_start = min(duration_to_start, duration_to_zero)
+
+    interval = sampled_interval
+    interval += duration_to_start if duration_to_start < threshold else average_interval / 2
+    interval += duration_to_end if duration_to_end < threshold else average_interval / 2
+    return increase * (interval / sampled_interval) / (end - start)
+
+
+def irate(series: Series, start: float, end: float) -> float | None:
+    timestamps, values = series.window(start, end)
+    if len(timestamps) < 2:
+        return None
+    increase = values[-1] - values[-2]
+    if increase < 0:
+        increase = values[-1]
+    return increase / (timestamps[-1] - timestamps[-2])
+
+
+class SampleStore:
+    def __init__(self, retention: float = 600, staleness: float = 300):
+        self.retention = retention
+        self.staleness = staleness
+        self.lock = threading.Lock()
+        self.metrics: dict[str, dict[tuple, Series]] = {}
+        self.latest_timestamp: float | None = None
+        self.num_samples = 0
+
+    def append(self, labels: dict[str, str], samples: list[tuple[int, float, bool]]):
+        name = labels.get('__name__', '')
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.metrics.setdefault(name, {}).get(key)
+            if series is None:
+                series = self.metrics[name][key] = Series(labels=labels)
+            for timestamp, value, stale in samples:
+                timestamp /= 1000
+                if stale:
+                    series.stale_at = timestamp
+                    continue
+                if series.timestamps and timestamp <= series.timestamps[-1]:
+                    # Out-of-order and duplicate samples are dropped, like the TSDB does
+                    continue
+                series.timestamps.append(timestamp)
+                series.values.append(value)
+                series.stale_at = None
+                self.num_samples += 1
+                if self.latest_timestamp is None or timestamp > self.latest_timestamp:
+                    self.latest_timestamp = timestamp
+
+    def prune(self, now: float):
+        horizon = now - self.retention
+        with self.lock:
+            for name, metric in self.metrics.items():
+                for key in list(metric):
+                    series = metric[key]
+                    while series.timestamps and series.timestamps[0] < horizon:
+                        series.timestamps.popleft()
+                        series.values.popleft()
+                        self.num_samples -= 1
+                    if not series.timestamps:
+                        del metric[key]
+
+    def num_series(self) -> int:
+        with self.lock:
+            return sum(len(metric) for metric in self.metrics.values())
+
+    def select(self, name: str, matchers: dict[str, str] | None = None, at: float | None = None) -> list[Series]:
+        # Label values are anchored regular expressions, like =~ in PromQL;
+        # series that went stale or stopped reporting before `at` are left out
+        patterns = {label: re.compile(pattern) for label, pattern in (matchers or {}).items()}
+        selected = []
+        with self.lock:
+            for series in self.metrics.get(name, {}).values():
+                if not all(
+                    pattern.fullmatch(series.labels.get(label, ''))
+                    for label, pattern in patterns.items()
+                ):
+                    continue
+                if at is not None:
+                    if not series.timestamps or at - series.timestamps[-1] > self.staleness:
+                        continue
+                    if series.stale_at is not None and series.stale_at <= at:
+                        continue
+                # Copies, so readers never see a half-appended series
+                selected.append(Series(
+                    labels=series.labels,
+                    timestamps=deque(series.timestamps),
+                    values=deque(series.values),
+                    stale_at=series.stale_at
+                ))
+        return selected
@@ -0,0 +1,3 @@
+from .replica_optimizer import ReplicaOptimizer
+
+__all__ = ['ReplicaOptimizer']
@@ -0,0 +1,103 @@
+import logging
+import time
+
+import numpy as np
+
+from LatencyPredictorModel import LatencyPredictorModel
+
+logger = logging.getLogger("ReplicaOptimizer")
+
+
+class ReplicaOptimizer:
+    def __init__(
+        self,
+        latency_predictor_model: LatencyPredictorModel,
+        max_target_pod: int,
+        min_target_pod: int = 1,
+        max_iterations: int = 4,
+        search_radius: int = 3
+    ):
+        self.latency_predictor_model = latency_predictor_model
+        self.max_target_pod = max_target_pod
+        self.min_target_pod = min_target_pod
+        self.max_iterations = max_iterations
+        self.search_radius = search_radius
+
+    def __score(self, candidates, ready_pod, pod_cpu, traffic, node_cpu):
+        # Pod CPU is reported per ready pod, so keep the total usage constant
+        cpu_pod = pod_cpu * ready_pod / candidates
+        return self.latency_predictor_model.predict_batch(
+            pod=candidates,
+            cpu_pod=cpu_pod,
+            traffic=np.broadcast_to(traffic, candidates.shape),
+            cpu_node=node_cpu
+        )
+
+    def optimize(
+        self,
+        ready_pod: np.ndarray,
+        pod_cpu: np.ndarray,
+        traffic: np.ndarray,
+        node_cpu: float,
+        thresholds: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        started = time.perf_counter()
+        ready_pod = np.maximum(np.asarray(ready_pod, dtype=float), 1)
+        pod_cpu = np.asarray(pod_cpu, dtype=float)
+        traffic = np.asarray(traffic, dtype=float)
+        thresholds = np.asarray(thresholds, dtype=float)
+        num_services = len(ready_pod)
+
+        current = np.clip(ready_pod, self.min_target_pod, self.max_target_pod).astype(int)
+        low = np.full(num_services, self.min_target_pod)
+        high = np.full(num_services, self.max_target_pod)
+
+        forward_passes = 0
+        for _ in range(self.max_iterations):
+            # One row per (service, candidate count) with every other service held fixed
+            rows, owners, counts = [], [], []
+            for service in range(num_services):
+                values = np.arange(low[service], high[service] + 1)
+                candidates = np.repeat(current[None, :], len(values), axis=0)
+                candidates[:, service] = values
+                rows.append(candidates)
+                owners.append(np.full(len(values), service))
+                counts.append(values)
+            candidates = np.vstack(rows)
+            owners = np.concatenate(owners)
+            counts = np.concatenate(counts)
+
+            latencies = self.__score(candidates, ready_pod, pod_cpu, traffic, node_cpu)
+            forward_passes += 1
+            feasible = latencies[np.arange(len(owners)), owners] <= thresholds[owners]
+
+            updated = current.copy()
+            for service in range(num_services):
+                mask = owners == service
+                feasible_counts = counts[mask][feasible[mask]]
+                updated[service] = feasible_counts.min() if feasible_counts.size > 0 else high[service]
+
+            if np.array_equal(updated, current):
+                break
+            current = updated
+
+            # Later sweeps only look around the current solution
+            low = np.maximum(current - self.search_radius, self.min_target_pod)
+            high = np.minimum(current + self.search_radius, self.max_target_pod)
+
+        # Greedy repair: the joint vector may still violate a threshold
+        latencies = self.__score(current[None, :], ready_pod, pod_cpu, traffic, node_cpu)[0]
+        forward_passes += 1
+        while True:
+            violating = (latencies > thresholds) & (current < self.max_target_pod)
+            if not violating.any():
+                break
+            current = current + violating
+            latencies = self.__score(current[None, :], ready_pod, pod_cpu, traffic, node_cpu)[0]
+            forward_passes += 1
+
+        logger.info(
+            f"Optimized replicas {current.tolist()} in {forward_passes} forward pass(es), "
+            f"{(time.perf_counter() - started) * 1000:.1f} ms."
+        )
+        return current, latencies
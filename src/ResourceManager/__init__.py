@@ -1,3 +1,4 @@
-from .resource_manager import ResourceManager
+from .deployment_cache import DeploymentCache, DeploymentState
+from .resource_manager import ResourceManager, ScaleResult
 
-__all__ = ['ResourceManager']
+__all__ = ['DeploymentCache', 'DeploymentState', 'ResourceManager', 'ScaleResult']
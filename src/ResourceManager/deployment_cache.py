@@ -0,0 +1,139 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass
+
+from kubernetes import client, watch
+from kubernetes.client.rest import ApiException
+
+logger = logging.getLogger("DeploymentCache")
+
+
+@dataclass
+class DeploymentState:
+    desired: int
+    ready: int
+    available: int
+    updated: int
+    generation: int = 0
+    observed_generation: int = 0
+
+
+class DeploymentCache:
+    def __init__(
+        self,
+        v1: client.AppsV1Api,
+        namespace: str,
+        deployments: list[str],
+        watch_timeout: int = 300,
+        retry_interval: float = 5
+    ):
+        self.v1 = v1
+        self.namespace = namespace
+        self.deployments = set(deployments)
+        self.watch_timeout = watch_timeout
+        self.retry_interval = retry_interval
+
+        self.lock = threading.Lock()
+        self.states: dict[str, DeploymentState] = {}
+        self.synced = threading.Event()
+        self.resource_version: str | None = None
+        self.events = 0
+
+        self.thread = threading.Thread(
+            target=self.__run, name="DeploymentCache", daemon=True
+        )
+
+    def start(self):
+        self.thread.start()
+
+    def wait_for_sync(self, timeout: float | None = None) -> bool:
+        return self.synced.wait(timeout)
+
+    @staticmethod
+    def __to_state(deployment) -> DeploymentState:
+        status = deployment.status
+        return DeploymentState(
+            desired=deployment.spec.replicas or 0,
+            ready=status.ready_replicas or 0,
+            available=status.available_replicas or 0,
+            updated=status.updated_replicas or 0,
+            generation=deployment.metadata.generation or 0,
+            observed_generation=status.observed_generation or 0,
+        )
+
+    def __list(self):
+        response = self.v1.list_namespaced_deployment(namespace=self.namespace)
+        with self.lock:
+            self.states = {
+                deployment.metadata.name: self.__to_state(deployment)
+                for deployment in response.items
+                if deployment.metadata.name in self.deployments
+            }
+        self.resource_version = response.metadata.resource_version
+        self.synced.set()
+
+    def __watch(self):
+        stream = watch.Watch().stream(
+            self.v1.list_namespaced_deployment,
+            namespace=self.namespace,
+            resource_version=self.resource_version,
+            timeout_seconds=self.watch_timeout,
+        )
+        for event in stream:
+            deployment = event['object']
+            self.resource_version = deployment.metadata.resource_version
+            name = deployment.metadata.name
+            if name not in self.deployments:
+                continue
+            with self.lock:
+                if event['type'] == 'DELETED':
+                    self.states.pop(name, None)
+                else:
+                    self.states[name] = self.__to_state(deployment)
+            self.events += 1
+
+    def __run(self):
+        while True:
+            try:
+                if self.resource_version is None:
+                    self.__list()
+                self.__watch()
+            except ApiException as e:
+                if e.status == 410:
+                    # Our resource version is too old, relist from scratch
+                    logger.info("Watch expired, relisting deployments.")
+                    self.resource_version = None
+                    continue
+                self.__fail(e)
+            except Exception as e:
+                self.__fail(e)
+
+    def __fail(self, error: Exception):
+        logger.error(f"Deployment watch failed: {error}")
+        # Until a relist succeeds the states are frozen; readers go back to querying
+        self.synced.clear()
+        self.resource_version = None
+        time.sleep(self.retry_interval)
+
+    def set_desired(self, deployment_name: str, replicas: int):
+        # Reflect our own patch immediately; the watch event will confirm it
+        with self.lock:
+            state = self.states.get(deployment_name)
+            if state is not None:
+                state.desired = replicas
+
+    def snapshot(self) -> dict[str, DeploymentState]:
+        with self.lock:
+            return {
+                name: DeploymentState(**vars(state))
+                for name, state in self.states.items()
+            }
+
+    def ready_pods(self) -> dict[str, int]:
+        with self.lock:
+            return {name: state.ready for name, state in self.states.items()}
+
+    def desired_pods(self) -> dict[str, int]:
+        with self.lock:
+            return {name: state.desired for name, state in self.states.items()}
@@ -1,20 +1,145 @@
+import concurrent.futures
+import email.utils
 import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from datetime import timezone
+
 from kubernetes import client, config
+from kubernetes.client.rest import ApiException
+from urllib3.exceptions import HTTPError
+
+from .deployment_cache import DeploymentCache
 
 logger = logging.getLogger("ResourceManager")
 
 
+@dataclass
+class ScaleResult:
+    deployment: str
+    replicas: int
+    success: bool
+    attempts: int = 0
+    duration: float = 0.0
+    error: str | None = None
+    coalesced: bool = False
+
+
+def _retry_after_seconds(retry_after: str) -> float | None:
+    # Retry-After is either a number of seconds or an HTTP-date
+    try:
+        return max(float(retry_after), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    if retry_at is None:
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(retry_at.timestamp() - time.time(), 0.0)
+
+
+class _RateLimiter:
+    def __init__(self, qps: float, burst: int):
+        self.qps = qps
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.qps)
+                self.updated = now
+                wait = max(self.blocked_until - now, 0)
+                if wait == 0 and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                if wait == 0:
+                    wait = (1 - self.tokens) / self.qps
+            time.sleep(wait)
+
+    def block(self, seconds: float):
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
 class ResourceManager:
-    def __init__(self):
-        config.load_incluster_config()
-        self.v1 = client.AppsV1Api()
+    RETRYABLE_STATUS = (429, 500, 502, 503, 504)
 
-    def scale_deployment(
+    def __init__(
         self,
-        deployment_name: str,
-        replicas: int,
-        namespace: str = 'default'
+        host: str | None = None,
+        kube_context: str | None = None,
+        namespace: str = 'default',
+        pool_size: int = 8,
+        request_timeout: float = 5,
+        max_retries: int = 3,
+        backoff: float = 0.2,
+        qps: float = 10,
+        burst: int = 20
     ):
+        configuration = client.Configuration()
+        if host is not None:
+            # Plain endpoint, e.g. `kubectl proxy` or a local fake API server
+            configuration.host = host
+            configuration.verify_ssl = False
+        elif kube_context is not None:
+            # Another cluster, reached through a kubeconfig context
+            config.load_kube_config(context=kube_context, client_configuration=configuration)
+        else:
+            config.load_incluster_config(client_configuration=configuration)
+        configuration.connection_pool_maxsize = pool_size
+
+        self.api_client = client.ApiClient(configuration)
+        self.v1 = client.AppsV1Api(self.api_client)
+
+        self.namespace = namespace
+        self.request_timeout = request_timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.rate_limiter = _RateLimiter(qps=qps, burst=burst)
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=pool_size, thread_name_prefix="ResourceManager"
+        )
+
+        self.lock = threading.Lock()
+        self.in_flight: dict[tuple[str, str], concurrent.futures.Future] = {}
+        self.pending: dict[tuple[str, str], int] = {}
+        self.deployment_cache: DeploymentCache | None = None
+        self.deployment_caches: dict[str, DeploymentCache] = {}
+
+    def start_deployment_cache(
+        self,
+        deployments: list[str],
+        namespace: str | None = None,
+        watch_timeout: int = 300,
+        sync_timeout: float | None = None
+    ) -> DeploymentCache:
+        namespace = namespace or self.namespace
+        deployment_cache = DeploymentCache(
+            v1=self.v1,
+            namespace=namespace,
+            deployments=deployments,
+            watch_timeout=watch_timeout
+        )
+        deployment_cache.start()
+        if not deployment_cache.wait_for_sync(sync_timeout):
+            logger.warning(f"Deployment cache for {namespace} has not synced yet.")
+        self.deployment_caches[namespace] = deployment_cache
+        if namespace == self.namespace:
+            self.deployment_cache = deployment_cache
+        return deployment_cache
+
+    def __patch(self, deployment_name: str, replicas: int, namespace: str):
         logger.info(f"Scaling {deployment_name} to {replicas} replica(s).")
         patch_body = {
             "spec": {
@@ -24,15 +149,155 @@ class ResourceManager:
         return self.v1.patch_namespaced_deployment_scale(
             name=deployment_name,
             namespace=namespace,
-            body=patch_body
+            body=patch_body,
+            _request_timeout=self.request_timeout
+        )
+
+    def __patch_with_retry(self, deployment_name: str, replicas: int, namespace: str) -> ScaleResult:
+        started = time.perf_counter()
+        error = None
+        for attempt in range(1, self.max_retries + 2):
+            self.rate_limiter.acquire()
+            try:
+                self.__patch(deployment_name, replicas, namespace)
+                return ScaleResult(
+                    deployment=deployment_name,
+                    replicas=replicas,
+                    success=True,
+                    attempts=attempt,
+                    duration=time.perf_counter() - started
+                )
+            except ApiException as e:
+                error = f"{e.status} {e.reason}"
+                if e.status not in self.RETRYABLE_STATUS:
+                    break
+                retry_after = (e.headers or {}).get('Retry-After')
+                if e.status == 429 and retry_after is not None:
+                    seconds = _retry_after_seconds(retry_after)
+                    if seconds is None:
+                        logger.warning(f"Ignoring unparseable Retry-After header: {retry_after}")
+                    else:
+                        self.rate_limiter.block(seconds)
+            except HTTPError as e:
+                error = str(e)
+
+            if attempt <= self.max_retries:
+                # Full jitter keeps retries from many deployments from synchronizing
+                time.sleep(random.uniform(0, self.backoff * 2 ** (attempt - 1)))
+
+        logger.error(f"Failed to scale {deployment_name} to {replicas} replica(s): {error}")
+        return ScaleResult(
+            deployment=deployment_name,
+            replicas=replicas,
+            success=False,
+            attempts=attempt,
+            duration=time.perf_counter() - started,
+            error=error
         )
 
+    def __apply(self, key: tuple[str, str], replicas: int) -> ScaleResult:
+        namespace, deployment_name = key
+        try:
+            while True:
+                result = self.__patch_with_retry(deployment_name, replicas, namespace)
+                deployment_cache = self.deployment_caches.get(namespace)
+                if result.success and deployment_cache is not None:
+                    deployment_cache.set_desired(deployment_name, replicas)
+                with self.lock:
+                    # A newer target arrived while this one was in flight
+                    pending = self.pending.pop(key, None)
+                    if pending is None or pending == replicas:
+                        self.in_flight.pop(key, None)
+                        return result
+                replicas = pending
+        except Exception:
+            with self.lock:
+                self.in_flight.pop(key, None)
+                self.pending.pop(key, None)
+            raise
+
+    @staticmethod
+    def __coalesced_result(result: ScaleResult, replicas: int) -> ScaleResult:
+        # A target replaced by a newer one before it was sent was never applied
+        superseded = result.replicas != replicas
+        return ScaleResult(
+            deployment=result.deployment,
+            replicas=replicas,
+            success=result.success and not superseded,
+            attempts=result.attempts,
+            duration=result.duration,
+            error=f"Superseded by a target of {result.replicas} replica(s)." if superseded else result.error,
+            coalesced=True
+        )
+
+    def scale_deployments(
+        self,
+        targets: dict[str, int],
+        namespace: str | None = None,
+        timeout: float | None = None
+    ) -> dict[str, ScaleResult]:
+        namespace = namespace or self.namespace
+        results: dict[str, ScaleResult] = {}
+        futures: dict[concurrent.futures.Future, str] = {}
+        coalesced: set[str] = set()
+
+        with self.lock:
+            for deployment_name, replicas in targets.items():
+                key = (namespace, deployment_name)
+                if key in self.in_flight:
+                    # The in-flight call picks this target up next; its outcome is this call's outcome
+                    self.pending[key] = replicas
+                    futures[self.in_flight[key]] = deployment_name
+                    coalesced.add(deployment_name)
+                    continue
+                future = self.executor.submit(self.__apply, key, replicas)
+                self.in_flight[key] = future
+                futures[future] = deployment_name
+
+        done, not_done = concurrent.futures.wait(futures, timeout=timeout)
+        for future in done:
+            deployment_name = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = ScaleResult(
+                    deployment=deployment_name,
+                    replicas=targets[deployment_name],
+                    success=False,
+                    error=str(e)
+                )
+            if deployment_name in coalesced:
+                result = self.__coalesced_result(result, targets[deployment_name])
+            results[deployment_name] = result
+        for future in not_done:
+            deployment_name = futures[future]
+            results[deployment_name] = ScaleResult(
+                deployment=deployment_name,
+                replicas=targets[deployment_name],
+                success=False,
+                error="Timed out waiting for the API server.",
+                coalesced=deployment_name in coalesced
+            )
+
+        return results
+
+    def scale_deployment(
+        self,
+        deployment_name: str,
+        replicas: int,
+        namespace: str | None = None
+    ):
+        return self.scale_deployments(
+            {deployment_name: replicas}, namespace=namespace
+        )[deployment_name]
+
     def get_deployment_info(
         self,
         deployment_name: str,
-        namespace: str = 'default'
+        namespace: str | None = None
     ):
         return self.v1.read_namespaced_deployment(
             name=deployment_name,
-            namespace=namespace,
+            namespace=namespace or self.namespace,
+            _request_timeout=self.request_timeout
         )
@@ -0,0 +1,3 @@
+from .scheduler import CycleScheduler, StageDeadlineExceeded
+
+__all__ = ['CycleScheduler', 'StageDeadlineExceeded']
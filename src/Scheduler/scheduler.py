@@ -0,0 +1,170 @@
+import concurrent.futures
+import logging
+import math
+import threading
+import time
+from collections import defaultdict
+from typing import Callable
+
+logger = logging.getLogger("Scheduler")
+
+
+class StageDeadlineExceeded(Exception):
+    def __init__(self, stage: str, deadline: float):
+        super().__init__(f"Stage {stage} exceeded its {deadline}s deadline.")
+        self.stage = stage
+
+
+class CycleScheduler:
+    def __init__(
+        self,
+        period: int,
+        alignment_offset: float = 0,
+        prefetch_lead: float = 0,
+        stage_deadlines: dict[str, float] | None = None
+    ):
+        self.period = period
+        self.alignment_offset = alignment_offset
+        self.prefetch_lead = prefetch_lead
+        self.stage_deadlines = stage_deadlines or {}
+
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=len(self.stage_deadlines) + 2, thread_name_prefix="Scheduler"
+        )
+        self.lock = threading.Lock()
+        self.running_stages: dict[str, concurrent.futures.Future] = {}
+        self.prefetched: concurrent.futures.Future | None = None
+        self.prefetch_abandoned: threading.Event | None = None
+        self.next_boundary_time: float | None = None
+
+        self.cycles = 0
+        self.failed_cycles = 0
+        self.missed_cycles = 0
+        self.missed_deadlines: dict[str, int] = defaultdict(int)
+        self.skipped_stages: dict[str, int] = defaultdict(int)
+        self.stage_durations: dict[str, float] = {}
+        self.last_cycle_lag = 0.0
+        self.last_cycle_duration = 0.0
+
+    def next_boundary(self, now: float) -> float:
+        boundary = math.floor((now - self.alignment_offset) / self.period) * self.period
+        return boundary + self.period + self.alignment_offset
+
+    def run_stage(self, stage: str, function: Callable, fallback: Callable | None = None):
+        started = time.perf_counter()
+        deadline = self.stage_deadlines.get(stage)
+
+        if deadline is None:
+            result = function()
+        else:
+            with self.lock:
+                previous = self.running_stages.get(stage)
+                if previous is not None and not previous.done():
+                    # The previous attempt is still stuck, never stack another behind it
+                    self.skipped_stages[stage] += 1
+                    future = None
+                else:
+                    future = self.executor.submit(function)
+                    self.running_stages[stage] = future
+
+            try:
+                if future is None:
+                    raise concurrent.futures.TimeoutError()
+                result = future.result(timeout=deadline)
+            except concurrent.futures.TimeoutError:
+                self.missed_deadlines[stage] += 1
+                logger.warning(f"Stage {stage} missed its {deadline}s deadline.")
+                if fallback is None:
+                    raise StageDeadlineExceeded(stage, deadline)
+                result = fallback()
+
+        self.stage_durations[stage] = time.perf_counter() - started
+        return result
+
+    def prefetch_next(self, function: Callable):
+        if self.prefetched is not None or self.next_boundary_time is None:
+            return
+        start = self.next_boundary_time - self.prefetch_lead
+        abandoned = threading.Event()
+
+        def delayed():
+            if abandoned.wait(max(start - time.time(), 0)):
+                return None
+            return function()
+
+        with self.lock:
+            previous = self.running_stages.get('fetch')
+            if previous is not None and not previous.done():
+                # A fetch that missed its deadline still holds the metrics fetcher
+                self.skipped_stages['fetch'] += 1
+                return
+            # Tracked like any fetch, so no other fetch runs next to it
+            self.prefetched = self.running_stages['fetch'] = self.executor.submit(delayed)
+            self.prefetch_abandoned = abandoned
+
+    def __abandon_prefetch(self):
+        # A prefetch still waiting for its start returns without fetching; one already fetching
+        # stays in running_stages until it finishes
+        if self.prefetch_abandoned is not None:
+            self.prefetch_abandoned.set()
+        self.prefetched = self.prefetch_abandoned = None
+
+    def __await_fetch(self):
+        with self.lock:
+            previous = self.running_stages.get('fetch')
+        if previous is None or previous.done():
+            return
+        try:
+            previous.result(timeout=self.stage_deadlines.get('fetch'))
+        except Exception:
+            pass
+
+    def __collect(self, fetch: Callable):
+        prefetched, self.prefetched, self.prefetch_abandoned = self.prefetched, None, None
+        if prefetched is None:
+            # Never fetch next to an abandoned prefetch or a late fetch that is still running
+            self.__await_fetch()
+            return self.run_stage('fetch', fetch)
+
+        started = time.perf_counter()
+        try:
+            result = prefetched.result(timeout=self.stage_deadlines.get('fetch'))
+        except concurrent.futures.TimeoutError:
+            self.missed_deadlines['fetch'] += 1
+            raise StageDeadlineExceeded('fetch', self.stage_deadlines.get('fetch'))
+        self.stage_durations['fetch'] = time.perf_counter() - started
+        return result
+
+    def run(self, cycle: Callable[[dict], None], fetch: Callable[[], dict]):
+        boundary = self.next_boundary(time.time())
+        while True:
+            delay = boundary - time.time()
+            if delay > 0:
+                time.sleep(delay)
+
+            cycle_started = time.time()
+            self.last_cycle_lag = cycle_started - boundary
+            self.next_boundary_time = self.next_boundary(boundary)
+            self.cycles += 1
+
+            try:
+                cycle(self.__collect(fetch))
+            except Exception as e:
+                self.failed_cycles += 1
+                logger.error(f"An error occurred: {e}")
+
+            self.last_cycle_duration = time.time() - cycle_started
+            logger.info(
+                f"Cycle took {self.last_cycle_duration:.2f}s, started {self.last_cycle_lag:.2f}s late."
+            )
+
+            # Skip boundaries that have already passed instead of running back-to-back
+            boundary = self.next_boundary_time
+            now = time.time()
+            if now > boundary:
+                missed = math.floor((now - boundary) / self.period) + 1
+                self.missed_cycles += missed
+                logger.warning(f"Cycle overran its period, skipping {missed} boundary(ies).")
+                boundary = self.next_boundary(now)
+                self.next_boundary_time = boundary
+                self.__abandon_prefetch()
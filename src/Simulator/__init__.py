@@ -0,0 +1,3 @@
+from .simulator import SimulatedCluster, SimulatedMetricsFetcher, SimulatedResourceManager, Simulator
+
+__all__ = ['SimulatedCluster', 'SimulatedMetricsFetcher', 'SimulatedResourceManager', 'Simulator']
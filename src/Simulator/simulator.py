@@ -0,0 +1,214 @@
+import logging
+import time
+
+import numpy as np
+
+from Controller import Controller
+from ResourceManager import ScaleResult
+from TrafficForecasterModel import TrafficForecasterModel
+
+logger = logging.getLogger("Simulator")
+
+
+class SimulatedCluster:
+    def __init__(
+        self,
+        services: list[str],
+        initial_pods: np.ndarray,
+        startup_delay: np.ndarray,
+        capacity: np.ndarray,
+        base_latency: np.ndarray,
+        max_latency: np.ndarray,
+        cpu_per_rps: float = 0.05,
+        node_cpu_capacity: float = 40
+    ):
+        self.services = services
+        self.desired = np.asarray(initial_pods, dtype=int).copy()
+        self.ready = self.desired.copy()
+        self.startup_delay = np.asarray(startup_delay, dtype=int)
+        self.capacity = np.asarray(capacity, dtype=float)
+        self.base_latency = np.asarray(base_latency, dtype=float)
+        self.max_latency = np.asarray(max_latency, dtype=float)
+        self.cpu_per_rps = cpu_per_rps
+        self.node_cpu_capacity = node_cpu_capacity
+
+        # pending[i, d] = pods of service i that become ready in d minutes
+        self.pending = np.zeros((len(services), int(self.startup_delay.max()) + 1), dtype=int)
+        self.minute = 0
+
+    def scale(self, service_index: int, replicas: int):
+        current = self.desired[service_index]
+        if replicas > current:
+            self.pending[service_index, self.startup_delay[service_index]] += replicas - current
+        else:
+            # Scale-down removes pending pods first, then ready ones, immediately
+            surplus = current - replicas
+            for delay in range(self.pending.shape[1] - 1, -1, -1):
+                removed = min(surplus, self.pending[service_index, delay])
+                self.pending[service_index, delay] -= removed
+                surplus -= removed
+            self.ready[service_index] -= surplus
+        self.desired[service_index] = replicas
+
+    def tick(self):
+        self.ready += self.pending[:, 0]
+        self.pending = np.roll(self.pending, -1, axis=1)
+        self.pending[:, -1] = 0
+        self.minute += 1
+
+    def latency(self, traffic: np.ndarray) -> np.ndarray:
+        # Each pod is an M/M/1 queue; saturated services are clipped to max_latency
+        utilisation = traffic / (np.maximum(self.ready, 1) * self.capacity)
+        latency = self.base_latency / np.maximum(1 - utilisation, 1e-6)
+        return np.where(utilisation < 1, np.minimum(latency, self.max_latency), self.max_latency)
+
+    def pod_cpu(self, traffic: np.ndarray) -> np.ndarray:
+        return traffic * self.cpu_per_rps / np.maximum(self.ready, 1) * 100 * 0.05
+
+    def node_cpu(self, traffic: np.ndarray) -> float:
+        return float(min(traffic.sum() * self.cpu_per_rps / self.node_cpu_capacity, 1.0))
+
+
+class SimulatedMetricsFetcher:
+    def __init__(self, cluster: SimulatedCluster, trace: np.ndarray):
+        self.cluster = cluster
+        self.trace = trace
+
+    def fetch_metrics(self, fetch_starting_datetime=None, include_pod_counts: bool = True):
+        traffic = self.trace[self.cluster.minute]
+        services = self.cluster.services
+        return {
+            'traffic': {service: self.trace[:self.cluster.minute + 1, i] for i, service in enumerate(services)},
+            'node_cpu': {'cpu_node': self.cluster.node_cpu(traffic)},
+            'pod_cpu': dict(zip(services, self.cluster.pod_cpu(traffic).tolist())),
+            'ready_pod': dict(zip(services, self.cluster.ready.tolist())),
+            'pod': dict(zip(services, self.cluster.desired.tolist())),
+        }
+
+    def traffic_watermark(self) -> float:
+        return float(self.cluster.minute * 60)
+
+
+class SimulatedResourceManager:
+    def __init__(self, cluster: SimulatedCluster):
+        self.cluster = cluster
+        self.deployment_cache = None
+        self.deployment_caches = {}
+
+    def scale_deployments(self, targets: dict[str, int], namespace: str | None = None, timeout=None):
+        results = {}
+        for deployment_name, replicas in targets.items():
+            self.cluster.scale(self.cluster.services.index(deployment_name), replicas)
+            results[deployment_name] = ScaleResult(
+                deployment=deployment_name, replicas=replicas, success=True, attempts=1
+            )
+        return results
+
+    def scale_deployment(self, deployment_name: str, replicas: int, namespace: str | None = None):
+        return self.scale_deployments({deployment_name: replicas})[deployment_name]
+
+
+class Simulator:
+    def __init__(
+        self,
+        traffic_forecaster_model: TrafficForecasterModel,
+        trace: np.ndarray,
+        services_threshold: dict[str, int],
+        capacity: dict[str, float],
+        startup_delay: dict[str, int],
+        initial_pods: int = 1,
+        base_latency_ratio: float = 0.3,
+        max_latency_ratio: float = 10,
+        context_length: int = 1440,
+        batch_size: int = 64
+    ):
+        self.traffic_forecaster_model = traffic_forecaster_model
+        self.trace = np.asarray(trace, dtype=float)
+        self.services_threshold = services_threshold
+        self.services = list(services_threshold.keys())
+        self.capacity = np.array([capacity[service] for service in self.services], dtype=float)
+        self.startup_delay = np.array([startup_delay[service] for service in self.services], dtype=int)
+        self.initial_pods = initial_pods
+        self.thresholds = np.array([services_threshold[service] for service in self.services], dtype=float)
+        self.base_latency = self.thresholds * base_latency_ratio
+        self.max_latency = self.thresholds * max_latency_ratio
+        self.context_length = context_length
+        self.batch_size = batch_size
+
+    def forecast(self, start: int, end: int) -> np.ndarray:
+        # Forecasts do not depend on scaling decisions, so all windows go through PatchTST in batches
+        windows = np.lib.stride_tricks.sliding_window_view(
+            self.trace[start - self.context_length + 1:end], self.context_length, axis=0
+        ).transpose(0, 2, 1)
+        started = time.perf_counter()
+        forecasts = self.traffic_forecaster_model.predict_batch(windows, batch_size=self.batch_size)
+        logger.info(
+            f"Forecasted {len(windows)} window(s) in {time.perf_counter() - started:.2f}s."
+        )
+        return forecasts
+
+    def run(self, controller_factory, start: int | None = None, end: int | None = None) -> dict:
+        start = start if start is not None else self.context_length - 1
+        end = min(end if end is not None else len(self.trace) - 1, len(self.trace) - 1)
+        forecasts = self.forecast(start, end)
+
+        cluster = SimulatedCluster(
+            services=self.services,
+            initial_pods=np.full(len(self.services), self.initial_pods),
+            startup_delay=self.startup_delay,
+            capacity=self.capacity,
+            base_latency=self.base_latency,
+            max_latency=self.max_latency
+        )
+        cluster.minute = start
+        metrics_fetcher = SimulatedMetricsFetcher(cluster, self.trace)
+        resource_manager = SimulatedResourceManager(cluster)
+        controller: Controller = controller_factory(metrics_fetcher, resource_manager)
+
+        num_steps = end - start
+        ready = np.zeros((num_steps, len(self.services)), dtype=int)
+        latency = np.zeros((num_steps, len(self.services)))
+        decision_latency = np.zeros(num_steps)
+
+        for step in range(num_steps):
+            metrics = metrics_fetcher.fetch_metrics()
+            forecasted_traffic = dict(zip(self.services, forecasts[step].tolist()))
+
+            started = time.perf_counter()
+            _, target_replicas = controller.decide(
+                forecasted_traffic,
+                metrics['node_cpu'],
+                metrics['pod_cpu'],
+                metrics['ready_pod'],
+                metrics['pod']
+            )
+            decision_latency[step] = time.perf_counter() - started
+
+            changed_replicas = {
+                service: replicas
+                for service, replicas in target_replicas.items()
+                if replicas != metrics['pod'][service]
+            }
+            resource_manager.scale_deployments(changed_replicas)
+
+            cluster.tick()
+            ready[step] = cluster.ready
+            latency[step] = cluster.latency(self.trace[cluster.minute])
+
+        return self.report(ready, latency, decision_latency)
+
+    def report(self, ready: np.ndarray, latency: np.ndarray, decision_latency: np.ndarray) -> dict:
+        violations = latency > self.thresholds
+        return {
+            'minutes': len(ready),
+            'slo_violation_minutes': dict(zip(self.services, violations.sum(axis=0).tolist())),
+            'pod_minutes': dict(zip(self.services, ready.sum(axis=0).tolist())),
+            'total_slo_violation_minutes': int(violations.any(axis=1).sum()),
+            'total_pod_minutes': int(ready.sum()),
+            'mean_latency': dict(zip(self.services, latency.mean(axis=0).round(2).tolist())),
+            'decision_latency_ms': {
+                'p50': float(np.percentile(decision_latency, 50) * 1000),
+                'p99': float(np.percentile(decision_latency, 99) * 1000),
+                'max': float(decision_latency.max() * 1000),
+            },
+        }
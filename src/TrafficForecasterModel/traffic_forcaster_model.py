@@ -1,22 +1,311 @@
 import logging
-import torch
-from transformers import PatchTSTForPrediction
+import os
+import tempfile
+import time
+
 import numpy as np
 
 logger = logging.getLogger("TrafficForecasterModel")
 
+torch = None
+
+
+def _import_torch():
+    # Deferred so that importing this module does not pull in torch/transformers
+    global torch
+    if torch is None:
+        import torch as _torch
+        torch = _torch
+    return torch
+
+
+def _prediction_outputs(model):
+    class PredictionOutputs(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.model = model
+            self.distribution = model.distribution_output is not None
+
+        def forward(self, past_values):
+            outputs = self.model(past_values=past_values)
+            if not self.distribution:
+                return outputs.prediction_outputs
+            # Fold the scaler into the Student-t location and scale so the
+            # parameters are in traffic units: (batch, [df, loc, scale], length, channels)
+            df, loc, scale = outputs.prediction_outputs
+            return torch.stack(
+                (df, outputs.loc + outputs.scale * loc, outputs.scale * scale), dim=1
+            )
+
+    return PredictionOutputs()
+
 
 class TrafficForecasterModel:
-    def __init__(self, model_path: str):
+    BACKENDS = ('eager', 'torchscript', 'onnx')
+
+    def __init__(
+        self,
+        model_path: str,
+        backend: str = 'eager',
+        num_threads: int | None = None,
+        num_interop_threads: int | None = None,
+        quantize: bool = False,
+        validation: dict | None = None
+    ):
+        if backend not in self.BACKENDS:
+            raise Exception(f"Unknown forecaster backend: {backend}.")
+
+        _import_torch()
+        from transformers import PatchTSTForPrediction
+
+        if num_threads is not None:
+            torch.set_num_threads(num_threads)
+        if num_interop_threads is not None:
+            try:
+                torch.set_num_interop_threads(num_interop_threads)
+            except RuntimeError as e:
+                logger.warning(f"Could not set inter-op threads: {e}")
+        self.num_threads = num_threads
+        self.inference_observer = None
+
         self.model = PatchTSTForPrediction.from_pretrained(model_path)
+        self.model.eval()
+        self.distribution = self.model.distribution_output is not None
+        self.warned_quantiles = False
+
+        self.context_length = self.model.config.context_length
+        self.num_channels = self.model.config.num_input_channels
+        self.input_buffer = torch.zeros(
+            (1, self.context_length, self.num_channels), dtype=torch.float32
+        )
+        self.input_array = self.input_buffer.numpy()
+
+        inference_model = self.model
+        if quantize:
+            inference_model = torch.ao.quantization.quantize_dynamic(
+                _prediction_outputs(self.model), {torch.nn.Linear}, dtype=torch.qint8
+            ).model
+
+        self.backend = backend
+        self.runner = self.__build_runner(backend, inference_model)
+        # Traced graphs are specialised to a batch of one
+        self.batch_runner = self.runner if backend != 'torchscript' else self.__build_runner('eager', inference_model)
+
+        if validation and validation.get('enabled', False) and (backend != 'eager' or quantize):
+            error = self.validate(
+                data_path=validation['data_path'],
+                num_windows=validation.get('num_windows', 8),
+            )
+            if error > validation.get('tolerance', 0.05):
+                logger.warning(
+                    f"Backend {backend} (quantize={quantize}) deviates from the eager model "
+                    f"by {error:.4f}, falling back to eager."
+                )
+                self.backend = 'eager'
+                self.runner = self.__build_runner('eager', self.model)
+                self.batch_runner = self.runner
+
+    def __build_runner(self, backend: str, model):
+        module = _prediction_outputs(model).eval()
+
+        if backend == 'eager':
+            return lambda past_values: module(past_values).numpy()
+
+        if backend == 'torchscript':
+            with torch.no_grad():
+                traced = torch.jit.trace(module, self.input_buffer, strict=False)
+            traced = torch.jit.freeze(traced.eval())
+            return lambda past_values: traced(past_values).numpy()
+
+        import onnxruntime
+
+        onnx_path = os.path.join(tempfile.mkdtemp(prefix="patchtst-"), "model.onnx")
+        torch.onnx.export(
+            module,
+            (self.input_buffer,),
+            onnx_path,
+            input_names=['past_values'],
+            output_names=['prediction_outputs'],
+            dynamic_axes={'past_values': {0: 'batch'}, 'prediction_outputs': {0: 'batch'}},
+        )
+        options = onnxruntime.SessionOptions()
+        if self.num_threads is not None:
+            options.intra_op_num_threads = self.num_threads
+            options.inter_op_num_threads = 1
+        session = onnxruntime.InferenceSession(
+            onnx_path, options, providers=['CPUExecutionProvider']
+        )
+        return lambda past_values: session.run(
+            None, {'past_values': past_values.numpy()}
+        )[0]
+
+    def __run(self, past_values: np.ndarray) -> np.ndarray:
+        started = time.perf_counter()
+        # Short windows are left-padded with zeros, like gaps in the traffic window
+        past_values = np.asarray(past_values)[-self.context_length:]
+        padding = self.context_length - len(past_values)
+        self.input_array[0, :padding] = 0
+        np.copyto(self.input_array[0, padding:], past_values, casting='unsafe')
+        model_input = self.input_buffer
+
+        with torch.inference_mode():
+            outputs = self.runner(model_input)
+
+        if self.inference_observer is not None:
+            self.inference_observer('traffic_forecaster_model', time.perf_counter() - started)
+        return outputs
+
+    def validate(self, data_path: str, num_windows: int = 8) -> float:
+        traffic = np.genfromtxt(data_path, delimiter=',', skip_header=1)[:, 1:]
+        starts = np.linspace(
+            0, len(traffic) - self.context_length, num_windows
+        ).astype(int)
+
+        started = time.perf_counter()
+        errors = []
+        for start in starts:
+            window = traffic[start:start + self.context_length]
+            with torch.inference_mode():
+                reference = _prediction_outputs(self.model)(
+                    torch.tensor(window, dtype=torch.float32).unsqueeze(0)
+                ).numpy()
+            candidate = self.__run(window)
+            errors.append(
+                np.max(np.abs(candidate - reference) / (np.abs(reference) + 1e-6))
+            )
+
+        error = float(np.max(errors))
+        logger.info(
+            f"Validated {self.backend} backend on {len(starts)} window(s): max relative error "
+            f"{error:.4f} in {time.perf_counter() - started:.2f}s."
+        )
+        return error
+
+    def predict_batch(self, past_values: np.ndarray, batch_size: int = 64) -> np.ndarray:
+        outputs = []
+        with torch.inference_mode():
+            for start in range(0, len(past_values), batch_size):
+                batch = np.ascontiguousarray(
+                    past_values[start:start + batch_size], dtype=np.float32
+                )
+                outputs.append(self.__point(self.batch_runner(torch.from_numpy(batch)))[:, 0])
+        return np.concatenate(outputs)
+
+    def __point(self, outputs: np.ndarray) -> np.ndarray:
+        # The Student-t location is its median, and its mean whenever df > 1
+        return outputs[:, 1] if self.distribution else outputs
 
     def predict(self, past_values: np.ndarray) -> np.ndarray:
-        outputs = self.model(
-            past_values=torch.tensor(
-                past_values, dtype=torch.float32
-            ).unsqueeze(0)
-        ).prediction_outputs
-        outputs = outputs.squeeze().detach().numpy().transpose().tolist()
+        outputs = self.__point(self.__run(past_values))[0, 0].tolist()
 
         logger.info(f"Forecasted Traffic: {[round(data, 2) for data in outputs]}")
         return outputs
+
+    def __step_quantiles(self, outputs: np.ndarray, quantiles: list[float]) -> np.ndarray:
+        # (quantiles, batch, steps, channels)
+        point = self.__point(outputs)
+        if not self.distribution:
+            if not self.warned_quantiles:
+                logger.warning(
+                    "Model was trained without a distribution head, quantiles fall back to the point forecast."
+                )
+                self.warned_quantiles = True
+            return np.broadcast_to(point, (len(quantiles), *point.shape))
+
+        from scipy.stats import t
+
+        df, loc, scale = outputs[:, 0], outputs[:, 1], outputs[:, 2]
+        levels = np.asarray(quantiles, dtype=np.float64).reshape(-1, 1, 1, 1)
+        # One forward pass; the inverse CDF replaces sampling num_parallel_samples paths
+        return loc + scale * t.ppf(levels, df)
+
+    def __quantiles(self, outputs: np.ndarray, quantiles: list[float]) -> np.ndarray:
+        return self.__step_quantiles(outputs, quantiles)[:, :, 0]
+
+    def predict_quantiles(
+        self,
+        past_values: np.ndarray,
+        quantiles: list[float]
+    ) -> tuple[list[float], dict[float, list[float]]]:
+        outputs = self.__run(past_values)
+        point = self.__point(outputs)[0, 0]
+        values = self.__quantiles(outputs, quantiles)[:, 0]
+
+        logger.info(
+            f"Forecasted Traffic: {[round(data, 2) for data in point.tolist()]}, quantiles: "
+            + ", ".join(
+                f"p{quantile * 100:g}={[round(data, 2) for data in row]}"
+                for quantile, row in zip(quantiles, values.tolist())
+            )
+        )
+        return point.tolist(), dict(zip(quantiles, values.tolist()))
+
+    def predict_quantiles_batch(
+        self,
+        past_values: np.ndarray,
+        quantiles: list[float],
+        batch_size: int = 64
+    ) -> tuple[np.ndarray, dict[float, np.ndarray]]:
+        points, values = [], []
+        with torch.inference_mode():
+            for start in range(0, len(past_values), batch_size):
+                batch = np.ascontiguousarray(
+                    past_values[start:start + batch_size], dtype=np.float32
+                )
+                outputs = self.batch_runner(torch.from_numpy(batch))
+                points.append(self.__point(outputs)[:, 0])
+                values.append(self.__quantiles(outputs, quantiles))
+        values = np.concatenate(values, axis=1)
+        return np.concatenate(points), dict(zip(quantiles, values))
+
+    def predict_horizon_batch(
+        self,
+        past_values: np.ndarray,
+        horizon: int,
+        quantiles: list[float] | None = None,
+        batch_size: int = 64
+    ) -> tuple[np.ndarray, dict[float, np.ndarray]]:
+        # Each pass forecasts prediction_length steps; longer horizons are rolled
+        # out by feeding the point forecast back into the window. Quantiles of the
+        # later steps are conditioned on that path, so they understate the spread.
+        quantiles = list(quantiles or [])
+        points, values = [], []
+        with torch.inference_mode():
+            for start in range(0, len(past_values), batch_size):
+                windows = np.array(past_values[start:start + batch_size], dtype=np.float32)
+                steps, step_values = [], []
+                produced = 0
+                while produced < horizon:
+                    outputs = self.batch_runner(torch.from_numpy(windows))
+                    point = self.__point(outputs)
+                    steps.append(point)
+                    if quantiles:
+                        step_values.append(self.__step_quantiles(outputs, quantiles))
+                    produced += point.shape[1]
+                    if produced < horizon:
+                        windows = np.concatenate((windows[:, point.shape[1]:], point), axis=1)
+                points.append(np.concatenate(steps, axis=1)[:, :horizon])
+                if quantiles:
+                    values.append(np.concatenate(step_values, axis=2)[:, :, :horizon])
+
+        if not quantiles:
+            return np.concatenate(points), {}
+        return np.concatenate(points), dict(zip(quantiles, np.concatenate(values, axis=1)))
+
+    def predict_horizon(
+        self,
+        past_values: np.ndarray,
+        horizon: int,
+        quantiles: list[float] | None = None
+    ) -> tuple[list[list[float]], dict[float, list[list[float]]]]:
+        # Short windows are left-padded with zeros, like gaps in the traffic window
+        window = np.zeros((self.context_length, self.num_channels), dtype=np.float32)
+        past_values = np.asarray(past_values)[-self.context_length:]
+        window[self.context_length - len(past_values):] = past_values
+
+        points, values = self.predict_horizon_batch(window[None], horizon, quantiles)
+        logger.info(
+            f"Forecasted Traffic over {horizon} step(s): "
+            f"{[[round(data, 2) for data in step] for step in points[0].tolist()]}"
+        )
+        return points[0].tolist(), {quantile: value[0].tolist() for quantile, value in values.items()}
@@ -0,0 +1,106 @@
+import argparse
+import logging
+import time
+
+import numpy as np
+
+from main import construct_file_path, load_config
+from LatencyPredictorModel import LatencyPredictorModel
+from LatencyPredictorModel.latency_predictor_model import feature_columns
+from LatencyPredictorModel.numpy_engine import save_weights
+
+logger = logging.getLogger()
+
+
+def export(model_path: str, num_target: int, output_path: str):
+    # Needs the training-time stack: TensorFlow, joblib and scikit-learn
+    import joblib
+    from tensorflow.keras.models import load_model
+
+    model = load_model(f"{model_path}/model.keras")
+    pre = joblib.load(f"{model_path}/preprocessing.joblib")
+    post = joblib.load(f"{model_path}/postprocessing.joblib")
+
+    kernels, biases, activations = [], [], []
+    for layer in model.layers:
+        if layer.__class__.__name__ == 'InputLayer':
+            continue
+        if layer.__class__.__name__ != 'Dense':
+            raise Exception(f"Layer {layer.name} ({layer.__class__.__name__}) is not supported.")
+        kernel, bias = layer.get_weights()
+        kernels.append(kernel)
+        biases.append(bias)
+        activations.append(layer.get_config()['activation'])
+
+    for name, scaler in (('preprocessing', pre), ('postprocessing', post)):
+        if type(scaler).__name__ != 'StandardScaler':
+            raise Exception(f"{name} is a {type(scaler).__name__}, only StandardScaler is supported.")
+
+    save_weights(
+        output_path,
+        kernels=kernels,
+        biases=biases,
+        activations=activations,
+        input_columns=feature_columns(num_target),
+        pre_columns=list(pre.feature_names_in_),
+        pre_mean=pre.mean_ if pre.with_mean else np.zeros(len(pre.feature_names_in_)),
+        pre_scale=pre.scale_ if pre.with_std else np.ones(len(pre.feature_names_in_)),
+        post_mean=post.mean_ if post.with_mean else np.zeros(num_target),
+        post_scale=post.scale_ if post.with_std else np.ones(num_target)
+    )
+    logger.info(f"Exported {len(kernels)} layer(s) to {output_path}.")
+
+
+def sample_inputs(data_path: str, num_target: int, num_samples: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    traffic = np.genfromtxt(data_path, delimiter=',', skip_header=1)[:, 1:num_target + 1]
+    traffic = traffic[rng.integers(0, len(traffic), num_samples)]
+    pod = rng.integers(1, 21, (num_samples, num_target)).astype(float)
+    cpu_pod = rng.uniform(0, 5, (num_samples, num_target))
+    cpu_node = rng.uniform(0, 1, num_samples)
+    return pod, cpu_pod, traffic, cpu_node
+
+
+def validate(model_path: str, num_target: int, data_path: str, num_samples: int) -> float:
+    reference = LatencyPredictorModel(model_path, num_target, backend='keras')
+    candidate = LatencyPredictorModel(model_path, num_target, backend='numpy')
+    pod, cpu_pod, traffic, cpu_node = sample_inputs(data_path, num_target, num_samples)
+
+    expected = reference.predict_batch(pod, cpu_pod, traffic, cpu_node)
+    started = time.perf_counter()
+    actual = candidate.predict_batch(pod, cpu_pod, traffic, cpu_node)
+    elapsed = time.perf_counter() - started
+
+    error = float(np.max(np.abs(actual - expected) / (np.abs(expected) + 1e-6)))
+    logger.info(
+        f"NumPy engine on {num_samples} sample(s): max relative error {error:.2e}, "
+        f"{elapsed * 1000:.2f} ms for the batch."
+    )
+    return error
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Convert the Keras latency predictor and its scalers into a NumPy weight file."
+    )
+    parser.add_argument('--config', default='config.yaml')
+    parser.add_argument('--model-path', default=None)
+    parser.add_argument('--samples', type=int, default=1024)
+    parser.add_argument('--tolerance', type=float, default=1e-3)
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    latency_predictor_config = config['modules']['latency_predictor_model']
+    model_path = args.model_path or construct_file_path(latency_predictor_config['model_path'])
+    num_target = latency_predictor_config['num_target']
+
+    export(model_path, num_target, f"{model_path}/weights.npz")
+
+    error = validate(
+        model_path,
+        num_target,
+        construct_file_path(config['modules']['controller']['test']['data_path']),
+        args.samples
+    )
+    if error > args.tolerance:
+        raise SystemExit(f"NumPy engine deviates from the Keras model by {error:.2e}.")
@@ -1,12 +1,29 @@
+import concurrent.futures
 import os
+import re
+import threading
+import time
 import yaml
 import logging
 
 from Exporter import Exporter
 from Controller import Controller
+from DecisionLog import DecisionLog
+from FastPath import FastPath
+from Federation import FederatedMetricsFetcher, FederatedResourceManager
+from HistoryStore import HistoryStore
+from HorizonPlanner import HorizonPlanner, ScaleActionQueue
 from LatencyPredictorModel import LatencyPredictorModel
 from MetricsFetcher import MetricsFetcher
+from ModelRegistry import ModelRegistry, version_name
+from ModelWorker import LatencyPredictorClient, ModelWorker, TrafficForecasterClient
+from MultiAppController import MultiAppController, shard_applications
+from OnlineTrainer import ExperienceLog, OnlineTrainer
+from PredictionCache import PredictionCache
+from RemoteWrite import RemoteWriteReceiver
+from ReplicaOptimizer import ReplicaOptimizer
 from ResourceManager import ResourceManager
+from Scheduler import CycleScheduler
 from TrafficForecasterModel import TrafficForecasterModel
 
 
@@ -51,38 +68,491 @@ def construct_file_path(file_path: str):
     return os.path.join(os.path.dirname(os.path.dirname(__file__)), file_path)
 
 
+def load_component(exporter: Exporter, name: str, factory, **kwargs):
+    exporter.set_component_state(name, Exporter.LOADING)
+    started = time.perf_counter()
+    try:
+        component = factory(**kwargs)
+    except Exception:
+        exporter.set_component_state(name, Exporter.FAILED)
+        raise
+    elapsed = time.perf_counter() - started
+    exporter.record_startup_phase(name, elapsed)
+    exporter.set_component_state(name, Exporter.READY)
+    logger.info(f"Loaded {name} in {elapsed:.2f}s.")
+    return component
+
+
+def load_model(exporter: Exporter, name: str, model_class, client_class, workers_config: dict, **kwargs):
+    if not workers_config.get('enabled', False):
+        return load_component(exporter, name, model_class, **kwargs)
+
+    worker_config = workers_config.get(name) or {}
+    worker = ModelWorker(
+        name=name,
+        target=f"{model_class.__module__}:{model_class.__name__}",
+        kwargs=kwargs,
+        attributes=getattr(client_class, 'ATTRIBUTES', None),
+        num_threads=worker_config.get('num_threads', kwargs.get('num_threads') or 1),
+        cpu_affinity=worker_config.get('cpu_affinity'),
+        buffer_bytes=workers_config.get('buffer_bytes', 16 * 1024 * 1024),
+        call_timeout=workers_config.get('call_timeout', 30),
+        start_timeout=workers_config.get('start_timeout', 300),
+        restart_backoff=workers_config.get('restart_backoff', 5)
+    )
+    # Restarts flip readiness while the worker reloads its model
+    worker.state_observer = exporter.set_component_state
+    return load_component(exporter, name, lambda: client_class(worker.start()))
+
+
+def resolve_applications(controller_config: dict) -> tuple[list[dict], bool]:
+    applications = controller_config.get('applications') or []
+    if not applications:
+        return [{'name': 'default'}], False
+
+    sharding = controller_config.get('sharding') or {}
+    shard_count = sharding.get('shards', 1)
+    shard_index = sharding.get('shard_index')
+    if shard_index is None and shard_count > 1:
+        # StatefulSet pods are named <name>-<ordinal>; Deployment pods are not, and must not all become shard 0
+        match = re.fullmatch(r'.+-(\d+)', os.environ.get('HOSTNAME', ''))
+        if match is None:
+            raise Exception(
+                f"Cannot derive a shard index from HOSTNAME {os.environ.get('HOSTNAME')!r}; "
+                f"run as a StatefulSet or set sharding.shard_index."
+            )
+        shard_index = int(match.group(1))
+    if shard_index is None:
+        shard_index = 0
+    if not 0 <= shard_index < shard_count:
+        raise Exception(
+            f"Shard index {shard_index} is out of range for {shard_count} shard(s); "
+            f"the StatefulSet replicas must match sharding.shards."
+        )
+
+    owned = set(shard_applications(
+        [application['name'] for application in applications],
+        shard_count=shard_count,
+        shard_index=shard_index,
+        virtual_nodes=sharding.get('virtual_nodes', 64)
+    ))
+    logger.info(f"Shard {shard_index}/{shard_count} owns {len(owned)} of {len(applications)} application(s).")
+    return [application for application in applications if application['name'] in owned], True
+
+
 if __name__ == '__main__':
+    startup_started = time.perf_counter()
     logger.info("Initializing System!")
     config = load_config('config.yaml')
 
-    exporter = Exporter(port=config['exporter']['port'])
-    latency_predictor_model = LatencyPredictorModel(
-        model_path=construct_file_path(
-            config['modules']['latency_predictor_model']['model_path']
-        ),
-        num_target=config['modules']['latency_predictor_model']['num_target']
-    )
-    metrics_fetcher = MetricsFetcher(
-        prometheus_url=config['modules']['metrics_fetcher']['prometheus_url']
-    )
-    resource_manager = ResourceManager()
-    traffic_forecaster_model = TrafficForecasterModel(
-        model_path=config['modules']['traffic_forecaster_model']['model_path']
+    exporter = Exporter(
+        port=config['exporter']['port'],
+        instrumentation=config['exporter'].get('instrumentation', True),
+        tracing=config['exporter'].get('tracing', False)
     )
+    exporter.set_component_state('controller', Exporter.LOADING)
+    exporter.record_startup_phase('exporter', time.perf_counter() - startup_started)
 
-    controller = Controller(
-        latency_predictor_model=latency_predictor_model,
-        metrics_fetcher=metrics_fetcher,
-        resource_manager=resource_manager,
-        traffic_forecaster_model=traffic_forecaster_model,
-        cooling_down_duration=config['modules']['controller']['cooling_down_duration'],
-        max_target_pod=config['modules']['controller']['max_target_pod'],
-        services_threshold=config['modules']['controller']['services'],
-        exporter=exporter,
-        is_test=config['modules']['controller']['test']['is_test'],
-        test_data_path=config['modules']['controller']['test']['data_path'],
-        test_starting_index=config['modules']['controller']['test']['starting_index']
-    )
+    controller_config = config['modules']['controller']
+    applications, multi_app = resolve_applications(controller_config)
+    if not applications:
+        # With more shards than applications some replicas own nothing; they stay ready and idle
+        logger.warning("This shard owns no application, idling.")
+        exporter.set_component_state('controller', Exporter.READY)
+        threading.Event().wait()
+
+    model_workers_config = config['modules'].get('model_workers') or {}
+
+    # The two model families load in the background while the cheap components start
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=2, thread_name_prefix="ModelLoader"
+    ) as executor:
+        latency_predictor_future = executor.submit(
+            load_model, exporter, 'latency_predictor_model', LatencyPredictorModel,
+            LatencyPredictorClient, model_workers_config,
+            model_path=construct_file_path(
+                config['modules']['latency_predictor_model']['model_path']
+            ),
+            num_target=config['modules']['latency_predictor_model']['num_target'],
+            backend=config['modules']['latency_predictor_model'].get('backend', 'numpy')
+        )
+        traffic_forecaster_config = config['modules']['traffic_forecaster_model']
+        traffic_forecaster_future = executor.submit(
+            load_model, exporter, 'traffic_forecaster_model', TrafficForecasterModel,
+            TrafficForecasterClient, model_workers_config,
+            model_path=traffic_forecaster_config['model_path'],
+            backend=traffic_forecaster_config.get('backend', 'eager'),
+            num_threads=traffic_forecaster_config.get('num_threads'),
+            num_interop_threads=traffic_forecaster_config.get('num_interop_threads'),
+            quantize=traffic_forecaster_config.get('quantize', False),
+            validation=traffic_forecaster_config.get('validation')
+        )
+
+        resource_manager_config = dict(config['modules'].get('resource_manager') or {})
+        deployment_cache_config = resource_manager_config.pop('deployment_cache', None) or {}
+        federation_config = config['modules'].get('federation') or {}
+        clusters = federation_config.get('clusters') or []
+        if clusters:
+            resource_manager = FederatedResourceManager(
+                resource_managers={
+                    cluster['name']: load_component(
+                        exporter, f"resource_manager:{cluster['name']}", ResourceManager,
+                        host=cluster.get('api_server'),
+                        kube_context=cluster.get('kube_context'),
+                        **resource_manager_config
+                    )
+                    for cluster in clusters
+                },
+                namespace=resource_manager_config.get('namespace', 'default'),
+                min_replicas=federation_config.get('min_replicas', 1),
+                max_replicas={cluster['name']: cluster.get('max_replicas') for cluster in clusters}
+            )
+            exporter.register_federation(resource_manager)
+        else:
+            resource_manager = load_component(
+                exporter, 'resource_manager', ResourceManager,
+                **resource_manager_config
+            )
+
+        metrics_fetcher_config = config['modules']['metrics_fetcher']
+        remote_write_receiver = None
+        if metrics_fetcher_config.get('source', 'prometheus') == 'remote_write':
+            if clusters:
+                raise Exception("Remote write ingestion cannot tell clusters apart, use the Prometheus source.")
+            remote_write_config = metrics_fetcher_config.get('remote_write') or {}
+            remote_write_receiver = load_component(
+                exporter, 'remote_write_receiver', RemoteWriteReceiver,
+                port=remote_write_config.get('port', 9201),
+                path=remote_write_config.get('path', '/api/v1/write'),
+                retention=remote_write_config.get('retention', 600),
+                staleness=remote_write_config.get('staleness', 300)
+            )
+            exporter.register_remote_write(remote_write_receiver)
+
+        online_training_config = config['modules'].get('online_training') or {}
+        online_training = online_training_config.get('enabled', False)
 
-    logger.info("System is ready and running!")
+        model_registry_config = config['modules'].get('model_registry') or {}
+        model_registry_enabled = model_registry_config.get('enabled', False)
+        latency_shadows = (model_registry_config.get('latency_predictor_model') or {}).get('shadows') or []
+        traffic_shadows = (model_registry_config.get('traffic_forecaster_model') or {}).get('shadows') or []
+
+        history_store_config = config['modules'].get('history_store') or {}
+        metrics_fetchers: dict[str, MetricsFetcher | FederatedMetricsFetcher] = {}
+        history_stores: dict[str, HistoryStore | None] = {}
+        for application in applications:
+            # Component names stay unsuffixed for the single-application setup
+            suffix = f":{application['name']}" if multi_app else ""
+            namespace = application.get('namespace', resource_manager_config.get('namespace', 'default'))
+            services = list(application.get('services', controller_config['services']).keys())
+
+            metrics_fetcher_kwargs = dict(
+                namespace=namespace,
+                pod_pattern=application.get('pod_pattern', metrics_fetcher_config.get('pod_pattern', '^s[0-6].*')),
+                incremental_traffic=metrics_fetcher_config.get('incremental_traffic', False),
+                traffic_step=metrics_fetcher_config.get('traffic_step', 60),
+                traffic_max_gap=metrics_fetcher_config.get('traffic_max_gap', 600),
+                traffic_late_steps=metrics_fetcher_config.get('traffic_late_steps', 2),
+                query_timeout=metrics_fetcher_config.get('query_timeout', 10),
+                connect_timeout=metrics_fetcher_config.get('connect_timeout', 3),
+                pool_size=metrics_fetcher_config.get('pool_size', 8),
+                non_critical_metrics=metrics_fetcher_config.get('non_critical_metrics'),
+                receiver=remote_write_receiver,
+                # Shadow latency versions are scored against the observed latency
+                observe_latency=online_training or (model_registry_enabled and bool(latency_shadows))
+            )
+            if clusters:
+                metrics_fetchers[application['name']] = FederatedMetricsFetcher(
+                    fetchers={
+                        cluster['name']: load_component(
+                            exporter, f"metrics_fetcher{suffix}:{cluster['name']}", MetricsFetcher,
+                            prometheus_url=cluster['prometheus_url'],
+                            **metrics_fetcher_kwargs
+                        )
+                        for cluster in clusters
+                    },
+                    resource_managers=resource_manager.resource_managers,
+                    namespace=namespace,
+                    deadline=federation_config.get('deadline', 15),
+                    deadlines={cluster['name']: cluster.get('deadline') for cluster in clusters}
+                )
+                resource_manager.add_metrics_fetcher(namespace, metrics_fetchers[application['name']])
+            else:
+                metrics_fetchers[application['name']] = load_component(
+                    exporter, f"metrics_fetcher{suffix}", MetricsFetcher,
+                    prometheus_url=metrics_fetcher_config['prometheus_url'],
+                    **metrics_fetcher_kwargs
+                )
+            if remote_write_receiver is not None:
+                remote_write_receiver.add_selectors(
+                    metrics_fetchers[application['name']].remote_write_selectors()
+                )
+
+            if deployment_cache_config.get('enabled', False):
+                load_component(
+                    exporter, f"deployment_cache{suffix}", resource_manager.start_deployment_cache,
+                    deployments=services,
+                    namespace=namespace,
+                    watch_timeout=deployment_cache_config.get('watch_timeout', 300),
+                    sync_timeout=deployment_cache_config.get('sync_timeout', 30)
+                )
+
+            history_stores[application['name']] = None
+            if history_store_config.get('enabled', False):
+                history_path = construct_file_path(history_store_config['path'])
+                history_stores[application['name']] = load_component(
+                    exporter, f"history_store{suffix}", HistoryStore,
+                    path=os.path.join(history_path, application['name']) if multi_app else history_path,
+                    services=services,
+                    step=metrics_fetcher_config.get('traffic_step', 60),
+                    rows_per_segment=history_store_config.get('rows_per_segment', 1440),
+                    retention_hours=history_store_config.get('retention_hours', 72)
+                )
+
+        latency_predictor_model = latency_predictor_future.result()
+        traffic_forecaster_model = traffic_forecaster_future.result()
+
+    model_registry = None
+    if model_registry_enabled:
+        model_registry = ModelRegistry(
+            pool_size=model_registry_config.get('pool_size', 2),
+            max_pending=model_registry_config.get('max_pending', 16),
+            error_window=model_registry_config.get('error_window', 1440)
+        )
+        latency_predictor_config = config['modules']['latency_predictor_model']
+        latency_predictor_model = model_registry.add_model(
+            'latency_predictor_model', version_name(latency_predictor_config['model_path']), latency_predictor_model
+        )
+        traffic_forecaster_model = model_registry.add_model(
+            'traffic_forecaster_model', version_name(traffic_forecaster_config['model_path']), traffic_forecaster_model
+        )
+        # Shadows load in this process and never gate readiness
+        for shadow in latency_shadows:
+            model_registry.load_shadow(
+                'latency_predictor_model', shadow.get('version', version_name(shadow['model_path'])),
+                lambda shadow=shadow: LatencyPredictorModel(
+                    model_path=construct_file_path(shadow['model_path']),
+                    num_target=latency_predictor_config['num_target'],
+                    backend=shadow.get('backend', latency_predictor_config.get('backend', 'numpy'))
+                )
+            )
+        for shadow in traffic_shadows:
+            model_registry.load_shadow(
+                'traffic_forecaster_model', shadow.get('version', version_name(shadow['model_path'])),
+                lambda shadow=shadow: TrafficForecasterModel(
+                    model_path=shadow['model_path'],
+                    backend=shadow.get('backend', traffic_forecaster_config.get('backend', 'eager')),
+                    num_threads=shadow.get('num_threads', 1),
+                    quantize=shadow.get('quantize', traffic_forecaster_config.get('quantize', False))
+                )
+            )
+        exporter.register_model_registry(
+            model_registry, promotion_endpoint=model_registry_config.get('promotion_endpoint', False)
+        )
+
+    if exporter.instrumentation:
+        for metrics_fetcher in metrics_fetchers.values():
+            metrics_fetcher.query_observer = exporter.observe_query
+        latency_predictor_model.inference_observer = exporter.observe_inference
+        traffic_forecaster_model.inference_observer = exporter.observe_inference
+
+    experience_log = None
+    online_trainer = None
+    if online_training:
+        experience_log = load_component(
+            exporter, 'experience_log', ExperienceLog,
+            path=construct_file_path(online_training_config['experience_path']),
+            num_target=config['modules']['latency_predictor_model']['num_target'],
+            rows_per_segment=online_training_config.get('rows_per_segment', 1440),
+            retention_hours=online_training_config.get('retention_hours', 168)
+        )
+        online_trainer = OnlineTrainer(
+            latency_predictor_model=latency_predictor_model,
+            experience_log=experience_log,
+            output_path=construct_file_path(online_training_config['output_path']),
+            interval=online_training_config.get('interval', 3600),
+            min_samples=online_training_config.get('min_samples', 720),
+            max_samples=online_training_config.get('max_samples', 20160),
+            holdout_fraction=online_training_config.get('holdout_fraction', 0.2),
+            epochs=online_training_config.get('epochs', 20),
+            batch_size=online_training_config.get('batch_size', 128),
+            learning_rate=online_training_config.get('learning_rate', 5e-4),
+            anchor=online_training_config.get('anchor', 1e-3),
+            min_improvement=online_training_config.get('min_improvement', 0.02),
+            nice=online_training_config.get('nice', 19),
+            num_threads=online_training_config.get('num_threads', 1),
+            cpu_affinity=online_training_config.get('cpu_affinity'),
+            timeout=online_training_config.get('timeout', 900)
+        ).start()
+        exporter.register_online_trainer(online_trainer)
+
+    replica_optimizer = None
+    if controller_config.get('decision_mode', 'proportional') == 'optimizer':
+        replica_optimizer = ReplicaOptimizer(
+            latency_predictor_model=latency_predictor_model,
+            max_target_pod=controller_config['max_target_pod'],
+            **(config['modules'].get('replica_optimizer') or {})
+        )
+
+    scheduler = None
+    scheduler_config = config['modules'].get('scheduler') or {}
+    if scheduler_config.get('enabled', False):
+        scheduler = CycleScheduler(
+            period=controller_config['cooling_down_duration'],
+            alignment_offset=scheduler_config.get('alignment_offset', 0),
+            prefetch_lead=scheduler_config.get('prefetch_lead', 0),
+            stage_deadlines=scheduler_config.get('stage_deadlines')
+        )
+        exporter.register_scheduler(scheduler)
+
+    controller_started = time.perf_counter()
+    prediction_caches: dict[str, PredictionCache] = {}
+    prediction_cache_config = config['modules'].get('prediction_cache') or {}
+    if prediction_cache_config.get('enabled', False):
+        prediction_caches = {
+            application['name']: PredictionCache(
+                forecast_entries=prediction_cache_config.get('forecast_entries', 4),
+                latency_entries=prediction_cache_config.get('latency_entries', 1024),
+                precision=prediction_cache_config.get('precision', 2)
+            )
+            for application in applications
+        }
+        exporter.register_prediction_caches(prediction_caches)
+    if online_trainer is not None:
+        # A new model version invalidates every memoized latency prediction
+        online_trainer.prediction_caches = prediction_caches
+    if model_registry is not None:
+        model_registry.prediction_caches = prediction_caches
+
+    horizon_planners: dict[str, HorizonPlanner] = {}
+    horizon_config = controller_config.get('horizon') or {}
+    if horizon_config.get('enabled', False):
+        action_queue = ScaleActionQueue(resource_manager)
+        for application in applications:
+            services = list(application.get('services', controller_config['services']).keys())
+            readiness_delays = {
+                **(horizon_config.get('readiness_delays') or {}),
+                **(application.get('readiness_delays') or {}),
+            }
+            horizon_planners[application['name']] = HorizonPlanner(
+                services=services,
+                steps=horizon_config.get('steps', 5),
+                step=metrics_fetcher_config.get('traffic_step', 60),
+                readiness_delays={
+                    service: readiness_delays.get(service, horizon_config.get('readiness_delay', 60))
+                    for service in services
+                },
+                action_queue=action_queue,
+                name=application['name'],
+                namespace=application.get('namespace')
+            )
+        exporter.register_horizon_planners(horizon_planners, action_queue)
+
+    decision_logs: dict[str, DecisionLog] = {}
+    decision_log_config = config['modules'].get('decision_log') or {}
+    if decision_log_config.get('enabled', False):
+        decision_log_path = construct_file_path(decision_log_config['path'])
+        for application in applications:
+            decision_logs[application['name']] = DecisionLog(
+                path=os.path.join(decision_log_path, application['name']) if multi_app else decision_log_path,
+                services=list(application.get('services', controller_config['services']).keys()),
+                horizon=horizon_config.get('steps', 5) if horizon_planners else 1,
+                max_bytes=decision_log_config.get('max_bytes', 64 * 1024 * 1024),
+                rotate_interval=decision_log_config.get('rotate_interval', 3600),
+                retention_hours=decision_log_config.get('retention_hours', 168),
+                queue_size=decision_log_config.get('queue_size', 1024),
+                flush_interval=decision_log_config.get('flush_interval', 1.0)
+            )
+        exporter.register_decision_logs(decision_logs)
+
+    fast_paths: dict[str, FastPath] = {}
+    fast_path_config = config['modules'].get('fast_path') or {}
+    if fast_path_config.get('enabled', False):
+        for application in applications:
+            services = list(application.get('services', controller_config['services']).keys())
+            overrides = {
+                **(fast_path_config.get('services') or {}),
+                **(application.get('fast_path') or {}),
+            }
+            fast_paths[application['name']] = FastPath(
+                metrics_fetcher=metrics_fetchers[application['name']],
+                resource_manager=resource_manager,
+                services=services,
+                cpu_high={
+                    service: (overrides.get(service) or {}).get('cpu_high', fast_path_config.get('cpu_high', 0.8))
+                    for service in services
+                },
+                cpu_low={
+                    service: (overrides.get(service) or {}).get('cpu_low', fast_path_config.get('cpu_low', 0.5))
+                    for service in services
+                },
+                max_target_pod=controller_config['max_target_pod'],
+                interval=fast_path_config.get('interval', 5),
+                cpu_window=fast_path_config.get('cpu_window', 30),
+                trigger_samples=fast_path_config.get('trigger_samples', 2),
+                max_step=fast_path_config.get('max_step', 2),
+                max_pending=fast_path_config.get('max_pending', 4),
+                unready_grace=fast_path_config.get('unready_grace', 120),
+                cooldown=fast_path_config.get('cooldown', 30),
+                floor_duration=fast_path_config.get('floor_duration', 120),
+                name=application['name'],
+                namespace=application.get('namespace')
+            )
+        exporter.register_fast_paths(fast_paths)
+
+    controllers = [
+        Controller(
+            latency_predictor_model=latency_predictor_model,
+            metrics_fetcher=metrics_fetchers[application['name']],
+            resource_manager=resource_manager,
+            traffic_forecaster_model=traffic_forecaster_model,
+            cooling_down_duration=controller_config['cooling_down_duration'],
+            max_target_pod=controller_config['max_target_pod'],
+            services_threshold=application.get('services', controller_config['services']),
+            exporter=exporter,
+            history_store=history_stores[application['name']],
+            replica_optimizer=replica_optimizer,
+            # The multi-application controller owns the schedule and the stage deadlines
+            scheduler=None if multi_app else scheduler,
+            forecast_quantiles=application.get(
+                'forecast_quantiles', controller_config.get('forecast_quantiles')
+            ),
+            prediction_cache=prediction_caches.get(application['name']),
+            experience_log=experience_log,
+            online_trainer=None if multi_app else online_trainer,
+            model_registry=model_registry,
+            horizon_planner=horizon_planners.get(application['name']),
+            decision_log=decision_logs.get(application['name']),
+            fast_path=fast_paths.get(application['name']),
+            name=application['name'],
+            namespace=application.get('namespace'),
+            is_test=controller_config['test']['is_test'],
+            test_data_path=controller_config['test']['data_path'],
+            test_starting_index=controller_config['test']['starting_index']
+        )
+        for application in applications
+    ]
+    controller = controllers[0]
+    if multi_app:
+        controller = MultiAppController(
+            controllers=controllers,
+            latency_predictor_model=latency_predictor_model,
+            traffic_forecaster_model=traffic_forecaster_model,
+            cooling_down_duration=controller_config['cooling_down_duration'],
+            exporter=exporter,
+            scheduler=scheduler,
+            batch_size=controller_config.get('batch_size', 64),
+            pool_size=controller_config.get('pool_size', 8),
+            online_trainer=online_trainer,
+            model_registry=model_registry
+        )
+    exporter.record_startup_phase('controller', time.perf_counter() - controller_started)
+    exporter.record_startup_phase('total', time.perf_counter() - startup_started)
+    exporter.set_component_state('controller', Exporter.READY)
+    for fast_path in fast_paths.values():
+        fast_path.start()
+
+    logger.info(
+        f"System is ready and running after {time.perf_counter() - startup_started:.2f}s!"
+    )
     controller.run()
@@ -0,0 +1,73 @@
+import argparse
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+
+from main import construct_file_path, load_config
+from DecisionLog import read_decisions
+
+
+def parse_time(value: str | None) -> float | None:
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def to_json(layout: dict, record: np.void) -> dict:
+    services = layout['services']
+    return {
+        'time': datetime.fromtimestamp(float(record['timestamp'])).isoformat(timespec='seconds'),
+        'watermark': float(record['watermark']),
+        'window_digest': record['window_digest'].hex(),
+        'node_cpu': round(float(record['node_cpu']), 4),
+        **{
+            column: dict(zip(services, record[column].tolist()))
+            for column in ('pod', 'ready_pod', 'target')
+        },
+        **{
+            column: dict(zip(services, np.round(record[column].astype(float), 4).tolist()))
+            for column in ('pod_cpu', 'traffic', 'predicted_latency')
+        },
+        'forecast': [
+            dict(zip(services, np.round(step.astype(float), 2).tolist()))
+            for step in record['forecast'] if not np.isnan(step).all()
+        ],
+        'stage_seconds': {
+            stage: round(float(seconds), 4)
+            for stage, seconds in zip(layout['stages'], record['stage_seconds'])
+            if not np.isnan(seconds)
+        },
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Print or export the controller's decision log.")
+    parser.add_argument('--config', default='config.yaml')
+    parser.add_argument('--path', default=None, help="Defaults to decision_log.path in the config.")
+    parser.add_argument('--app', default=None, help="Application directory in a multi-application setup.")
+    parser.add_argument('--start', default=None, help="ISO time or UNIX timestamp.")
+    parser.add_argument('--end', default=None, help="ISO time or UNIX timestamp.")
+    parser.add_argument('--output', default=None, help="Write the records to an .npz file instead of printing them.")
+    args = parser.parse_args()
+
+    path = args.path or construct_file_path(load_config(args.config)['modules']['decision_log']['path'])
+    if args.app:
+        path = os.path.join(path, args.app)
+
+    layout, records = read_decisions(path, start=parse_time(args.start), end=parse_time(args.end))
+    if args.output:
+        np.savez(
+            args.output,
+            services=np.array(layout.get('services', [])),
+            stages=np.array(layout.get('stages', [])),
+            **{column: records[column] for column in (records.dtype.names or ())}
+        )
+        print(f"Wrote {len(records)} decision(s) to {args.output}.")
+    else:
+        for record in records:
+            print(json.dumps(to_json(layout, record)))
@@ -0,0 +1,150 @@
+import argparse
+import json
+import logging
+import time
+
+import numpy as np
+
+from main import construct_file_path, load_config
+from MetricsFetcher.metrics_fetcher import TRAFFIC_METRIC
+from RemoteWrite import RemoteWriteSender
+
+logger = logging.getLogger()
+
+
+def synthesize(
+    data_path: str,
+    output_path: str,
+    namespace: str,
+    pods: int,
+    scrape_interval: int,
+    cpu_per_request: float,
+    start: int,
+    end: int | None
+):
+    # Turns the per-minute request rates of a traffic trace into the raw
+    # counters and kube-state series Prometheus would push for them
+    trace = np.genfromtxt(data_path, delimiter=',', skip_header=1)[start:end]
+    with open(data_path, encoding='utf-8-sig') as file:
+        services = [column.strip('"') for column in file.readline().strip().split(',')[1:]]
+
+    pod_names = {
+        service: [f"{service}-5f7c9d8b6-{i:05d}" for i in range(pods)]
+        for service in services
+    }
+    requests = {service: 0.0 for service in services}
+    cpu = {service: 0.0 for service in services}
+    idle = 0.0
+
+    with open(output_path, 'w') as file:
+        for row in trace:
+            minute = int(row[0])
+            for offset in range(0, 60, scrape_interval):
+                series = []
+                for k, service in enumerate(services):
+                    requests[service] += row[k + 1] * scrape_interval
+                    cpu[service] += row[k + 1] * cpu_per_request * scrape_interval
+                    for pod in pod_names[service]:
+                        labels = {'namespace': namespace, 'pod': pod}
+                        series += [
+                            {'labels': {'__name__': TRAFFIC_METRIC, 'app_name': service, **labels},
+                             'value': requests[service] / pods},
+                            {'labels': {'__name__': 'container_cpu_usage_seconds_total', **labels},
+                             'value': cpu[service] / pods},
+                            {'labels': {'__name__': 'kube_pod_status_ready', 'condition': 'true', **labels},
+                             'value': 1},
+                            {'labels': {'__name__': 'kube_pod_info', **labels}, 'value': 1},
+                        ]
+                idle += scrape_interval * 0.5
+                series.append({
+                    'labels': {'__name__': 'node_cpu_seconds_total', 'cpu': '0', 'mode': 'idle'},
+                    'value': idle
+                })
+                file.write(json.dumps({'timestamp': minute + offset * 1000, 'series': series}) + '\n')
+    logger.info(f"Wrote {len(trace) * (60 // scrape_interval)} scrape(s) to {output_path}.")
+
+
+def replay(input_path: str, url: str, batch_interval: float, backlog: float):
+    # The first `backlog` seconds of the recording are shifted into the past and
+    # sent at once; the rest goes out as its timestamps come due, like a live
+    # Prometheus shipping batches every `batch_interval` seconds
+    with open(input_path) as file:
+        scrapes = [json.loads(line) for line in file if line.strip()]
+    if not scrapes:
+        raise Exception(f"{input_path} holds no samples.")
+
+    sender = RemoteWriteSender(url)
+    started = time.time()
+    shift = started * 1000 - scrapes[0]['timestamp'] - backlog * 1000
+    batch: dict[tuple, tuple[dict, list]] = {}
+    batch_start = None
+    sent = 0
+
+    def flush():
+        nonlocal sent, batch_start
+        if batch:
+            sender.send(list(batch.values()))
+            sent += sum(len(samples) for _, samples in batch.values())
+            batch.clear()
+        batch_start = None
+
+    for scrape in scrapes:
+        timestamp = scrape['timestamp'] + shift
+        if batch_start is not None and timestamp - batch_start >= batch_interval * 1000:
+            flush()
+        delay = timestamp / 1000 - time.time()
+        if delay > 0:
+            flush()
+            time.sleep(delay)
+
+        if batch_start is None:
+            batch_start = timestamp
+        for item in scrape['series']:
+            key = tuple(sorted(item['labels'].items()))
+            batch.setdefault(key, (item['labels'], []))[1].append((int(timestamp), float(item['value'])))
+
+    flush()
+    logger.info(f"Sent {sent} sample(s) from {len(scrapes)} scrape(s) in {time.time() - started:.1f}s.")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Record or replay samples against the remote write receiver.")
+    parser.add_argument('--config', default='config.yaml')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    synthesize_parser = subparsers.add_parser('synthesize', help="Build a recording from the traffic trace.")
+    synthesize_parser.add_argument('--output', required=True)
+    synthesize_parser.add_argument('--pods', type=int, default=2)
+    synthesize_parser.add_argument('--scrape-interval', type=int, default=15)
+    synthesize_parser.add_argument('--cpu-per-request', type=float, default=0.01)
+    synthesize_parser.add_argument('--start', type=int, default=0)
+    synthesize_parser.add_argument('--end', type=int, default=None)
+
+    replay_parser = subparsers.add_parser('replay', help="Push a recording to a receiver.")
+    replay_parser.add_argument('--input', required=True)
+    replay_parser.add_argument('--url', default=None)
+    replay_parser.add_argument('--batch-interval', type=float, default=5)
+    replay_parser.add_argument('--backlog', type=float, default=300)
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    metrics_fetcher_config = config['modules']['metrics_fetcher']
+
+    if args.command == 'synthesize':
+        synthesize(
+            data_path=construct_file_path(config['modules']['controller']['test']['data_path']),
+            output_path=args.output,
+            namespace=config['modules']['resource_manager'].get('namespace', 'default'),
+            pods=args.pods,
+            scrape_interval=args.scrape_interval,
+            cpu_per_request=args.cpu_per_request,
+            start=args.start,
+            end=args.end
+        )
+    else:
+        remote_write_config = metrics_fetcher_config.get('remote_write') or {}
+        url = args.url or (
+            f"http://localhost:{remote_write_config.get('port', 9201)}"
+            f"{remote_write_config.get('path', '/api/v1/write')}"
+        )
+        replay(args.input, url, args.batch_interval, args.backlog)
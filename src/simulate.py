@@ -0,0 +1,96 @@
+import argparse
+import json
+import logging
+
+import numpy as np
+
+from main import construct_file_path, load_config
+from Controller import Controller
+from LatencyPredictorModel import LatencyPredictorModel
+from ReplicaOptimizer import ReplicaOptimizer
+from Simulator import Simulator
+from TrafficForecasterModel import TrafficForecasterModel
+
+logger = logging.getLogger()
+
+
+def load_trace(data_path: str) -> np.ndarray:
+    return np.genfromtxt(data_path, delimiter=',', skip_header=1)[:, 1:]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Replay a traffic trace through the controller.")
+    parser.add_argument('--config', default='config.yaml')
+    parser.add_argument('--policy', action='append', choices=['proportional', 'optimizer'])
+    parser.add_argument('--start', type=int, default=None)
+    parser.add_argument('--end', type=int, default=None)
+    parser.add_argument('--output', default=None)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("Simulator").setLevel(logging.INFO)
+
+    config = load_config(args.config)
+    controller_config = config['modules']['controller']
+    simulator_config = config['modules']['simulator']
+
+    latency_predictor_model = LatencyPredictorModel(
+        model_path=construct_file_path(
+            config['modules']['latency_predictor_model']['model_path']
+        ),
+        num_target=config['modules']['latency_predictor_model']['num_target'],
+        backend=config['modules']['latency_predictor_model'].get('backend', 'numpy')
+    )
+    traffic_forecaster_config = config['modules']['traffic_forecaster_model']
+    traffic_forecaster_model = TrafficForecasterModel(
+        model_path=traffic_forecaster_config['model_path'],
+        backend=traffic_forecaster_config.get('backend', 'eager'),
+        num_threads=traffic_forecaster_config.get('num_threads'),
+        num_interop_threads=traffic_forecaster_config.get('num_interop_threads'),
+        quantize=traffic_forecaster_config.get('quantize', False)
+    )
+
+    simulator = Simulator(
+        traffic_forecaster_model=traffic_forecaster_model,
+        trace=load_trace(simulator_config.get('data_path', controller_config['test']['data_path'])),
+        services_threshold=controller_config['services'],
+        capacity=simulator_config['capacity'],
+        startup_delay=simulator_config['startup_delay'],
+        initial_pods=simulator_config.get('initial_pods', 1),
+        base_latency_ratio=simulator_config.get('base_latency_ratio', 0.3),
+        max_latency_ratio=simulator_config.get('max_latency_ratio', 10),
+        batch_size=simulator_config.get('batch_size', 64)
+    )
+
+    def controller_factory(policy: str):
+        def factory(metrics_fetcher, resource_manager):
+            replica_optimizer = None
+            if policy == 'optimizer':
+                replica_optimizer = ReplicaOptimizer(
+                    latency_predictor_model=latency_predictor_model,
+                    max_target_pod=controller_config['max_target_pod'],
+                    **(config['modules'].get('replica_optimizer') or {})
+                )
+            return Controller(
+                latency_predictor_model=latency_predictor_model,
+                metrics_fetcher=metrics_fetcher,
+                resource_manager=resource_manager,
+                traffic_forecaster_model=traffic_forecaster_model,
+                cooling_down_duration=controller_config['cooling_down_duration'],
+                max_target_pod=controller_config['max_target_pod'],
+                services_threshold=controller_config['services'],
+                replica_optimizer=replica_optimizer
+            )
+        return factory
+
+    reports = {}
+    for policy in args.policy or ['proportional']:
+        reports[policy] = simulator.run(
+            controller_factory(policy), start=args.start, end=args.end
+        )
+
+    output = json.dumps(reports, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output)
+    print(output)
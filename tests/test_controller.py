@@ -0,0 +1,36 @@
+import numpy as np
+
+from Controller import Controller
+
+SERVICES = {f's{i}': 100 for i in range(7)}
+
+
+def controller():
+    return Controller(
+        latency_predictor_model=None,
+        metrics_fetcher=None,
+        resource_manager=None,
+        traffic_forecaster_model=None,
+        cooling_down_duration=60,
+        max_target_pod=20,
+        services_threshold=SERVICES
+    )
+
+
+def test_short_traffic_window_is_left_padded_to_the_context_length():
+    traffic = {service: np.r_[np.zeros(10), np.arange(1, 91)] for service in SERVICES}
+
+    window = controller()._Controller__prepare_traffic_data(traffic)
+
+    assert window.shape == (1440, 7)
+    assert not window[:-90].any()
+    np.testing.assert_array_equal(window[-90:, 0], np.arange(1, 91))
+
+
+def test_full_traffic_window_is_the_most_recent_context_length_rows():
+    traffic = {service: np.arange(2000, dtype=float) for service in SERVICES}
+
+    window = controller()._Controller__prepare_traffic_data(traffic)
+
+    assert window.shape == (1440, 7)
+    np.testing.assert_array_equal(window[:, 3], np.arange(560, 2000))
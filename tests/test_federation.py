@@ -0,0 +1,126 @@
+import socket
+import time
+
+import numpy as np
+import pytest
+
+from run_benchmarks import kubernetes_stub, load_trace, prometheus_stub
+
+from Federation import FederatedMetricsFetcher, FederatedResourceManager, split_replicas
+from MetricsFetcher import MetricsFetcher
+from ResourceManager import ResourceManager
+
+TRACE = load_trace()
+
+
+def url(server) -> str:
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def closed_url() -> str:
+    # Nothing listens here once the socket is closed, like a cluster that is down
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return f"http://127.0.0.1:{probe.getsockname()[1]}"
+
+
+def metrics_fetcher(prometheus_url: str) -> MetricsFetcher:
+    return MetricsFetcher(
+        prometheus_url=prometheus_url, query_timeout=3, connect_timeout=0.5, observe_latency=True
+    )
+
+
+@pytest.fixture(scope='module')
+def clusters():
+    return {
+        'a': prometheus_stub(TRACE, scale=1, ready=2, pod_cpu=10, node_cpu=0.2, latency=100),
+        'b': prometheus_stub(TRACE, scale=3, ready=6, pod_cpu=20, node_cpu=0.4, latency=300),
+        'slow': prometheus_stub(TRACE, delay=1.5),
+    }
+
+
+def test_slow_and_down_clusters_are_left_out_of_the_merge(clusters):
+    federated = FederatedMetricsFetcher(
+        fetchers={
+            **{name: metrics_fetcher(url(server)) for name, server in clusters.items()},
+            'down': metrics_fetcher(closed_url()),
+        },
+        deadline=0.75
+    )
+
+    started = time.monotonic()
+    metrics = federated.fetch_metrics(fetch_starting_datetime=None)
+
+    assert time.monotonic() - started < 1.4
+    assert federated.healthy == ['a', 'b']
+    assert 'clusters' in federated.stale_metrics
+    assert federated.failures == {'a': 0, 'b': 0, 'slow': 1, 'down': 1}
+
+    a, b = (federated.cluster_metrics[cluster] for cluster in ('a', 'b'))
+    np.testing.assert_allclose(metrics['traffic']['s0'], a['traffic']['s0'] + b['traffic']['s0'])
+    assert metrics['ready_pod']['s0'] == 8
+    assert metrics['pod']['s0'] == 8
+    # Weighted by ready pods: (10 * 2 + 20 * 6) / 8
+    assert metrics['pod_cpu']['s0'] == pytest.approx(17.5)
+    assert metrics['node_cpu']['cpu_node'] == pytest.approx(0.3)
+    # Weighted by traffic, which is three times higher in b
+    assert metrics['latency']['s0'] == pytest.approx(250)
+
+
+def test_lagging_cluster_holds_its_last_value(clusters):
+    fetchers = {name: metrics_fetcher(url(clusters[name])) for name in ('a', 'b')}
+    watermark = fetchers['a'].traffic_watermark
+    fetchers['a'].traffic_watermark = lambda: watermark() - 2 * fetchers['a'].traffic_step
+    federated = FederatedMetricsFetcher(fetchers=fetchers, deadline=5)
+
+    metrics = federated.fetch_metrics(fetch_starting_datetime=None)
+
+    a, b = (federated.cluster_metrics[cluster]['traffic']['s0'] for cluster in ('a', 'b'))
+    np.testing.assert_allclose(metrics['traffic']['s0'], np.r_[a[2:], a[-1], a[-1]] + b)
+    assert federated.traffic_watermark() == watermark()
+
+
+def test_split_replicas_spills_over_a_full_cluster():
+    assert split_replicas(10, [3, 1], maximum=[4, None]) == [4, 6]
+    assert split_replicas(10, [1, 3], minimum=[1, 1], maximum=[None, 5]) == [5, 5]
+    assert split_replicas(3, [1, 0, 0], minimum=[1, 1, 1]) == [1, 1, 1]
+    # More than every cluster holds together stops at the caps
+    assert split_replicas(20, [1, 1], maximum=[4, 6]) == [4, 6]
+
+
+def test_split_follows_traffic_under_a_max_replicas_cap(clusters):
+    servers = {cluster: kubernetes_stub() for cluster in ('a', 'b')}
+    federated_resource_manager = FederatedResourceManager(
+        resource_managers={cluster: ResourceManager(host=url(server)) for cluster, server in servers.items()},
+        max_replicas={'b': 5}
+    )
+    federated = FederatedMetricsFetcher(
+        fetchers={name: metrics_fetcher(url(clusters[name])) for name in ('a', 'b')}, deadline=5
+    )
+    federated.fetch_metrics(fetch_starting_datetime=None)
+    federated_resource_manager.add_metrics_fetcher('default', federated)
+
+    result = federated_resource_manager.scale_deployment('s0', 10)
+
+    # Traffic asks for 3 and 7, but b holds only 5 and the rest spills back to a
+    assert result.success and result.replicas == 10
+    assert [patch[1:] for patch in servers['a'].patches] == [('s0', 5, 200)]
+    assert [patch[1:] for patch in servers['b'].patches] == [('s0', 5, 200)]
+
+
+def test_down_cluster_fails_only_its_share():
+    servers = {cluster: kubernetes_stub() for cluster in ('a', 'b')}
+    resource_managers = {cluster: ResourceManager(host=url(server), max_retries=0) for cluster, server in servers.items()}
+    resource_managers['down'] = ResourceManager(host=closed_url(), max_retries=0, request_timeout=1)
+    federated_resource_manager = FederatedResourceManager(
+        resource_managers=resource_managers, max_replicas={'a': 4}
+    )
+
+    result = federated_resource_manager.scale_deployment('s0', 10)
+
+    assert not result.success
+    assert result.error.startswith('down: ')
+    assert [patch[1:] for patch in servers['a'].patches] == [('s0', 4, 200)]
+    assert [patch[1:] for patch in servers['b'].patches] == [('s0', 3, 200)]
+    assert federated_resource_manager.cluster_targets['default'] == {'a': {'s0': 4}, 'b': {'s0': 3}}
+    assert federated_resource_manager.failures == {'a': 0, 'b': 0, 'down': 1}
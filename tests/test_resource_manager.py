@@ -0,0 +1,113 @@
+import email.utils
+import threading
+import time
+
+from run_benchmarks import kubernetes_stub
+
+from ResourceManager import ResourceManager
+
+
+def resource_manager(server, **kwargs) -> ResourceManager:
+    return ResourceManager(host=f"http://127.0.0.1:{server.server_port}", **kwargs)
+
+
+def test_server_errors_are_retried_with_backoff():
+    server = kubernetes_stub(failures=[(503, {}), (500, {})])
+
+    result = resource_manager(server, max_retries=3, backoff=0.01).scale_deployment('s0', 3)
+
+    assert result.success and result.attempts == 3
+    assert [patch[3] for patch in server.patches] == [503, 500, 200]
+
+
+def test_client_errors_are_not_retried():
+    server = kubernetes_stub(failures=[(403, {})])
+
+    result = resource_manager(server, max_retries=3, backoff=0.01).scale_deployment('s0', 3)
+
+    assert not result.success and result.attempts == 1
+    assert result.error.startswith('403')
+    assert len(server.patches) == 1
+
+
+def test_retry_after_in_seconds_holds_back_the_retry():
+    server = kubernetes_stub(failures=[(429, {'Retry-After': '1'})])
+
+    result = resource_manager(server, max_retries=1, backoff=0.01).scale_deployment('s0', 3)
+
+    assert result.success and result.attempts == 2
+    (first, *_), (second, *_) = server.patches
+    assert second - first >= 0.9
+
+
+def test_retry_after_as_an_http_date_holds_back_the_retry():
+    # HTTP-dates have whole-second precision, so aim two seconds out
+    retry_at = email.utils.formatdate(time.time() + 2, usegmt=True)
+    server = kubernetes_stub(failures=[(429, {'Retry-After': retry_at})])
+
+    result = resource_manager(server, max_retries=1, backoff=0.01).scale_deployment('s0', 3)
+
+    assert result.success and result.attempts == 2
+    (first, *_), (second, *_) = server.patches
+    assert second - first >= 0.9
+
+
+def test_unparseable_retry_after_does_not_fail_the_call():
+    server = kubernetes_stub(failures=[(429, {'Retry-After': 'soon'})])
+
+    result = resource_manager(server, max_retries=1, backoff=0.01).scale_deployment('s0', 3)
+
+    assert result.success and result.attempts == 2
+
+
+def test_coalesced_target_reports_the_outcome_once_applied():
+    server = kubernetes_stub(delay=0.3)
+    manager = resource_manager(server)
+    results = {}
+    first = threading.Thread(target=lambda: results.update(first=manager.scale_deployment('s0', 2)))
+    first.start()
+    time.sleep(0.1)
+
+    results['second'] = manager.scale_deployment('s0', 3)
+    first.join()
+
+    assert results['second'].coalesced and results['second'].success
+    assert results['second'].replicas == 3
+    # The coalesced call returns only after its own target went through
+    assert [patch[2] for patch in server.patches] == [2, 3]
+
+
+def test_superseded_coalesced_target_is_not_reported_as_applied():
+    server = kubernetes_stub(delay=0.5)
+    manager = resource_manager(server)
+    results = {}
+    threads = []
+    for name, replicas, wait in (('first', 2, 0), ('second', 3, 0.1), ('third', 4, 0.15)):
+        time.sleep(wait)
+        thread = threading.Thread(
+            target=lambda name=name, replicas=replicas: results.update({name: manager.scale_deployment('s0', replicas)})
+        )
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+
+    assert [patch[2] for patch in server.patches] == [2, 4]
+    assert results['third'].success and results['third'].coalesced
+    assert not results['second'].success and results['second'].coalesced
+    assert 'Superseded' in results['second'].error
+
+
+def test_failed_in_flight_call_fails_the_coalesced_target():
+    server = kubernetes_stub(failures=[(200, {}), (403, {})], delay=0.3)
+    manager = resource_manager(server, max_retries=0)
+    results = {}
+    first = threading.Thread(target=lambda: results.update(first=manager.scale_deployment('s0', 2)))
+    first.start()
+    time.sleep(0.1)
+
+    results['second'] = manager.scale_deployment('s0', 3)
+    first.join()
+
+    assert not results['second'].success and results['second'].coalesced
+    assert results['second'].error.startswith('403')
@@ -0,0 +1,55 @@
+import threading
+import time
+
+import pytest
+
+from Scheduler import CycleScheduler, StageDeadlineExceeded
+
+
+class SlowFetch:
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.calls = 0
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            self.calls += 1
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(self.seconds)
+        with self.lock:
+            self.running -= 1
+        return {'calls': self.calls}
+
+
+def test_abandoned_prefetch_never_fetches():
+    scheduler = CycleScheduler(period=60, stage_deadlines={'fetch': 1})
+    fetch = SlowFetch(0)
+    scheduler.next_boundary_time = time.time() + 30
+
+    scheduler.prefetch_next(fetch)
+    prefetched = scheduler.prefetched
+    scheduler._CycleScheduler__abandon_prefetch()
+
+    assert prefetched.result(timeout=1) is None
+    assert fetch.calls == 0
+
+
+def test_late_fetch_is_never_overlapped():
+    scheduler = CycleScheduler(period=60, stage_deadlines={'fetch': 0.05})
+    fetch = SlowFetch(0.2)
+    scheduler.next_boundary_time = time.time()
+
+    with pytest.raises(StageDeadlineExceeded):
+        scheduler.run_stage('fetch', fetch)
+    # The late fetch still holds the metrics fetcher, so no prefetch starts next to it
+    scheduler.prefetch_next(fetch)
+    assert scheduler.prefetched is None
+    assert scheduler.skipped_stages['fetch'] == 1
+
+    scheduler.stage_deadlines['fetch'] = 1
+    assert scheduler._CycleScheduler__collect(fetch) == {'calls': 2}
+    assert fetch.max_running == 1
@@ -0,0 +1,59 @@
+import os
+
+import numpy as np
+import yaml
+
+from Controller import Controller
+from LatencyPredictorModel import LatencyPredictorModel
+from Simulator import Simulator
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class LastValueForecaster:
+    def predict_batch(self, windows, batch_size=64):
+        return windows[:, -1, :]
+
+
+def test_proportional_policy_replays_the_whole_trace():
+    with open(os.path.join(ROOT, "config.yaml"), 'r') as file:
+        modules = yaml.safe_load(file)['modules']
+    controller_config, simulator_config = modules['controller'], modules['simulator']
+    latency_predictor_model = LatencyPredictorModel(
+        model_path=os.path.join(ROOT, "models", "latency_predictor_model", "v1"),
+        num_target=modules['latency_predictor_model']['num_target'],
+        backend='numpy'
+    )
+    trace = np.genfromtxt(os.path.join(ROOT, "data", "traffic.csv"), delimiter=',', skip_header=1)[:, 1:]
+    simulator = Simulator(
+        traffic_forecaster_model=LastValueForecaster(),
+        trace=trace,
+        services_threshold=controller_config['services'],
+        capacity=simulator_config['capacity'],
+        startup_delay=simulator_config['startup_delay']
+    )
+
+    def factory(metrics_fetcher, resource_manager):
+        return Controller(
+            latency_predictor_model=latency_predictor_model,
+            metrics_fetcher=metrics_fetcher,
+            resource_manager=resource_manager,
+            traffic_forecaster_model=None,
+            cooling_down_duration=controller_config['cooling_down_duration'],
+            max_target_pod=controller_config['max_target_pod'],
+            services_threshold=controller_config['services']
+        )
+
+    report = simulator.run(factory)
+
+    assert report['minutes'] == len(trace) - simulator.context_length
+    # Every service keeps at least one pod for every simulated minute
+    assert all(
+        pod_minutes >= report['minutes'] for pod_minutes in report['pod_minutes'].values()
+    )
+
+
+def test_scaling_strategy_never_scales_to_zero():
+    controller = Controller.__new__(Controller)
+    assert controller.scaling_strategy(current_num_pod=20, forecasted_latency=2, threshold_latency=250) == 1
+    assert controller.scaling_strategy(current_num_pod=4, forecasted_latency=500, threshold_latency=250) == 8